@@ -1,8 +1,7 @@
 import os
-from flask import Flask, request, current_app, send_from_directory
+from flask import request, current_app, send_from_directory
 from app.extensions import (
     db,
-    migrate,
     csrf,
     babel,
     security,
@@ -10,15 +9,27 @@ from app.extensions import (
     mail,
     dropzone,
     session,
+    cache,
 )
 from flask_security import (
     SQLAlchemyUserDatastore,
 )
-from elasticsearch import Elasticsearch
 from config import Config
 from app.models import User, Role, WebAuthn
-import rq
-from redis import Redis
+from app.search.backends import create_search_backend
+from app.http import HTTPClient
+from app.email import EmailDispatcher, DispatchingMailUtil
+from app.translate import create_translator
+from app.services import (
+    ServiceFlask,
+    create_elasticsearch,
+    create_redis,
+    create_task_queue,
+)
+from app import language  # noqa: F401 - queues language detection on commit
+from app import content  # noqa: F401 - renders post content on flush
+from app.startup import StartupTimer
+from app import database
 
 
 def get_locale():
@@ -31,34 +42,50 @@ def get_locale():
 
 
 def create_app(config_class=Config):
-    app = Flask(__name__)
+    timer = StartupTimer()
+    app = ServiceFlask(__name__)
+    app.startup_timings = timer.timings
 
     app.config.from_object(config_class)
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["DROPZONE_ENABLE_CSRF"] = True
+    timer.mark("config")
 
+    database.configure(app)
     db.init_app(app)
-    migrate.init_app(app, db, render_as_batch=True)
     csrf.init_app(app)
     mail.init_app(app)
     babel.init_app(app, locale_selector=get_locale)
     moment.init_app(app)
     dropzone.init_app(app)
 
+    # clients are created on first use, see app.services
+    app.services.register("redis", create_redis, close=lambda client: client.close())
+    app.services.register("task_queue", create_task_queue)
+    app.services.register(
+        "elasticsearch",
+        create_elasticsearch,
+        close=lambda client: client.close(),
+        fork_safe=False,
+    )
+    app.services.register("search_backend", create_search_backend, fork_safe=False)
+    app.services.register("translator", create_translator)
+    timer.mark("extensions")
+
     user_datastore = SQLAlchemyUserDatastore(db, User, Role, WebAuthn)
-    security.init_app(app, user_datastore)
+    security.init_app(app, user_datastore, mail_util_cls=DispatchingMailUtil)
+    timer.mark("security")
+    if app.config["SESSION_TYPE"] == "redis":
+        # building the client opens no connection; the pool connects on demand
+        app.config.setdefault("SESSION_REDIS", app.redis)
     session.init_app(app)
 
-    app.elasticsearch = (
-        Elasticsearch(
-            [app.config["ELASTICSEARCH_URL"]],
-            api_key=app.config["ELASTICSEARCH_API_KEY"],
-        )
-        if app.config["ELASTICSEARCH_ENABLED"]
-        else None
-    )
-    app.redis = Redis.from_url(app.config["RQ_REDIS_URL"])
-    app.task_queue = rq.Queue("microblog-tasks", connection=app.redis)
+    app.http = HTTPClient(app.config)
+    app.email_dispatcher = EmailDispatcher(app)
+    if app.config["CACHE_TYPE"] == "RedisCache":
+        app.config.setdefault("CACHE_REDIS_HOST", app.redis)
+    cache.init_app(app)
+    timer.mark("sessions and cache")
 
     @app.route("/favicon.ico")
     def favicon():
@@ -88,8 +115,13 @@ def create_app(config_class=Config):
     from app.dash import bp as dash_bp
 
     app.register_blueprint(dash_bp,url_prefix="/dash")
-
-    with app.app_context():
-        db.create_all()
+    timer.mark("blueprints")
+
+    # the schema belongs to migrations ("flask db upgrade" in run.sh); only
+    # empty and throwaway databases are created on boot
+    if app.config["DATABASE_CREATE_ALL"] != "false":
+        with app.app_context():
+            database.create_schema(app)
+        timer.mark("create tables")
 
     return app
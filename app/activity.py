@@ -0,0 +1,103 @@
+"""Write-behind tracking of when users were last seen.
+
+Requests only record a timestamp in a Redis hash keyed by user id, so a
+page view never opens a write transaction. Repeated hits from the same
+user overwrite the same field, and each process skips users it already
+touched within ``ACTIVITY_RESOLUTION`` seconds. A job
+(``app.tasks.flush_activity``) copies the pending timestamps to
+``User.last_seen`` in batches every ``ACTIVITY_FLUSH_INTERVAL`` seconds.
+
+The job schedules its next run with RQ's ``enqueue_in``, so workers must
+run RQ's scheduler (``flask worker`` does by default). The first
+recorded hit starts the chain, and the next hit after it has lapsed (a
+lost job leaves the flag to expire) starts a new one.
+"""
+
+from datetime import datetime, timedelta, timezone
+from time import time
+
+import sqlalchemy as sa
+from flask import current_app
+from redis.exceptions import RedisError
+
+from app.extensions import db
+from app.models import User
+from app import metrics
+
+ACTIVITY_KEY = "activity:last_seen"
+ACTIVITY_PROCESSING_KEY = "activity:last_seen:processing"
+FLUSH_SCHEDULED_KEY = "activity:flush:scheduled"
+
+_recent = {}
+
+
+def touch(user_id, now=None):
+    now = time() if now is None else now
+    resolution = current_app.config["ACTIVITY_RESOLUTION"]
+    if now - _recent.get(user_id, 0) < resolution:
+        return
+    try:
+        current_app.redis.hset(ACTIVITY_KEY, user_id, int(now))
+        schedule_flush()
+    except RedisError:
+        return
+    if len(_recent) > 10_000:
+        _recent.clear()
+    _recent[user_id] = now
+
+
+def pop_activity():
+    redis = current_app.redis
+    if not redis.exists(ACTIVITY_PROCESSING_KEY):
+        try:
+            redis.rename(ACTIVITY_KEY, ACTIVITY_PROCESSING_KEY)
+        except RedisError:
+            # nothing recorded since the last flush
+            return {}
+    return {
+        int(user_id): datetime.fromtimestamp(int(seen), timezone.utc)
+        for user_id, seen in redis.hgetall(ACTIVITY_PROCESSING_KEY).items()
+    }
+
+
+def flush_activity(batch_size=None):
+    """Write pending last-seen timestamps to the database; returns the count."""
+    batch_size = batch_size or current_app.config["ACTIVITY_FLUSH_BATCH_SIZE"]
+    seen = sorted(pop_activity().items())
+    users = User.__table__
+    # a Core executemany, so users deleted since their last hit are skipped
+    statement = (
+        sa.update(users)
+        .where(users.c.id == sa.bindparam("user_id"))
+        .values(last_seen=sa.bindparam("last_seen"))
+    )
+    for start in range(0, len(seen), batch_size):
+        db.session.execute(
+            statement,
+            [
+                {"user_id": user_id, "last_seen": last_seen}
+                for user_id, last_seen in seen[start:start + batch_size]
+            ],
+        )
+        db.session.commit()
+    current_app.redis.delete(ACTIVITY_PROCESSING_KEY)
+    metrics.incr("activity.flushed", len(seen))
+    return len(seen)
+
+
+def schedule_flush():
+    """Enqueue the next flush unless one is already scheduled.
+
+    Returns True when a job was enqueued.
+    """
+    redis = current_app.redis
+    interval = current_app.config["ACTIVITY_FLUSH_INTERVAL"]
+    # expires if the scheduled job is lost, so the next hit starts a new chain
+    if not redis.set(FLUSH_SCHEDULED_KEY, 1, nx=True, ex=interval * 3):
+        return False
+    current_app.task_queue.enqueue_in(
+        timedelta(seconds=interval),
+        "app.tasks.flush_activity",
+        description="Flush last-seen timestamps",
+    )
+    return True
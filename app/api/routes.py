@@ -1,11 +1,28 @@
 from app.api import bp
-from app.extensions import db
 from flask import request, abort, jsonify, url_for, current_app
-from app.models import User, Post, Task
-import sqlalchemy as sa
+from app.models import User, Post
+from app import queries, metrics
+from app.pagination import keyset_paginate, cached_count
+from app.jobs.webmention import (
+    blog_slug,
+    pending_count,
+    queue_webmention,
+    recently_seen,
+)
+from app.ratelimit import take_tokens
+from app.database import use_replica
+from redis.exceptions import RedisError
+from werkzeug.exceptions import TooManyRequests
 import httpx
+import ipaddress
 from urllib.parse import urlparse
 
+
+@bp.before_request
+def read_from_replica():
+    use_replica()
+
+
 def is_url(string):
     try:
         result = urlparse(string)
@@ -15,13 +32,11 @@ def is_url(string):
 
 def is_valid_webmention(source, target):
     try:
-        resp = httpx.get(source, timeout=5)
+        resp = current_app.http.get(source, timeout=5)
         if resp.status_code == 200 and target in resp.text:
             return True
     except httpx.HTTPError:
         return False
-    except httpx.TimeoutException:
-        return False
     return False
     
 
@@ -100,18 +115,16 @@ def get_actor_url(username: str):
 @bp.route("/actors/<string:username>/outbox")
 def outbox(username: str):
     user = User.query.filter_by(username=username).first_or_404()
-    page = request.args.get("page", 1, type=int)
-    query = (
-        sa.select(Post).where(Post.user_id == user.id).order_by(Post.created_at.desc())
-    )
-    posts_paginated = db.paginate(
-        query, page=page, per_page=current_app.config["POSTS_PER_PAGE"], error_out=False
+    posts_paginated = keyset_paginate(
+        queries.outbox_posts(user.id),
+        current_app.config["POSTS_PER_PAGE"],
+        after=request.args.get("after"),
     )
     next_url = (
         url_for(
             "api.outbox",
             username=username,
-            page=posts_paginated.next_num,
+            after=posts_paginated.next_cursor,
             _external=True,
         )
         if posts_paginated.has_next
@@ -134,14 +147,20 @@ def outbox(username: str):
                 "to": ["https://www.w3.org/ns/activitystreams#Public"],
                 "object": {
                     "id": url_for(
-                        "main.view_post", post_id=post.id, _external=True
+                        "main.view_post",
+                        post_id=post.id,
+                        slug=post.blog.slug,
+                        _external=True,
                     ),  # User-readable version
                     "type": "Note",
                     "attributedTo": get_actor_url(username),
-                    "content": post.content,
+                    "content": post.content_html,
                     "published": post.created_at.isoformat(),
                     "url": url_for(
-                        "main.view_post", post_id=post.id, _external=True
+                        "main.view_post",
+                        post_id=post.id,
+                        slug=post.blog.slug,
+                        _external=True,
                     ),  # Explicit user-readable link
                 },
             }
@@ -151,7 +170,10 @@ def outbox(username: str):
             "@context": "https://www.w3.org/ns/activitystreams",
             "id": f"{get_actor_url(username)}/outbox",
             "type": "OrderedCollectionPage",
-            "totalItems": len(user.posts),
+            "totalItems": cached_count(
+                f"post-count:user:{user.id}",
+                queries.count_posts(Post.user_id == user.id),
+            ),
             "orderedItems": posts,
             "next": next_url,
         }
@@ -177,7 +199,7 @@ def get_activity(username, post_id):
                 "id": url_for("main.view_post", post_id=post.id, _external=True),
                 "type": "Note",
                 "attributedTo": get_actor_url(username),
-                "content": post.content,
+                "content": post.content_html,
                 "published": post.created_at.isoformat(),
                 "url": url_for("main.view_post", post_id=post.id, _external=True),
             },
@@ -195,12 +217,57 @@ def webmention_endpoint():
         abort(400, "Invalid URL format")
     if urlparse(target).netloc != urlparse(request.host_url).netloc:
         abort(400, "Target must be on this domain")
-    task = Task.launch_userless_task(
-        "jobs.webmention.process_webmention",
-        source=source,
-        target=target
-    )
-    if not task:
+    config = current_app.config
+    retry_after = config["WEBMENTION_RETRY_AFTER"]
+    try:
+        if (
+            len(current_app.task_queue) > config["WEBMENTION_MAX_QUEUE_DEPTH"]
+            or pending_count() > config["WEBMENTION_MAX_PENDING"]
+        ):
+            metrics.incr("webmention.rejected.backpressure")
+            raise TooManyRequests("Webmention queue is full", retry_after=retry_after)
+        if recently_seen(source, target):
+            metrics.incr("webmention.duplicate")
+            return '', 202
+        buckets = [
+            ("source", urlparse(source).hostname, config["WEBMENTION_SOURCE_BURST"],
+             config["WEBMENTION_SOURCE_PER_MINUTE"]),
+            ("target", blog_slug(target) or urlparse(target).hostname,
+             config["WEBMENTION_TARGET_BURST"], config["WEBMENTION_TARGET_PER_MINUTE"]),
+        ]
+        empty = take_tokens(
+            [
+                (f"webmention:{scope}:{key}", burst, per_minute / 60)
+                for scope, key, burst, per_minute in buckets
+            ]
+        )
+        if empty is not None:
+            scope = buckets[empty][0]
+            metrics.incr(f"webmention.rejected.{scope}")
+            raise TooManyRequests(
+                f"Too many webmentions for this {scope}", retry_after=retry_after
+            )
+        queue_webmention(source, target)
+    except RedisError:
         abort(500, "Failed to process webmention")
+    metrics.incr("webmention.accepted")
     return '', 202
 
+
+
+def _metrics_allowed(address):
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network.strip(), strict=False)
+        for network in current_app.config["METRICS_ALLOWED_NETWORKS"]
+    )
+
+
+@bp.route("/metrics")
+def metrics_endpoint():
+    if not _metrics_allowed(request.remote_addr or ""):
+        abort(403)
+    return metrics.render_prometheus(), 200, {"Content-Type": "text/plain; version=0.0.4"}
@@ -2,4 +2,4 @@ from flask import Blueprint
 
 bp = Blueprint("cli", __name__, cli_group=None)
 
-from app.cli import translate  # noqa
+from app.cli import translate, search, activity, language, newsletter, content, worker, migrate, perf  # noqa
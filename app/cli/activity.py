@@ -0,0 +1,28 @@
+import click
+from flask import current_app
+from app.cli import bp
+from app import activity as tracker
+
+
+@bp.cli.group()
+def activity():
+    """User activity commands."""
+    pass
+
+
+@activity.command()
+def flush():
+    """Write buffered last-seen timestamps to the database now."""
+    click.echo(f"Flushed last-seen times for {tracker.flush_activity()} users")
+
+
+@activity.command()
+def schedule():
+    """Start the periodic flush now instead of on the next page view."""
+    if not tracker.schedule_flush():
+        click.echo("An activity flush is already scheduled")
+        return
+    click.echo(
+        "Scheduled activity flush every "
+        f"{current_app.config['ACTIVITY_FLUSH_INTERVAL']}s"
+    )
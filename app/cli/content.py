@@ -0,0 +1,22 @@
+import click
+from app.cli import bp
+from app import content as rendering
+
+
+@bp.cli.group()
+def content():
+    """Post content commands."""
+    pass
+
+
+@content.command()
+@click.option("--all", "redo", is_flag=True, help="Render every post again.")
+@click.option("--batch-size", type=int, default=500, help="Posts per batch.")
+def render(redo, batch_size):
+    """Render the HTML and excerpt of posts that do not have them yet."""
+
+    def report(done, total):
+        click.echo(f"\rposts: {done}/{total}", nl=False)
+
+    done = rendering.backfill(redo=redo, batch_size=batch_size, progress=report)
+    click.echo(f"\rposts: {done} rendered")
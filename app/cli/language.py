@@ -0,0 +1,22 @@
+import click
+from app.cli import bp
+from app import language as detection
+
+
+@bp.cli.group()
+def language():
+    """Post language detection commands."""
+    pass
+
+
+@language.command()
+@click.option("--all", "redo", is_flag=True, help="Detect every post again.")
+@click.option("--batch-size", type=int, help="Posts per batch.")
+def backfill(redo, batch_size):
+    """Detect the language of posts that do not have one yet."""
+
+    def report(done, total, rate):
+        click.echo(f"\rposts: {done}/{total} ({rate:.0f} posts/s)", nl=False)
+
+    done = detection.backfill(redo=redo, batch_size=batch_size, progress=report)
+    click.echo(f"\rposts: {done} languages detected")
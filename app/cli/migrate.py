@@ -0,0 +1,33 @@
+import click
+from flask import current_app
+from app.cli import bp
+from app.extensions import db
+from app.search.backends import include_object
+
+
+class MigrateGroup(click.Group):
+    """``flask db``, with Flask-Migrate and Alembic imported on first use.
+
+    Importing Alembic costs about 0.2s and it is only needed to run
+    migrations, so web and worker processes never load it.
+    """
+
+    def _load(self):
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as db_group
+
+        if "migrate" not in current_app.extensions:
+            Migrate(current_app, db, render_as_batch=True, include_object=include_object)
+        self.params = db_group.params
+        self.callback = db_group.callback
+        self.commands = db_group.commands
+
+    def parse_args(self, ctx, args):
+        self._load()
+        return super().parse_args(ctx, args)
+
+    def list_commands(self, ctx):
+        self._load()
+        return super().list_commands(ctx)
+
+bp.cli.add_command(MigrateGroup("db", help="Perform database migrations."))
@@ -0,0 +1,17 @@
+import click
+from flask import current_app
+from app.cli import bp
+
+
+@bp.cli.group()
+def newsletter():
+    """Newsletter commands."""
+    pass
+
+
+@newsletter.command()
+@click.argument("blog_id", type=int)
+def send(blog_id):
+    """Queue a newsletter issue for a blog's subscribers."""
+    current_app.task_queue.enqueue("app.tasks.send_newsletter", blog_id)
+    click.echo(f"Queued the newsletter for blog {blog_id}")
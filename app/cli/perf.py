@@ -0,0 +1,47 @@
+import json
+import click
+from app.cli import bp
+from app import startup
+
+
+@bp.cli.group()
+def perf():
+    """Performance measurement commands."""
+    pass
+
+
+@perf.command("startup")
+@click.option(
+    "--config", default="config.Config", show_default=True, help="Config class to boot with."
+)
+@click.option(
+    "--by",
+    type=click.Choice(["package", "module"]),
+    default="package",
+    show_default=True,
+    help="Group import times by top-level package or list single modules.",
+)
+@click.option("--limit", type=int, default=20, show_default=True, help="Imports to list.")
+@click.option("--as-json", is_flag=True, help="Print the full measurement as JSON.")
+def startup_command(config, by, limit, as_json):
+    """Time a cold start of the app: imports and each create_app phase."""
+    timings = startup.measure_startup(config)
+    if as_json:
+        click.echo(json.dumps(timings, indent=2))
+        return
+
+    click.echo(f"{'import app':<32}{timings['import'] * 1000:>10.1f}ms")
+    click.echo(f"{'create_app':<32}{timings['create_app'] * 1000:>10.1f}ms")
+    for phase, seconds in timings["phases"].items():
+        click.echo(f"  {phase:<30}{seconds * 1000:>10.1f}ms")
+
+    click.echo()
+    if by == "package":
+        click.echo(f"{'package':<32}{'self':>12}{'modules':>10}")
+        for name, own, count in startup.by_package(timings["imports"])[:limit]:
+            click.echo(f"{name:<32}{own * 1000:>10.1f}ms{count:>10}")
+    else:
+        click.echo(f"{'module':<48}{'self':>12}{'cumulative':>14}")
+        imports = sorted(timings["imports"], key=lambda i: i[1], reverse=True)
+        for module, own, cumulative in imports[:limit]:
+            click.echo(f"{module:<48}{own * 1000:>10.1f}ms{cumulative * 1000:>12.1f}ms")
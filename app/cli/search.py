@@ -0,0 +1,54 @@
+import click
+from flask import current_app
+from app.cli import bp
+from app.extensions import db
+from app.models import SearchableMixin, Task
+
+
+@bp.cli.group()
+def search():
+    """Search index commands."""
+    pass
+
+
+@search.command()
+@click.argument("models", nargs=-1)
+@click.option("--chunk-size", type=int, help="Documents per bulk request.")
+@click.option("--threads", type=int, help="Concurrent bulk requests.")
+@click.option(
+    "--background", is_flag=True, help="Run as a task on the RQ queue instead."
+)
+def reindex(models, chunk_size, threads, background):
+    """Rebuild the search index for MODELS (default: all searchable models)."""
+    available = SearchableMixin.searchable_models()
+    failures = 0
+    for name in models:
+        if name not in available:
+            raise click.BadParameter(
+                f"{name} is not searchable (choose from {', '.join(available)})"
+            )
+    for name in models or available:
+        if background:
+            task = Task.launch_userless_task(
+                "tasks.reindex",
+                f"Reindex {name}",
+                name,
+                chunk_size=chunk_size,
+                thread_count=threads,
+            )
+            db.session.commit()
+            click.echo(f"Queued reindex of {name} as task {task.id}")
+            continue
+        if not current_app.search_backend:
+            raise click.ClickException("No search backend is configured.")
+
+        def report(done, total, rate, name=name):
+            click.echo(f"\r{name}: {done}/{total} ({rate:.0f} docs/s)", nl=False)
+
+        indexed, failed = available[name].reindex(
+            chunk_size=chunk_size, thread_count=threads, progress=report
+        )
+        click.echo(f"\r{name}: {indexed} documents indexed, {failed} failed")
+        failures += failed
+    if failures:
+        raise click.ClickException(f"{failures} documents could not be indexed.")
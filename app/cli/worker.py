@@ -0,0 +1,21 @@
+import click
+from flask import current_app
+from app.cli import bp
+
+
+@bp.cli.command()
+@click.option("--burst", is_flag=True, help="Exit once the queue is empty.")
+@click.option(
+    "--with-scheduler/--without-scheduler",
+    default=True,
+    show_default=True,
+    help="Run RQ's scheduler, which enqueues delayed jobs and job retries "
+    "(the activity flush, webmention and search retries) when they are due.",
+)
+def worker(burst, with_scheduler):
+    """Run an RQ worker for the task queue inside the app context."""
+    from rq import Worker
+
+    Worker([current_app.task_queue], connection=current_app.redis).work(
+        burst=burst, with_scheduler=with_scheduler
+    )
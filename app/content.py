@@ -0,0 +1,181 @@
+"""Rendering of post content.
+
+A post keeps its source in ``Post.content`` (HTML from the editor or
+markdown from an import, see ``Post.content_format``). Whenever the source
+changes it is rendered once, before the flush, into sanitized HTML
+(``Post.content_html``) and a plain-text ``Post.excerpt``. Views, feeds
+and emails read those columns and never sanitize or convert on the read
+path.
+
+Bleach cleaners and Markdown instances keep parser state, so each thread
+builds its own once and reuses it.
+"""
+
+import html
+import re
+import threading
+
+import bleach
+import sqlalchemy as sa
+
+from app.extensions import db
+from app.models import Post
+
+ALLOWED_TAGS = [
+    "p",
+    "br",
+    "hr",
+    "strong",
+    "em",
+    "u",
+    "s",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "a",
+    "img",
+    "ul",
+    "ol",
+    "li",
+    "blockquote",
+    "code",
+    "pre",
+]
+ALLOWED_ATTRIBUTES = {
+    "a": ["href", "title", "rel"],
+    "img": ["src", "alt", "title", "width", "height"],
+}
+ALLOWED_PROTOCOLS = ["http", "https", "mailto"]
+FORMATS = ("html", "markdown")
+EXCERPT_LENGTH = 200
+# block-level tags separate words once the markup is stripped
+BLOCK_TAG = re.compile(
+    r"<(?=/?(?:p|br|hr|h[1-6]|li|ul|ol|blockquote|pre|div|table|tr|td|th)\b)", re.I
+)
+
+_local = threading.local()
+
+
+def _html_cleaner():
+    if not hasattr(_local, "html_cleaner"):
+        _local.html_cleaner = bleach.sanitizer.Cleaner(
+            tags=ALLOWED_TAGS,
+            attributes=ALLOWED_ATTRIBUTES,
+            protocols=ALLOWED_PROTOCOLS,
+            strip=True,
+        )
+    return _local.html_cleaner
+
+
+def _text_cleaner():
+    if not hasattr(_local, "text_cleaner"):
+        _local.text_cleaner = bleach.sanitizer.Cleaner(tags=[], strip=True)
+    return _local.text_cleaner
+
+
+def _markdown():
+    if not hasattr(_local, "markdown"):
+        import markdown
+
+        _local.markdown = markdown.Markdown(extensions=["fenced_code", "tables"])
+    return _local.markdown.reset()
+
+
+def clean_html(source):
+    """Sanitize editor HTML down to the allowed tags and attributes."""
+    return _html_cleaner().clean(source or "")
+
+
+def plain_text(source):
+    """Strip every tag from ``source`` and collapse whitespace."""
+    text = _text_cleaner().clean(BLOCK_TAG.sub(" <", source or ""))
+    return " ".join(html.unescape(text).split())
+
+
+def make_excerpt(text, length=EXCERPT_LENGTH):
+    """Cut plain text at a word boundary, adding an ellipsis when shortened."""
+    if len(text) <= length:
+        return text
+    cut = text[: length + 1]
+    cut = cut.rsplit(" ", 1)[0] if " " in cut else text[:length]
+    return cut.rstrip(" ,.;:") + "…"
+
+
+def render(source, format="html"):
+    """Return ``(sanitized_html, excerpt)`` for post source text."""
+    if format not in FORMATS:
+        raise ValueError(f"Unknown content format {format!r}")
+    if format == "markdown":
+        source = _markdown().convert(source or "")
+    rendered = clean_html(source)
+    return rendered, make_excerpt(plain_text(rendered))
+
+
+def render_post(post):
+    post.content_html, post.excerpt = render(post.content, post.content_format or "html")
+
+
+def backfill(redo=False, batch_size=500, progress=None):
+    """Render every post that has no rendered content yet.
+
+    Walks the table by primary key in batches, committing each batch, and
+    calls ``progress(done, total)`` after every batch. With ``redo`` every
+    post is rendered again, e.g. after changing the allowed tags.
+    """
+    posts_table = Post.__table__
+    statement = (
+        sa.update(posts_table)
+        .where(posts_table.c.id == sa.bindparam("post_id"))
+        .values(
+            content_html=sa.bindparam("rendered_html"),
+            excerpt=sa.bindparam("rendered_excerpt"),
+        )
+    )
+    criteria = [] if redo else [Post.content_html.is_(None)]
+    total = db.session.scalar(sa.select(sa.func.count(Post.id)).where(*criteria))
+    done, last_id = 0, 0
+    while True:
+        rows = db.session.execute(
+            sa.select(Post.id, Post.content, Post.content_format)
+            .where(Post.id > last_id, *criteria)
+            .order_by(Post.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        updates = []
+        for row in rows:
+            rendered, excerpt = render(row.content, row.content_format or "html")
+            updates.append(
+                {
+                    "post_id": row.id,
+                    "rendered_html": rendered,
+                    "rendered_excerpt": excerpt,
+                }
+            )
+        db.session.execute(statement, updates)
+        db.session.commit()
+        done += len(rows)
+        if progress:
+            progress(done, total)
+    return done
+
+
+def before_flush(session, flush_context, instances):
+    for obj in session.new:
+        if isinstance(obj, Post):
+            render_post(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Post):
+            attrs = sa.inspect(obj).attrs
+            if (
+                attrs.content.history.has_changes()
+                or attrs.content_format.history.has_changes()
+            ):
+                render_post(obj)
+
+
+db.event.listen(db.session, "before_flush", before_flush)
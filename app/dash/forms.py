@@ -1,10 +1,20 @@
 from wtforms.validators import ValidationError
 from flask_wtf import FlaskForm
-from wtforms import StringField, TextAreaField, SubmitField, HiddenField, BooleanField
+from wtforms import (
+    StringField,
+    TextAreaField,
+    SubmitField,
+    HiddenField,
+    BooleanField,
+    SelectField,
+)
 from wtforms.validators import DataRequired
 from wtforms.widgets import TextArea
 from flask_babel import _, lazy_gettext as _l
 from flask import request
+import sqlalchemy as sa
+from app import db
+from app.models import Blog
 
 
 class TinyMCEWidget(TextArea):
@@ -35,6 +45,18 @@ class BannedSlugValidator:
             raise ValidationError(_("This slug is not allowed."))
 
 
+class UniqueSlugValidator:
+    """Reject slugs used by another blog; the form's ``blog_id`` is skipped."""
+
+    def __call__(self, form, field):
+        query = sa.select(Blog.id).where(Blog.slug == field.data)
+        blog_id = getattr(form, "blog_id", None)
+        if blog_id is not None:
+            query = query.where(Blog.id != blog_id)
+        if db.session.scalar(query):
+            raise ValidationError(_("This slug is already taken."))
+
+
 class PostForm(FlaskForm):
     title = StringField(_l("Title"), validators=[DataRequired()])
     content = TinyMCEField(_l("Content"), validators=[DataRequired()])
@@ -68,13 +90,19 @@ class PostActionForm(FlaskForm):
 class BlogForm(FlaskForm):
     title = StringField(_l("Title"), validators=[DataRequired()])
     slug = StringField(
-        _l("URL Slug"), validators=[DataRequired(), BannedSlugValidator()]
+        _l("URL Slug"),
+        validators=[DataRequired(), BannedSlugValidator(), UniqueSlugValidator()],
     )
 
     description = TextAreaField(_l("Description"))
     newsletter = BooleanField(_l("Newsletter"))
     submit = SubmitField(_l("Create Blog"))
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # the blog being edited may keep its own slug
+        self.blog_id = getattr(kwargs.get("obj"), "id", None)
+
 
 class BlogActionForm(FlaskForm):
     blog_id = HiddenField(_l("Blog ID"), validators=[DataRequired()])
@@ -99,5 +127,17 @@ class CommentForm(FlaskForm):
     submit = SubmitField(_l("Submit Comment"))
 
 
+class ExportForm(FlaskForm):
+    format = SelectField(
+        _l("Format"),
+        choices=[
+            ("jsonl", _l("JSON Lines")),
+            ("json", _l("JSON")),
+            ("zip", _l("Markdown (zip)")),
+        ],
+    )
+    submit = SubmitField(_l("Export posts"))
+
+
 class EmptyForm(FlaskForm):
     submit = SubmitField("Submit")
@@ -7,11 +7,17 @@ from flask import (
     abort,
     g,
     current_app,
+    send_file,
+    jsonify,
 )
-from langdetect import detect, LangDetectException
 from app.extensions import db
 from app.models import Post, Blog, Page
 from app.dash import bp
+from app import exports, imports, queries
+from app.progress import read_progress
+from redis.exceptions import RedisError
+from app.content import clean_html
+from app.pagination import paginate_posts
 from app.dash.forms import (
     PostForm,
     PostActionForm,
@@ -19,6 +25,7 @@ from app.dash.forms import (
     BlogActionForm,
     PageForm,
     PageActionForm,
+    ExportForm,
 )
 from flask_security import auth_required, current_user
 from flask_babel import _, get_locale
@@ -26,8 +33,6 @@ import bleach
 import os
 from datetime import datetime, timezone
 import sqlalchemy as sa
-import markdown
-import frontmatter
 
 
 @bp.route("/blog/<int:blog_id>", methods=["GET", "POST"])
@@ -47,38 +52,16 @@ def blog_admin(blog_id=None, slug=None):
     blog_action_form = BlogActionForm()
 
     if post_create_form.validate_on_submit():
-        content = bleach.clean(
-            post_create_form.content.data,
-            tags=[
-                "p",
-                "strong",
-                "em",
-                "u",
-                "h2",
-                "h3",
-                "h4",
-                "h5",
-                "h6",
-                "a",
-                "img",
-                "ul",
-                "ol",
-                "li",
-            ],
-        )
         title = bleach.clean(post_create_form.title.data)
-        try:
-            language = detect(post_create_form.content)
-        except LangDetectException:
-            language = ""
+        # content is sanitized on flush and the language is detected in
+        # the background once committed
         new_page = Post(
             title=title,
-            content=content,
+            content=post_create_form.content.data,
             blog_id=blog_id,
             user_id=current_user.id,
             published=post_create_form.published.data,
             publish_in_newsletter=post_create_form.publish_in_newsletter.data,
-            language=language,
         )
         db.session.add(new_page)
         db.session.commit()
@@ -98,25 +81,7 @@ def blog_admin(blog_id=None, slug=None):
             page = Post.query.get_or_404(post_actions_form.post_id.data)
             return redirect(url_for("main.view_post", post_id=page.id))
     if page_create_form.validate_on_submit():
-        content = bleach.clean(
-            page_create_form.content.data,
-            tags=[
-                "p",
-                "strong",
-                "em",
-                "u",
-                "h2",
-                "h3",
-                "h4",
-                "h5",
-                "h6",
-                "a",
-                "img",
-                "ul",
-                "ol",
-                "li",
-            ],
-        )
+        content = clean_html(page_create_form.content.data)
         title = bleach.clean(post_create_form.title.data)
         new_page = Page(
             title=title,
@@ -144,22 +109,8 @@ def blog_admin(blog_id=None, slug=None):
             page = Page.query.get_or_404(post_actions_form.post_id.data)
             return redirect(url_for("main.view_page", post_id=page.id))
 
-    page = request.args.get("page", 1, type=int)
-    query = (
-        sa.select(Post).where(Post.blog_id == blog_id).order_by(Post.created_at.desc())
-    )
-    posts = db.paginate(
-        query, page=page, per_page=current_app.config["POSTS_PER_PAGE"], error_out=False
-    )
-    next_url = (
-        url_for("blog_admin", blog_id=blog_id, page=posts.next_num)
-        if posts.has_next
-        else None
-    )
-    prev_url = (
-        url_for("blog_admin", blog_id=blog_id, page=posts.prev_num)
-        if posts.has_prev
-        else None
+    posts, next_url, prev_url = paginate_posts(
+        queries.blog_posts(blog.id), "dashboard.blog_admin", blog_id=blog_id, slug=slug
     )
     if current_user == Blog.query.get_or_404(blog_id).author:
         return render_template(
@@ -203,6 +154,7 @@ def dash_index():
     if create_form.validate_on_submit():
         new_blog = Blog(
             title=create_form.title.data,
+            slug=create_form.slug.data,
             description=create_form.description.data,
             author=current_user,
             newsletter=create_form.newsletter.data,
@@ -250,7 +202,65 @@ def edit_blog(blog_id: int):
 @bp.route("/account")
 @auth_required()
 def account():
-    return render_template("dash/account.html")
+    return render_template(
+        "dash/account.html",
+        export_form=ExportForm(),
+        export_task=current_user.get_task_in_progress("tasks.export_posts"),
+        latest_export=exports.latest_export(current_user.id),
+    )
+
+
+@bp.route("/exports", methods=["POST"])
+@auth_required()
+def start_export():
+    form = ExportForm()
+    if form.validate_on_submit():
+        if current_user.get_task_in_progress("tasks.export_posts"):
+            flash(_("An export is already in progress"), "error")
+        else:
+            current_user.launch_task(
+                "tasks.export_posts",
+                _("Exporting posts"),
+                form.format.data,
+                account_url=url_for("dashboard.account", _external=True),
+            )
+            db.session.commit()
+            flash(_("Export started, you will be notified when it is ready."), "success")
+    return redirect(url_for("dashboard.account"))
+
+
+@bp.route("/exports/<uuid:task_id>")
+@auth_required()
+def download_export(task_id):
+    path, mimetype = exports.find_export(current_user.id, str(task_id))
+    if path is None:
+        abort(404)
+    return send_file(
+        path,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name="posts." + path.rsplit(".", 1)[1],
+    )
+
+
+def _own_progress(task_id):
+    try:
+        progress = read_progress(task_id)
+    except RedisError:
+        current_app.logger.warning("Could not read task progress", exc_info=True)
+        abort(503)
+    if progress is None or progress["user_id"] != current_user.id:
+        abort(404)
+    return progress
+
+
+@bp.route("/tasks/<task_id>/progress")
+@auth_required()
+def task_progress(task_id):
+    """Short poll for the task banner; answered from Redis without blocking."""
+    response = jsonify(_own_progress(task_id))
+    response.cache_control.no_store = True
+    return response
 
 
 @bp.route("/<blog_id>/uploads", methods=["GET", "POST"])
@@ -260,39 +270,25 @@ def upload(blog_id=None, slug=None):
         blog = Blog.query.filter_by(slug=slug).first_or_404()
     else:
         blog = Blog.query.get_or_404(blog_id)
-    if blog.author == current_user:
-        if request.method == "POST":
-            files = request.files
-            for file in files:
-                file_content = file.stream.read()
-                if frontmatter.checks(file_content):
-                    matter = frontmatter.loads(file_content)
-                    try:
-                        html = markdown.markdown(matter.content)
-                    except Exception as e:
-                        current_app.logger.info(f"Error converting markdown file: {e}")
-                        flash(_("Failed to parse markdown"), "error")
-                        return redirect(url_for("blog_admin"))
-                    try:
-                        language = detect(html)
-                    except LangDetectException:
-                        language = ""
-                    new_post = Post(
-                        title=matter.metadata.get("title"),
-                        content=html,
-                        blog_id=blog.id,
-                        user=current_user,
-                        published=not matter.metadata.get("draft"),
-                        language=language,
-                    )
-                    db.session.add(new_post)
-                    db.session.commit()
-                else:
-                    flash(_("No front matter"), "error")
-                    return redirect(url_for("main.blog_admin"))
-        else:
-            return redirect(url_for("main.index"))
-
-    else:
+    if blog.author != current_user:
         abort(403)
-    return redirect(url_for("main.blog_admin"))
+    if request.method != "POST":
+        return redirect(url_for("main.index"))
+    files = [file for key in request.files for file in request.files.getlist(key)]
+    if not files:
+        flash(_("No files uploaded"), "error")
+        return redirect(url_for("dashboard.blog_admin", blog_id=blog.id))
+    if current_user.get_task_in_progress("tasks.import_posts"):
+        message = _("An import is already in progress")
+        if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+            # Dropzone shows the body as the upload's error
+            return message, 409
+        flash(message, "error")
+        return redirect(url_for("dashboard.blog_admin", blog_id=blog.id))
+    path = imports.spool_upload(files)
+    current_user.launch_task(
+        "tasks.import_posts", _("Importing posts"), blog.id, path
+    )
+    db.session.commit()
+    flash(_("Import started, you will be notified when it finishes."), "success")
+    return redirect(url_for("dashboard.blog_admin", blog_id=blog.id))
@@ -0,0 +1,174 @@
+"""Schema bootstrap, connection pool settings and read-replica routing.
+
+``create_schema`` gives an empty database every table at boot and stamps
+it with the latest migration.
+``configure`` builds the engine options (pool size, overflow, pre-ping,
+recycle, statement timeout) from the ``DATABASE_*`` settings and adds one
+``replica_<n>`` bind per URL in ``DATABASE_REPLICA_URLS``.
+
+Read-only public views are decorated with ``replica_reads`` and API GETs
+call ``use_replica``. Those requests pick one replica, and
+``RoutingSession`` sends their SELECTs to it. Flushes, writes and every
+query after a flush in the same transaction still go to the primary.
+
+Page and feed cache misses are rendered from the primary (``use_primary``),
+so a lagging replica never refills a cache that a commit just invalidated.
+
+Replicas lag behind the primary. So once a request commits, the rest of
+it reads from the primary, and the client gets a short-lived cookie that
+keeps its next requests on the primary too. An author therefore sees
+their own post right after saving it.
+"""
+
+import os
+import random
+from functools import wraps
+
+import sqlalchemy as sa
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+
+PIN_COOKIE = "db_primary"
+
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(config, uri):
+    url = sa.engine.make_url(uri)
+    options = {"pool_pre_ping": config["DATABASE_POOL_PRE_PING"]}
+    if _is_memory_sqlite(url):
+        # Flask-SQLAlchemy gives in-memory databases a single static connection
+        return options
+    options.update(
+        pool_size=config["DATABASE_POOL_SIZE"],
+        max_overflow=config["DATABASE_MAX_OVERFLOW"],
+        pool_timeout=config["DATABASE_POOL_TIMEOUT"],
+        pool_recycle=config["DATABASE_POOL_RECYCLE"],
+    )
+    timeout = config["DATABASE_STATEMENT_TIMEOUT"]
+    if timeout and url.get_backend_name() == "postgresql":
+        options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+def configure(app):
+    config = app.config
+    options = engine_options(config, config["SQLALCHEMY_DATABASE_URI"])
+    # settings given explicitly in SQLALCHEMY_ENGINE_OPTIONS win
+    options.update(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+    binds = dict(config.get("SQLALCHEMY_BINDS") or {})
+    replicas = []
+    for i, uri in enumerate(config["DATABASE_REPLICA_URLS"]):
+        key = f"replica_{i}"
+        binds[key] = {"url": uri, **engine_options(config, uri)}
+        replicas.append(key)
+    config["SQLALCHEMY_BINDS"] = binds
+    config["DATABASE_REPLICA_BINDS"] = replicas
+    app.after_request(_pin_to_primary)
+
+
+def create_schema(app):
+    """Create the tables of an empty database and stamp it as migrated.
+
+    With ``DATABASE_CREATE_ALL = "auto"`` a database that already has an
+    ``alembic_version`` table is left to migrations. Replicas copy the
+    primary, so only the primary bind is created.
+    """
+    db = app.extensions["sqlalchemy"]
+    auto = app.config["DATABASE_CREATE_ALL"] == "auto"
+    if auto and sa.inspect(db.engine).has_table("alembic_version"):
+        return
+    db.create_all(bind_key=None)
+    if auto:
+        from alembic.runtime.migration import MigrationContext
+        from alembic.script import ScriptDirectory
+
+        script = ScriptDirectory(os.path.join(os.path.dirname(app.root_path), "migrations"))
+        with db.engine.begin() as connection:
+            MigrationContext.configure(connection).stamp(script, "head")
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if (
+            bind is None
+            and not self._flushing
+            and not self.info.get("db_wrote")
+            and getattr(clause, "is_select", False)
+            and has_app_context()
+            and g.get("db_replica")
+            and engine is self._db.engine
+        ):
+            return self._db.engines[g.db_replica]
+        return engine
+
+
+def use_replica():
+    """Read from a replica for the rest of this request, if that is safe."""
+    replicas = current_app.config["DATABASE_REPLICA_BINDS"]
+    if (
+        replicas
+        and request.method in ("GET", "HEAD")
+        and not request.cookies.get(PIN_COOKIE)
+        and not g.get("db_wrote")
+    ):
+        g.db_replica = random.choice(replicas)
+
+
+def use_primary():
+    """Send the rest of this request's reads to the primary.
+
+    Anything written to a shared cache must be built from the primary: a
+    replica that has not caught up with the commit that invalidated the
+    entry would store stale content under the new cache generation.
+    Returns True if the request had been reading from a replica.
+    """
+    return g.pop("db_replica", None) is not None
+
+
+def replica_reads(view):
+    """Serve GET and HEAD requests for ``view`` from a read replica."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        use_replica()
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def _pin_to_primary(response):
+    if g.get("db_wrote") and current_app.config["DATABASE_REPLICA_BINDS"]:
+        response.set_cookie(
+            PIN_COOKIE,
+            "1",
+            max_age=current_app.config["DATABASE_REPLICA_PIN_SECONDS"],
+            secure=request.is_secure,
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
+
+
+def after_flush(session, flush_context):
+    session.info["db_wrote"] = True
+
+
+def after_commit(session):
+    if session.info.pop("db_wrote", False) and has_app_context():
+        g.db_wrote = True
+        g.pop("db_replica", None)
+
+
+def after_rollback(session):
+    session.info.pop("db_wrote", None)
+
+
+sa.event.listen(RoutingSession, "after_flush", after_flush)
+sa.event.listen(RoutingSession, "after_commit", after_commit)
+sa.event.listen(RoutingSession, "after_rollback", after_rollback)
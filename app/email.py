@@ -1,13 +1,156 @@
-from threading import Thread
+"""Outgoing email.
+
+Asynchronous messages are handed to ``current_app.email_dispatcher``, a
+pool of ``EMAIL_WORKERS`` threads fed from a queue of at most
+``EMAIL_BACKLOG`` messages. Each worker keeps one SMTP connection open
+while mail keeps arriving and closes it after ``EMAIL_IDLE_TIMEOUT``
+seconds without any. When the backlog is full the caller sends the
+message itself, so a burst slows requests down instead of piling up
+threads. Messages still queued when the process exits are sent first.
+
+With ``EMAIL_WORKERS = 0`` every message is sent inline.
+"""
+
+import atexit
+import os
+import queue
+import smtplib
+import threading
+from time import monotonic
+from typing import Any
+
 from flask import current_app
 from flask_mail import Message
-from extensions import mail
-from typing import Any
+from flask_security import MailUtil
 
+from app import metrics
+from app.extensions import mail
 
-def send_async_email(app, msg):
-    with app.app_context():
-        mail.send(msg)
+
+def _close(connection):
+    if connection is not None:
+        try:
+            connection.__exit__(None, None, None)
+        except (smtplib.SMTPException, OSError):
+            pass
+    return None
+
+
+def _deliver(connection, msg):
+    """Send ``msg`` on ``connection``, reconnecting once if it went stale.
+
+    Returns the connection to keep using.
+    """
+    for attempt in range(2):
+        if connection is None:
+            connection = mail.connect().__enter__()
+        started = monotonic()
+        try:
+            connection.send(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            connection = _close(connection)
+            if attempt:
+                raise
+            continue
+        metrics.incr("email.sent")
+        metrics.incr("email.send_ms", int((monotonic() - started) * 1000))
+        return connection
+
+
+class EmailDispatcher:
+    def __init__(self, app):
+        config = app.config
+        self.app = app
+        self.workers = config["EMAIL_WORKERS"]
+        self.backlog = config["EMAIL_BACKLOG"]
+        self.idle_timeout = config["EMAIL_IDLE_TIMEOUT"]
+        self.submit_timeout = config["EMAIL_SUBMIT_TIMEOUT"]
+        self._queue = None
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._registered = False
+
+    def _start(self):
+        if self._queue is None or self._pid != os.getpid():
+            with self._lock:
+                if self._queue is None or self._pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=self.backlog)
+                    self._threads = [
+                        threading.Thread(
+                            target=self._run,
+                            args=(self._queue,),
+                            name=f"email-{i}",
+                            daemon=True,
+                        )
+                        for i in range(self.workers)
+                    ]
+                    for thread in self._threads:
+                        thread.start()
+                    self._pid = os.getpid()
+                    if not self._registered:
+                        atexit.register(self.shutdown)
+                        self._registered = True
+        return self._queue
+
+    def submit(self, msg):
+        if self.workers <= 0:
+            _close(_deliver(None, msg))
+            return
+        try:
+            self._start().put((msg, monotonic()), timeout=self.submit_timeout)
+        except queue.Full:
+            metrics.incr("email.backlog_full")
+            _close(_deliver(None, msg))
+
+    def _run(self, messages):
+        with self.app.app_context():
+            connection = None
+            while True:
+                try:
+                    item = messages.get(
+                        timeout=self.idle_timeout if connection else None
+                    )
+                except queue.Empty:
+                    connection = _close(connection)
+                    continue
+                if item is None:
+                    messages.task_done()
+                    break
+                msg, queued_at = item
+                metrics.incr("email.queue_ms", int((monotonic() - queued_at) * 1000))
+                try:
+                    connection = _deliver(connection, msg)
+                except Exception:
+                    connection = _close(connection)
+                    metrics.incr("email.errors")
+                    self.app.logger.error("Could not send email", exc_info=True)
+                finally:
+                    messages.task_done()
+            _close(connection)
+
+    def shutdown(self, timeout=None):
+        """Send everything still queued, then stop the workers."""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        with self._lock:
+            messages, threads = self._queue, self._threads
+            self._queue, self._threads = None, []
+        for _ in threads:
+            messages.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+
+class DispatchingMailUtil(MailUtil):
+    """Send Flask-Security mail (registration, resets, ...) through the pool."""
+
+    def send_mail(self, template, subject, recipient, sender, body, html, **kwargs):
+        if isinstance(sender, tuple) and len(sender) == 2:
+            sender = (str(sender[0]), str(sender[1]))
+        else:
+            sender = str(sender)
+        send_email(subject, sender, [recipient], body, html)
 
 
 def send_email(
@@ -28,6 +171,4 @@ def send_email(
     if sync:
         mail.send(msg)
     else:
-        Thread(
-            target=send_async_email, args=(current_app._get_current_object(), msg)
-        ).start()
+        current_app.email_dispatcher.submit(msg)
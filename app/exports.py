@@ -0,0 +1,189 @@
+"""Streaming post exports.
+
+Posts are read with ``yield_per`` and written straight to a temporary
+file under ``EXPORT_DIR`` in one of three formats, so memory use does not
+grow with the number of posts:
+
+* ``jsonl`` - one JSON object per line
+* ``json`` - a single ``{"posts": [...]}`` document
+* ``zip`` - one markdown file with front matter per post
+
+The finished file is renamed into place as ``<user id>-<task id>.<ext>``
+and served by ``dashboard.download_export``. It replaces the user's older
+exports, and every export sweeps away files older than ``EXPORT_TTL``,
+including ``.part`` files left behind by crashed jobs.
+"""
+
+import glob
+import json
+import os
+import tempfile
+import time
+import zipfile
+
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from flask import current_app
+
+from app.extensions import db
+from app.models import Blog, Post
+
+FORMATS = {
+    "jsonl": ("jsonl", "application/x-ndjson"),
+    "json": ("json", "application/json"),
+    "zip": ("zip", "application/zip"),
+}
+
+
+def export_path(user_id, task_id, format):
+    extension, _ = FORMATS[format]
+    return os.path.join(
+        current_app.config["EXPORT_DIR"], f"{user_id}-{task_id}.{extension}"
+    )
+
+
+def find_export(user_id, task_id):
+    for format in FORMATS:
+        path = export_path(user_id, task_id, format)
+        if os.path.exists(path):
+            return path, FORMATS[format][1]
+    return None, None
+
+
+def latest_export(user_id):
+    """Return ``(task_id, format)`` of the user's finished export, if any."""
+    pattern = os.path.join(current_app.config["EXPORT_DIR"], f"{user_id}-*")
+    for path in glob.glob(pattern):
+        name, extension = os.path.basename(path).rsplit(".", 1)
+        if extension in FORMATS:
+            return name.split("-", 1)[1], extension
+    return None
+
+
+def remove_exports(user_id, keep=None):
+    pattern = os.path.join(current_app.config["EXPORT_DIR"], f"{user_id}-*")
+    for path in glob.glob(pattern):
+        if path != keep:
+            _remove(path)
+
+
+def sweep_exports(max_age=None, now=None):
+    """Delete export files older than ``max_age`` seconds; returns the count."""
+    max_age = current_app.config["EXPORT_TTL"] if max_age is None else max_age
+    cutoff = (time.time() if now is None else now) - max_age
+    removed = 0
+    with os.scandir(current_app.config["EXPORT_DIR"]) as entries:
+        for entry in entries:
+            try:
+                expired = entry.is_file() and entry.stat().st_mtime < cutoff
+            except FileNotFoundError:
+                continue
+            if expired and _remove(entry.path):
+                removed += 1
+    return removed
+
+
+def _remove(path):
+    # another job may be cleaning up the same file
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _document(post):
+    return {
+        "id": post.id,
+        "title": post.title,
+        "content": post.content,
+        "format": post.content_format,
+        "blog": post.blog.slug if post.blog else None,
+        "language": post.language,
+        "published": bool(post.published),
+        "created_at": post.created_at.isoformat() + "Z" if post.created_at else None,
+        "updated_at": post.updated_at.isoformat() + "Z" if post.updated_at else None,
+    }
+
+
+def _iter_posts(user_id):
+    statement = (
+        sa.select(Post)
+        .where(Post.user_id == user_id)
+        .options(
+            so.load_only(
+                Post.id,
+                Post.title,
+                Post.content,
+                Post.content_format,
+                Post.language,
+                Post.published,
+                Post.created_at,
+                Post.updated_at,
+            ),
+            so.joinedload(Post.blog).load_only(Blog.id, Blog.slug),
+        )
+        .order_by(Post.id)
+        .execution_options(yield_per=current_app.config["EXPORT_YIELD_PER"])
+    )
+    for post in db.session.scalars(statement):
+        yield _document(post)
+
+
+def _markdown_name(document):
+    return f"{document['blog'] or 'posts'}/{document['id']}.md"
+
+
+def write_export(user_id, task_id, format, progress=None):
+    """Write the export file and return its path.
+
+    ``progress(done, total)`` is called after every post; callers are
+    expected to throttle what they do with it. The user's previous exports
+    stay downloadable until this one is in place, then are deleted.
+    """
+    import frontmatter
+
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format {format!r}")
+    directory = current_app.config["EXPORT_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    total = db.session.scalar(
+        sa.select(sa.func.count(Post.id)).where(Post.user_id == user_id)
+    )
+    done = 0
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            if format == "zip":
+                with zipfile.ZipFile(file, "w", zipfile.ZIP_DEFLATED) as archive:
+                    for document in _iter_posts(user_id):
+                        content = document.pop("content")
+                        archive.writestr(
+                            _markdown_name(document),
+                            frontmatter.dumps(frontmatter.Post(content, **document)),
+                        )
+                        done += 1
+                        if progress:
+                            progress(done, total)
+            else:
+                if format == "json":
+                    file.write(b'{"posts": [')
+                for document in _iter_posts(user_id):
+                    if format == "json" and done:
+                        file.write(b",")
+                    file.write(json.dumps(document).encode())
+                    if format == "jsonl":
+                        file.write(b"\n")
+                    done += 1
+                    if progress:
+                        progress(done, total)
+                if format == "json":
+                    file.write(b"]}")
+        path = export_path(user_id, task_id, format)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    remove_exports(user_id, keep=path)
+    sweep_exports()
+    return path
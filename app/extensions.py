@@ -1,5 +1,4 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect
 from flask_babel import Babel
 from flask_security import Security
@@ -7,14 +6,16 @@ from flask_moment import Moment
 from flask_mail import Mail
 from flask_dropzone import Dropzone
 from flask_session import Session
+from flask_caching import Cache
+from app.database import RoutingSession
 
 security: Security = Security()
 csrf: CSRFProtect = CSRFProtect()
-db: SQLAlchemy = SQLAlchemy()
-migrate: Migrate = Migrate()
+db: SQLAlchemy = SQLAlchemy(session_options={"class_": RoutingSession})
 # Babel for transalation
 babel: Babel = Babel()
 moment = Moment()
 mail = Mail()
 dropzone = Dropzone()
 session = Session()
+cache = Cache()
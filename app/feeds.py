@@ -0,0 +1,121 @@
+"""Cached RSS, Atom and JSON Feed documents for a blog.
+
+The newest ``FEED_ITEMS`` published posts are turned into one item list
+and rendered into every format at once. The result is stored in the cache
+with the blog's page cache generation, so a committed change to the blog
+discards it, and later polls are answered from the cache, with a 304
+when the reader already has the current version.
+"""
+
+import json
+from datetime import datetime, timezone
+from hashlib import sha1
+from flask import current_app, make_response, render_template, request, url_for
+from app.extensions import cache, db
+from app.page_cache import blog_generation
+from app.database import use_primary
+from app import metrics, queries
+
+FORMATS = {
+    "rss": "application/rss+xml; charset=utf-8",
+    "atom": "application/atom+xml; charset=utf-8",
+    "json": "application/feed+json; charset=utf-8",
+}
+
+
+def _feed_key(blog_id):
+    return f"feed:{blog_id}:{request.host}"
+
+
+def build_feed(blog):
+    posts = db.session.scalars(
+        queries.feed_items(blog.id, current_app.config["FEED_ITEMS"])
+    ).all()
+    items = [
+        {
+            "id": post.id,
+            "title": post.title,
+            "url": url_for(
+                "main.view_post", post_id=post.id, slug=blog.slug, _external=True
+            ),
+            "summary": post.excerpt or "",
+            "published": post.created_at.replace(tzinfo=timezone.utc),
+            "updated": (post.updated_at or post.created_at).replace(
+                tzinfo=timezone.utc
+            ),
+        }
+        for post in posts
+    ]
+    built_at = datetime.now(timezone.utc)
+    last_modified = max((item["updated"] for item in items), default=built_at)
+    context = {
+        "blog": blog,
+        "items": items,
+        "build_date": built_at,
+        "updated": last_modified,
+        "blog_url": url_for("main.view_blog", blog_id=blog.id, _external=True),
+    }
+    documents = {
+        "rss": render_template("rss.xml", **context),
+        "atom": render_template(
+            "atom.xml",
+            feed_url=url_for("main.blog_atom", blog_id=blog.id, _external=True),
+            **context,
+        ),
+        "json": json.dumps(
+            {
+                "version": "https://jsonfeed.org/version/1.1",
+                "title": blog.title,
+                "home_page_url": context["blog_url"],
+                "feed_url": url_for(
+                    "main.blog_json_feed", blog_id=blog.id, _external=True
+                ),
+                "description": blog.description,
+                "items": [
+                    {
+                        "id": str(item["id"]),
+                        "url": item["url"],
+                        "title": item["title"],
+                        "summary": item["summary"],
+                        "date_published": item["published"].isoformat(),
+                        "date_modified": item["updated"].isoformat(),
+                    }
+                    for item in items
+                ],
+            }
+        ),
+    }
+    return {
+        "generation": blog_generation(blog.id),
+        "last_modified": last_modified,
+        "documents": documents,
+        "etags": {
+            name: sha1(body.encode()).hexdigest() for name, body in documents.items()
+        },
+    }
+
+
+def get_feed(blog):
+    key = _feed_key(blog.id)
+    feed = cache.get(key)
+    if feed is not None and feed["generation"] == blog_generation(blog.id):
+        metrics.incr("feed_cache.hits")
+        return feed
+    metrics.incr("feed_cache.misses")
+    # the blog may have come from a replica; build what is cached from the primary
+    if use_primary():
+        db.session.refresh(blog)
+    feed = build_feed(blog)
+    cache.set(key, feed, timeout=current_app.config["FEED_CACHE_TIMEOUT"])
+    return feed
+
+
+def feed_response(blog, format):
+    feed = get_feed(blog)
+    response = make_response(feed["documents"][format])
+    response.content_type = FORMATS[format]
+    response.set_etag(feed["etags"][format])
+    response.last_modified = feed["last_modified"]
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config["FEED_MAX_AGE"]
+    return response.make_conditional(request)
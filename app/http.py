@@ -0,0 +1,146 @@
+"""Shared outbound HTTP client.
+
+Every outbound call (translation, webmention verification, ...) goes
+through ``current_app.http`` so connections are pooled and kept alive
+instead of paying a DNS lookup and TLS handshake per request. The client
+caps concurrent requests per host, applies the configured timeouts and
+refuses to buffer response bodies larger than ``HTTP_MAX_RESPONSE_BYTES``.
+HTTP/2 is negotiated when the optional ``h2`` package is installed.
+
+The underlying ``httpx.Client`` is created lazily and recreated after a
+fork, so gunicorn and RQ workers never share sockets with their parent.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import httpx
+
+from app import metrics
+
+try:
+    import h2  # noqa: F401
+except ImportError:
+    HTTP2_AVAILABLE = False
+else:
+    HTTP2_AVAILABLE = True
+
+
+class ResponseTooLarge(httpx.HTTPError):
+    pass
+
+
+class HTTPClient:
+    def __init__(self, config, transport=None):
+        self.max_per_host = config["HTTP_MAX_CONNECTIONS_PER_HOST"]
+        self.max_response_bytes = config["HTTP_MAX_RESPONSE_BYTES"]
+        self.pool_timeout = config["HTTP_POOL_TIMEOUT"]
+        self.http2 = config["HTTP_HTTP2"] and HTTP2_AVAILABLE
+        self.limits = httpx.Limits(
+            max_connections=config["HTTP_MAX_CONNECTIONS"],
+            max_keepalive_connections=config["HTTP_MAX_KEEPALIVE_CONNECTIONS"],
+            keepalive_expiry=config["HTTP_KEEPALIVE_EXPIRY"],
+        )
+        self.timeout = httpx.Timeout(
+            config["HTTP_TIMEOUT"],
+            connect=config["HTTP_CONNECT_TIMEOUT"],
+            pool=self.pool_timeout,
+        )
+        self.headers = {"User-Agent": config["HTTP_USER_AGENT"]}
+        self.transport = transport
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    @property
+    def client(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._client = httpx.Client(
+                        limits=self.limits,
+                        timeout=self.timeout,
+                        http2=self.http2,
+                        headers=self.headers,
+                        follow_redirects=True,
+                        transport=self.transport,
+                    )
+                    self._pid = os.getpid()
+                    self._hosts = {}
+        return self._client
+
+    def _host_slot(self, url):
+        host = urlsplit(str(url)).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._hosts[host]
+
+    @contextmanager
+    def stream(self, method, url, **kwargs):
+        """Open a streamed request for callers that may stop reading early.
+
+        The same per-host limit, timeouts and metrics as :meth:`request`
+        apply, but the body is left to the caller and is not size checked.
+        """
+        client = self.client
+        slot = self._host_slot(url)
+        if not slot.acquire(blocking=False):
+            metrics.incr("http.pool.waits")
+            if not slot.acquire(timeout=self.pool_timeout):
+                metrics.incr("http.pool.timeouts")
+                raise httpx.PoolTimeout(f"Too many concurrent requests to {url}")
+        metrics.incr("http.requests")
+        try:
+            with client.stream(method, url, **kwargs) as response:
+                yield response
+        except httpx.HTTPError:
+            metrics.incr("http.errors")
+            raise
+        finally:
+            slot.release()
+
+    def request(self, method, url, max_bytes=None, **kwargs):
+        """Send a request and return the fully read response.
+
+        Raises ``httpx.HTTPError`` on failure, including ``ResponseTooLarge``
+        when the body exceeds ``max_bytes`` (default
+        ``HTTP_MAX_RESPONSE_BYTES``) and ``httpx.PoolTimeout`` when the
+        per-host limit stays saturated for longer than the pool timeout.
+        """
+        max_bytes = max_bytes or self.max_response_bytes
+        with self.stream(method, url, **kwargs) as response:
+            length = response.headers.get("Content-Length")
+            if length and length.isdigit() and int(length) > max_bytes:
+                raise ResponseTooLarge(f"{url} is {length} bytes")
+            body = bytearray()
+            for chunk in response.iter_bytes():
+                body.extend(chunk)
+                if len(body) > max_bytes:
+                    raise ResponseTooLarge(f"{url} exceeds {max_bytes} bytes")
+        metrics.incr("http.bytes", len(body))
+        # the body is already decoded, so drop the transfer framing
+        headers = response.headers.copy()
+        for name in ("Content-Encoding", "Content-Length", "Transfer-Encoding"):
+            headers.pop(name, None)
+        return httpx.Response(
+            response.status_code,
+            headers=headers,
+            content=bytes(body),
+            request=response.request,
+            extensions={"http_version": response.http_version.encode()},
+        )
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        if self._client is not None and self._pid == os.getpid():
+            self._client.close()
+        self._client = None
@@ -0,0 +1,159 @@
+"""Bulk markdown import.
+
+Uploads are spooled to ``IMPORT_SPOOL_DIR`` inside the request and the
+actual import runs in the ``app.tasks.import_posts`` job. A zip or tar
+archive is read one member at a time (tar archives in streaming mode), and
+a plain multipart batch of markdown files is read from the spool directory
+the same way, so memory use is bounded by the largest single file. Posts
+are inserted ``IMPORT_BATCH_SIZE`` at a time, one transaction per batch.
+"""
+
+import os
+import shutil
+import tarfile
+import uuid
+import zipfile
+
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+from app.extensions import db
+from app.models import Post
+
+MARKDOWN_EXTENSIONS = (".md", ".markdown")
+TAR_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+def spool_upload(files):
+    """Save uploaded files to a fresh spool directory and return its path."""
+    path = os.path.join(current_app.config["IMPORT_SPOOL_DIR"], uuid.uuid4().hex)
+    os.makedirs(path)
+    for file in files:
+        name = secure_filename(file.filename or "") or uuid.uuid4().hex
+        file.save(os.path.join(path, name))
+    return path
+
+
+def _read_member(fileobj, name, limit):
+    data = fileobj.read(limit + 1)
+    if len(data) > limit:
+        raise ValueError(f"{name} is larger than {limit} bytes")
+    return data
+
+
+def iter_entries(path):
+    """Yield ``(name, data_or_error, bytes_done, bytes_total)`` per markdown entry."""
+    limit = current_app.config["IMPORT_MAX_FILE_BYTES"]
+    names = sorted(os.listdir(path))
+    total = sum(os.path.getsize(os.path.join(path, name)) for name in names)
+    done = 0
+    for name in names:
+        full_path = os.path.join(path, name)
+        size = os.path.getsize(full_path)
+        lower = name.lower()
+        try:
+            if lower.endswith(".zip"):
+                with zipfile.ZipFile(full_path) as archive:
+                    for info in archive.infolist():
+                        done += info.compress_size
+                        if info.is_dir() or not info.filename.lower().endswith(
+                            MARKDOWN_EXTENSIONS
+                        ):
+                            continue
+                        try:
+                            with archive.open(info) as member:
+                                data = _read_member(member, info.filename, limit)
+                        except (ValueError, zipfile.BadZipFile) as e:
+                            data = ValueError(str(e))
+                        yield info.filename, data, done, total
+            elif lower.endswith(TAR_EXTENSIONS):
+                with open(full_path, "rb") as raw, tarfile.open(
+                    fileobj=raw, mode="r|*"
+                ) as archive:
+                    start = done
+                    for member in archive:
+                        if not member.isfile() or not member.name.lower().endswith(
+                            MARKDOWN_EXTENSIONS
+                        ):
+                            continue
+                        try:
+                            data = _read_member(
+                                archive.extractfile(member), member.name, limit
+                            )
+                        except (ValueError, tarfile.TarError) as e:
+                            data = ValueError(str(e))
+                        yield member.name, data, start + raw.tell(), total
+                done += size
+            elif lower.endswith(MARKDOWN_EXTENSIONS):
+                done += size
+                try:
+                    with open(full_path, "rb") as file:
+                        data = _read_member(file, name, limit)
+                except ValueError as e:
+                    data = e
+                yield name, data, done, total
+            else:
+                done += size
+                error = ValueError(f"{name} is not markdown or an archive")
+                yield name, error, done, total
+        except (zipfile.BadZipFile, tarfile.TarError, OSError) as e:
+            done = min(total, done + size)
+            error = ValueError(f"{name} is not a readable archive: {e}")
+            yield name, error, done, total
+
+
+def parse_post(data):
+    """Turn a markdown file with front matter into ``Post`` keyword arguments."""
+    import frontmatter
+
+    if not frontmatter.checks(data.decode("utf-8")):
+        raise ValueError("No front matter")
+    matter = frontmatter.loads(data.decode("utf-8"))
+    title = matter.metadata.get("title")
+    if not title:
+        raise ValueError("Front matter has no title")
+    return {
+        "title": str(title)[:150],
+        "content": matter.content,
+        "content_format": "markdown",
+        "published": not matter.metadata.get("draft"),
+    }
+
+
+def run_import(path, blog_id, user_id, batch_size=None, progress=None):
+    """Import every entry under ``path`` and return the per-file results.
+
+    Each result is ``{"file": name, "status": "imported" | "failed"}`` with
+    an ``error`` for failures. ``progress(results, bytes_done, bytes_total)``
+    is called after every committed batch.
+    """
+    batch_size = batch_size or current_app.config["IMPORT_BATCH_SIZE"]
+    results, batch = [], []
+    done = total = 0
+
+    def commit():
+        db.session.add_all(batch)
+        db.session.commit()
+        db.session.expunge_all()
+        batch.clear()
+        if progress:
+            progress(results, done, total)
+
+    try:
+        for name, data, done, total in iter_entries(path):
+            try:
+                if isinstance(data, Exception):
+                    raise data
+                post = Post(blog_id=blog_id, user_id=user_id, **parse_post(data))
+            except (ValueError, UnicodeDecodeError) as e:
+                results.append({"file": name, "status": "failed", "error": str(e)})
+                continue
+            batch.append(post)
+            results.append({"file": name, "status": "imported"})
+            if len(batch) >= batch_size:
+                commit()
+        done = total
+        commit()
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    return results
@@ -1,25 +1,199 @@
-from app.models import Blog
-from flask import render_template, current_app
-from app.email import send_email
+"""Newsletter delivery.
+
+``queue_newsletter`` renders an issue once, stores the rendered bodies in
+Redis and fans the blog's subscribers (``blog_followers``) out into
+``NEWSLETTER_CHUNK_SIZE`` chunks, one ``app.tasks.send_newsletter_chunk``
+job each. A chunk job opens a single SMTP connection and sends one message
+per recipient, so addresses are never exposed to each other. Every
+delivered recipient is recorded in a Redis set for the issue; when RQ
+retries a failed chunk it skips them and resumes where it stopped.
+
+Each message carries its own unsubscribe link, a signed token of the blog
+and reader swapped into the shared rendering for ``UNSUBSCRIBE_TOKEN``,
+and the matching ``List-Unsubscribe`` headers for one-click unsubscribing.
+"""
+
+import smtplib
+import uuid
 from datetime import date
-import sys
 
-today = date.today()
+import sqlalchemy as sa
+from flask import current_app, render_template, url_for
+from flask_mail import Message
+from itsdangerous import BadSignature, URLSafeSerializer
+from rq import Retry
+
+from app import metrics
+from app.extensions import db, mail
+from app.models import Blog, Post, User, blog_followers
+
+ISSUE_KEY = "newsletter:{}"
+SENT_KEY = "newsletter:{}:sent"
+# stands in for the reader's token in the rendered issue
+UNSUBSCRIBE_TOKEN = "UNSUBSCRIBE_TOKEN"
+
+
+def _serializer():
+    return URLSafeSerializer(
+        current_app.config["SECRET_KEY"], salt="newsletter-unsubscribe"
+    )
 
 
-def send_newsletter(blog_id):
+def unsubscribe_token(blog_id, user_id):
+    return _serializer().dumps([blog_id, user_id])
+
+
+def read_unsubscribe_token(token):
+    """Return ``(blog_id, user_id)``, or None if the token was tampered with."""
     try:
-        blog = Blog.query.get(blog_id)
-        if blog is None:
-            raise ValueError(f"Blog with id {blog_id} does not exist")
-        posts = [post for post in blog.posts if post.publish_in_newsletter]
-        html = render_template("email/newsletter.html", blog=blog, posts=posts)
-        send_email(
-            f"Newsletter: {blog.title} {today}",
-            (blog.title, current_app.config["MAIL_DEFAULT_SENDER"]),
-            [recipient.email for recipient in blog.recipients],
-            "For best viewing experience, please look at html",
-            html,
+        blog_id, user_id = _serializer().loads(token)
+    except (BadSignature, TypeError, ValueError):
+        return None
+    return blog_id, user_id
+
+
+def newsletter_posts(blog_id):
+    return db.session.scalars(
+        sa.select(Post)
+        .where(
+            Post.blog_id == blog_id,
+            Post.published.is_(True),
+            Post.publish_in_newsletter.is_(True),
+        )
+        .order_by(Post.created_at.desc(), Post.id.desc())
+        .limit(current_app.config["NEWSLETTER_MAX_POSTS"])
+    ).all()
+
+
+def render_issue(blog):
+    """Return ``(subject, text, html, unsubscribe_url)`` for the blog's next issue.
+
+    The bodies and URL contain ``UNSUBSCRIBE_TOKEN`` in place of the
+    reader's token.
+    """
+    posts = newsletter_posts(blog.id)
+    base_url = current_app.config["NEWSLETTER_BASE_URL"]
+    with current_app.test_request_context(base_url=base_url):
+        unsubscribe_url = url_for(
+            "main.newsletter_unsubscribe", token=UNSUBSCRIBE_TOKEN, _external=True
+        )
+        context = dict(blog=blog, posts=posts, unsubscribe_url=unsubscribe_url)
+        text = render_template("email/newsletter.txt", **context)
+        html = render_template("email/newsletter.html", **context)
+    return f"Newsletter: {blog.title} {date.today()}", text, html, unsubscribe_url
+
+
+def _chunks(blog_id, size):
+    statement = (
+        sa.select(blog_followers.c.user_id)
+        .where(blog_followers.c.blog_id == blog_id)
+        .order_by(blog_followers.c.user_id)
+        .execution_options(yield_per=size)
+    )
+    for chunk in db.session.scalars(statement).partitions(size):
+        yield list(chunk)
+
+
+def queue_newsletter(blog_id):
+    """Render an issue and enqueue its chunk jobs; returns ``(issue_id, chunks)``."""
+    config = current_app.config
+    blog = db.session.get(Blog, blog_id)
+    if blog is None:
+        raise ValueError(f"Blog with id {blog_id} does not exist")
+    if not blog.newsletter:
+        raise ValueError(f"Blog {blog_id} does not have a newsletter")
+    subject, text, html, unsubscribe_url = render_issue(blog)
+    issue_id = uuid.uuid4().hex
+    key = ISSUE_KEY.format(issue_id)
+    pipe = current_app.redis.pipeline()
+    pipe.hset(
+        key,
+        mapping={
+            "blog_id": blog.id,
+            "sender_name": blog.title,
+            "subject": subject,
+            "text": text,
+            "html": html,
+            "unsubscribe_url": unsubscribe_url,
+        },
+    )
+    pipe.expire(key, config["NEWSLETTER_TTL"])
+    pipe.execute()
+    retry = Retry(
+        max=config["NEWSLETTER_RETRIES"], interval=config["NEWSLETTER_RETRY_INTERVAL"]
+    )
+    chunks = 0
+    for user_ids in _chunks(blog.id, config["NEWSLETTER_CHUNK_SIZE"]):
+        current_app.task_queue.enqueue(
+            "app.tasks.send_newsletter_chunk", issue_id, user_ids, retry=retry
+        )
+        chunks += 1
+    return issue_id, chunks
+
+
+def _sender(name):
+    default = current_app.extensions["mail"].default_sender
+    return (name, default) if isinstance(default, str) else default
+
+
+def send_chunk(issue_id, user_ids):
+    """Send an issue to ``user_ids`` over one SMTP connection.
+
+    Recipients already delivered by an earlier attempt are skipped, as are
+    users that unsubscribed or were deactivated since the issue was queued.
+    Returns the number of messages sent.
+    """
+    redis = current_app.redis
+    issue = {
+        key.decode(): value.decode()
+        for key, value in redis.hgetall(ISSUE_KEY.format(issue_id)).items()
+    }
+    if not issue or not user_ids:
+        return 0
+    sent_key = SENT_KEY.format(issue_id)
+    pending = [
+        user_id
+        for user_id, sent in zip(user_ids, redis.smismember(sent_key, user_ids))
+        if not sent
+    ]
+    if not pending:
+        return 0
+    recipients = db.session.execute(
+        sa.select(User.id, User.email)
+        .join(blog_followers, blog_followers.c.user_id == User.id)
+        .where(
+            blog_followers.c.blog_id == int(issue["blog_id"]),
+            User.id.in_(pending),
+            User.active.is_(True),
         )
-    except Exception:
-        current_app.logger.exception("Unhandled exception", exc_info=sys.exc_info())
+        .order_by(User.id)
+    ).all()
+    sender = _sender(issue["sender_name"])
+    blog_id = int(issue["blog_id"])
+    sent = 0
+    with mail.connect() as connection:
+        for user_id, email in recipients:
+            token = unsubscribe_token(blog_id, user_id)
+            unsubscribe_url = issue["unsubscribe_url"].replace(UNSUBSCRIBE_TOKEN, token)
+            message = Message(
+                issue["subject"],
+                sender=sender,
+                recipients=[email],
+                body=issue["text"].replace(UNSUBSCRIBE_TOKEN, token),
+                html=issue["html"].replace(UNSUBSCRIBE_TOKEN, token),
+                extra_headers={
+                    "List-Unsubscribe": f"<{unsubscribe_url}>",
+                    "List-Unsubscribe-Post": "List-Unsubscribe=One-Click",
+                },
+            )
+            try:
+                connection.send(message)
+                sent += 1
+            except smtplib.SMTPRecipientsRefused:
+                current_app.logger.warning("Newsletter refused for user %s", user_id)
+                metrics.incr("newsletter.refused")
+            # checkpoint, so a retried chunk does not send this one again
+            redis.sadd(sent_key, user_id)
+    redis.expire(sent_key, current_app.config["NEWSLETTER_TTL"])
+    metrics.incr("newsletter.sent", sent)
+    return sent
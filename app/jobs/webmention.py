@@ -1,39 +1,236 @@
 # tasks/webmention.py
-import httpx
+"""Batched webmention verification.
+
+The endpoint only adds the ``(source, target)`` pair to a Redis set, which
+drops repeats, remembers it for ``WEBMENTION_DEDUP_WINDOW`` seconds so
+repeated pings are ignored, and makes sure a single ``app.tasks.process_webmentions``
+job is queued. That job moves the pending set aside to a processing set and
+verifies a batch of it concurrently through the shared ``current_app.http``
+client: each source is streamed and the download stops as soon as the
+target URL shows up or ``WEBMENTION_MAX_BYTES`` have been read. Pairs are
+only removed from the processing set once their results are committed, so
+a failed run is picked up again by the next one. A source that could not
+be fetched (timeouts, connection errors, a busy per-host pool, 5xx) stays
+claimed and is retried ``WEBMENTION_RETRY_INTERVAL`` seconds later, up to
+``WEBMENTION_RETRIES`` times; only a completed fetch without the link
+rejects a pair.
+"""
+
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from urllib.parse import urlparse
+
+import httpx
+import sqlalchemy as sa
+from flask import current_app
+from redis.exceptions import ResponseError
 from app.extensions import db
 from app.models import Webmention, Blog  # You need a model to store them
+from app import metrics
 
-def is_valid_webmention(source, target):
-    try:
-        resp = httpx.get(source, timeout=5)
-        return resp.status_code == 200 and target in resp.text
-    except Exception:
-        return False
+PENDING_KEY = "webmention:pending"
+PROCESSING_KEY = "webmention:processing"
+ATTEMPTS_KEY = "webmention:attempts"
+SCHEDULED_KEY = "webmention:scheduled"
+SEEN_PREFIX = "webmention:seen:"
 
-def process_webmention(source: str, target: str):
-    if not is_valid_webmention(source, target):
-        return False
-    
+
+def _seen_key(source, target):
+    return SEEN_PREFIX + hashlib.sha1(f"{source} {target}".encode()).hexdigest()
+
+
+def recently_seen(source, target):
+    return bool(current_app.redis.exists(_seen_key(source, target)))
+
+
+def queue_webmention(source, target):
+    pipe = current_app.redis.pipeline()
+    pipe.set(
+        _seen_key(source, target), 1, ex=current_app.config["WEBMENTION_DEDUP_WINDOW"]
+    )
+    pipe.sadd(PENDING_KEY, json.dumps([source, target]))
+    pipe.set(SCHEDULED_KEY, 1, nx=True)
+    _, _, schedule = pipe.execute()
+    if schedule:
+        _enqueue()
+
+
+def _enqueue(delay=None):
+    from rq import Retry
+
+    config = current_app.config
+    retry = Retry(
+        max=config["WEBMENTION_RETRIES"], interval=config["WEBMENTION_RETRY_INTERVAL"]
+    )
+    if delay:
+        current_app.task_queue.enqueue_in(
+            timedelta(seconds=delay), "app.tasks.process_webmentions", retry=retry
+        )
+    else:
+        current_app.task_queue.enqueue("app.tasks.process_webmentions", retry=retry)
+
+
+def pending_count():
+    """Pairs waiting to be verified, including a batch already claimed."""
+    pipe = current_app.redis.pipeline()
+    pipe.scard(PENDING_KEY)
+    pipe.scard(PROCESSING_KEY)
+    return sum(pipe.execute())
+
+
+def blog_slug(target):
     target_url = urlparse(target)
 
     # Split hostname by dots
     parts = target_url.hostname.split('.')
 
     # Assumes domain is like 'example.com' (2 parts). Subdomains will be everything before that.
-    slug = '.'.join(parts[:-2]) if len(parts) > 2 else ''
-    if not slug:
-        target_path_parts = target_url.path.strip('/').split('/')  # ['foo', 'bar', 'baz']
+    if len(parts) > 2:
+        return '.'.join(parts[:-2])
+    # Otherwise the slug is the second path segment (/blog/<slug>, /post/<slug>/<id>)
+    target_path_parts = target_url.path.strip('/').split('/')
+    return target_path_parts[1] if len(target_path_parts) > 1 else None
 
-        slug = target_path_parts[1] if len(target_path_parts) > 1 else ''
-        return False
-    blog = Blog.query.filter_by(slug=slug).first()
 
-    if not blog:
+# the source may be fine later: leave the pair claimed and try again
+RETRYABLE_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+
+def _mentions(http, source, target, max_bytes):
+    """True or False once the source was fetched, None if it should be retried."""
+    needle = target.encode()
+    tail = b""
+    read = 0
+    try:
+        with http.stream("GET", source) as resp:
+            if resp.status_code == 429 or resp.status_code >= 500:
+                return None
+            if resp.status_code != 200:
+                return False
+            for chunk in resp.iter_bytes():
+                # keep the end of the previous chunk so a split URL still matches
+                window = tail + chunk
+                if needle in window:
+                    return True
+                read += len(chunk)
+                if read >= max_bytes:
+                    return False
+                tail = window[-(len(needle) - 1):] if len(needle) > 1 else b""
+    except RETRYABLE_ERRORS:
+        return None
+    except httpx.HTTPError:
         return False
+    return False
+
+
+def verify_webmentions(pairs, concurrency, max_bytes):
+    """Return ``{(source, target): True | False | None}`` for every pair."""
+    app = current_app._get_current_object()
+
+    def verify(pair):
+        with app.app_context():
+            return pair, _mentions(app.http, *pair, max_bytes)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return dict(pool.map(verify, pairs))
+
 
-    # Example: storing in DB
-    mention = Webmention(source=source, target=target, verified=True, blog=blog)
-    db.session.add(mention)
+def claim_pending_webmentions(batch_size):
+    """Return up to ``batch_size`` raw pairs from the processing set.
+
+    Pairs left there by a failed run are claimed before new ones; call
+    :func:`ack_webmentions` once they are stored.
+    """
+    redis = current_app.redis
+    if not redis.exists(PROCESSING_KEY):
+        try:
+            redis.rename(PENDING_KEY, PROCESSING_KEY)
+        except ResponseError:
+            return []
+    return redis.srandmember(PROCESSING_KEY, batch_size) or []
+
+
+def ack_webmentions(batch, retry=()):
+    """Drop a processed batch and keep draining whatever is left.
+
+    ``retry`` holds the raw pairs whose source could not be fetched. They
+    stay claimed, and the next run is delayed to give their hosts time,
+    until they have used up their attempts.
+    """
+    config = current_app.config
+    redis = current_app.redis
+    retry = set(retry)
+    if retry:
+        pipe = redis.pipeline()
+        for item in retry:
+            pipe.hincrby(ATTEMPTS_KEY, item)
+        attempts = pipe.execute()
+        exhausted = {
+            item
+            for item, count in zip(retry, attempts)
+            if count > config["WEBMENTION_RETRIES"]
+        }
+        metrics.incr("webmention.retried", len(retry - exhausted))
+        metrics.incr("webmention.unreachable", len(exhausted))
+        retry -= exhausted
+    done = [item for item in batch if item not in retry]
+    if done:
+        redis.srem(PROCESSING_KEY, *done)
+        redis.hdel(ATTEMPTS_KEY, *done)
+    if (redis.exists(PROCESSING_KEY) or redis.exists(PENDING_KEY)) and redis.set(
+        SCHEDULED_KEY, 1, nx=True
+    ):
+        _enqueue(delay=config["WEBMENTION_RETRY_INTERVAL"] if retry else None)
+
+
+def process_pending_webmentions(batch_size=None):
+    """Verify and store one batch of queued webmentions; returns the count stored."""
+    config = current_app.config
+    current_app.redis.delete(SCHEDULED_KEY)
+    batch = claim_pending_webmentions(batch_size or config["WEBMENTION_BATCH_SIZE"])
+    items = {tuple(json.loads(item)): item for item in batch}
+    pairs = set(items)
+    if pairs:
+        stored = db.session.execute(
+            sa.select(Webmention.source, Webmention.target).where(
+                Webmention.source.in_({source for source, _ in pairs})
+            )
+        )
+        pairs -= {tuple(row) for row in stored}
+
+    results = verify_webmentions(
+        sorted(pairs), config["WEBMENTION_CONCURRENCY"], config["WEBMENTION_MAX_BYTES"]
+    ) if pairs else {}
+    slugs = {pair: blog_slug(pair[1]) for pair, valid in results.items() if valid}
+    blogs = {
+        blog.slug: blog
+        for blog in db.session.scalars(
+            sa.select(Blog).where(Blog.slug.in_(set(slugs.values())))
+        )
+    }
+    count = 0
+    for (source, target), slug in slugs.items():
+        if slug in blogs:
+            db.session.add(
+                Webmention(
+                    source=source,
+                    target=target,
+                    verified=True,
+                    blog=blogs[slug],
+                    type="mention",
+                )
+            )
+            count += 1
     db.session.commit()
-    return True
\ No newline at end of file
+    retry = [items[pair] for pair, valid in results.items() if valid is None]
+    metrics.incr("webmention.checked", len(results) - len(retry))
+    metrics.incr("webmention.verified", count)
+    ack_webmentions(batch, retry=retry)
+    return count
+
+
+def process_webmention(source: str, target: str):
+    # jobs queued before batching was introduced
+    queue_webmention(source, target)
@@ -0,0 +1,151 @@
+"""Background language detection for posts.
+
+Creating or editing a post no longer runs langdetect inside the request.
+Instead the post id is added to a Redis set when the transaction commits,
+and a single ``app.tasks.detect_languages`` job drains the set in batches.
+Detector profiles are loaded once per process, and the detector is seeded
+so the same text always yields the same language. Text that cannot be
+classified is stored as an empty string so it is not retried.
+"""
+
+import threading
+from time import monotonic
+
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from flask import current_app
+from langdetect import DetectorFactory, LangDetectException
+from langdetect.detector_factory import PROFILES_DIRECTORY
+from redis.exceptions import RedisError
+
+from app.extensions import db
+from app.models import Post
+from app.content import plain_text
+
+PENDING_KEY = "language:pending"
+SCHEDULED_KEY = "language:scheduled"
+
+_factory = None
+_factory_lock = threading.Lock()
+
+
+def _detector_factory():
+    global _factory
+    if _factory is None:
+        with _factory_lock:
+            if _factory is None:
+                factory = DetectorFactory()
+                factory.load_profile(PROFILES_DIRECTORY)
+                factory.set_seed(0)
+                _factory = factory
+    return _factory
+
+
+def detect_language(html):
+    text = plain_text(html)[: current_app.config["LANGUAGE_DETECT_MAX_CHARS"]]
+    detector = _detector_factory().create()
+    detector.append(text)
+    try:
+        return detector.detect()[:5]
+    except LangDetectException:
+        return ""
+
+
+def queue_detection(post_ids):
+    try:
+        pipe = current_app.redis.pipeline()
+        pipe.sadd(PENDING_KEY, *post_ids)
+        pipe.set(SCHEDULED_KEY, 1, nx=True)
+        _, schedule = pipe.execute()
+        if schedule:
+            current_app.task_queue.enqueue("app.tasks.detect_languages")
+    except RedisError:
+        current_app.logger.warning(
+            "Language queue unavailable; run 'flask language backfill'",
+            exc_info=True,
+        )
+
+
+def _store(posts):
+    posts_table = Post.__table__
+    statement = (
+        sa.update(posts_table)
+        .where(posts_table.c.id == sa.bindparam("post_id"))
+        .values(language=sa.bindparam("language"))
+    )
+    rows = [
+        {"post_id": post.id, "language": detect_language(post.content)}
+        for post in posts
+    ]
+    if rows:
+        db.session.execute(statement, rows)
+    db.session.commit()
+    return len(rows)
+
+
+def _load(statement):
+    return db.session.scalars(
+        statement.options(so.load_only(Post.id, Post.content)).order_by(Post.id)
+    ).all()
+
+
+def process_pending(batch_size=None):
+    """Detect the language of one batch of queued posts; returns the count."""
+    redis = current_app.redis
+    redis.delete(SCHEDULED_KEY)
+    batch_size = batch_size or current_app.config["LANGUAGE_DETECT_BATCH_SIZE"]
+    ids = [int(post_id) for post_id in redis.spop(PENDING_KEY, batch_size) or []]
+    done = _store(_load(sa.select(Post).where(Post.id.in_(ids)))) if ids else 0
+    if redis.scard(PENDING_KEY) and redis.set(SCHEDULED_KEY, 1, nx=True):
+        current_app.task_queue.enqueue("app.tasks.detect_languages")
+    return done
+
+
+def backfill(redo=False, batch_size=None, progress=None):
+    """Detect the language of every post still missing one.
+
+    Walks the table by primary key in batches, committing each batch, and
+    calls ``progress(done, total, rate)`` after every batch. With ``redo``
+    every post is detected again.
+    """
+    batch_size = batch_size or current_app.config["LANGUAGE_DETECT_BATCH_SIZE"]
+    criteria = [] if redo else [Post.language.is_(None)]
+    total = db.session.scalar(sa.select(sa.func.count(Post.id)).where(*criteria))
+    done, last_id, started = 0, 0, monotonic()
+    while True:
+        posts = _load(
+            sa.select(Post).where(Post.id > last_id, *criteria).limit(batch_size)
+        )
+        if not posts:
+            break
+        last_id = posts[-1].id
+        done += _store(posts)
+        db.session.expunge_all()
+        if progress:
+            progress(done, total, done / max(monotonic() - started, 1e-6))
+    return done
+
+
+def after_flush(session, flush_context):
+    pending = session.info.setdefault("language_pending", set())
+    for obj in session.new:
+        if isinstance(obj, Post):
+            pending.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Post) and sa.inspect(obj).attrs.content.history.has_changes():
+            pending.add(obj.id)
+
+
+def after_commit(session):
+    pending = session.info.pop("language_pending", None)
+    if pending:
+        queue_detection(pending)
+
+
+def after_rollback(session):
+    session.info.pop("language_pending", None)
+
+
+db.event.listen(db.session, "after_flush", after_flush)
+db.event.listen(db.session, "after_commit", after_commit)
+db.event.listen(db.session, "after_rollback", after_rollback)
@@ -8,8 +8,13 @@ from flask import (
     g,
     current_app,
 )
-from app.extensions import db
+from app.extensions import csrf, db
 from app.models import Post, Blog, User, Comment, Page
+from app import activity, queries, feeds
+from app.pagination import paginate_posts
+from app.page_cache import cached_page
+from app.database import replica_reads
+from app.jobs import newsletter
 from app.main import bp
 from app.main.forms import (
     EmptyForm,
@@ -24,45 +29,24 @@ from app.main.forms import (
 )
 from flask_security import auth_required, current_user
 from flask_babel import _, get_locale
-import bleach
 import os
-from datetime import datetime, timezone
 import sqlalchemy as sa
-import markdown
-import frontmatter
 
 
 @bp.before_app_request
 def before_request():
     if current_user.is_authenticated:
-        current_user.last_seen = datetime.now(timezone.utc)
-        db.session.commit()
-        g.search_form = SearchForm()
+        activity.touch(current_user.id)
+    g.search_form = SearchForm()
     g.locale = str(get_locale())
 
 
 @bp.route("/")
 def index():
     if current_user.is_authenticated:
-        blogs = Blog.query.all()
-        page = request.args.get("page", 1, type=int)
-        query = (
-            sa.select(Post)
-            .join(Post.blog)
-            .filter(Blog.id.in_([blog.id for blog in blogs]))
-            .order_by(Post.created_at.desc())
-        )
-        posts = db.paginate(
-            query,
-            page=page,
-            per_page=current_app.config["POSTS_PER_PAGE"],
-            error_out=False,
-        )
-        next_url = url_for("index", page=posts.next_num) if posts.has_next else None
-        prev_url = url_for("index", page=posts.prev_num) if posts.has_prev else None
+        posts, next_url, prev_url = paginate_posts(queries.feed_posts(), "main.index")
         return render_template(
             "index.html",
-            blogs=blogs,
             current_user=current_user,
             posts=posts,
             next_url=next_url,
@@ -74,37 +58,26 @@ def index():
 
 
 @bp.route("/explore")
+@replica_reads
 def explore():
-    blogs = Blog.query.all()
+    blogs = db.session.scalars(queries.explore_blogs()).all()
     return render_template("explore.html", blogs=blogs, current_user=current_user)
 
 
 @bp.route("/blog/<int:blog_id>")
 @bp.route("/blog/<slug>")
 @bp.route("/", subdomain="<slug>")
+@replica_reads
+@cached_page
 def view_blog(blog_id=None, slug=None):
     if slug:
-        blog = Blog.query.filter_by(slug=slug).first_or_404()
+        blog = db.first_or_404(queries.blog_by_slug(slug))
     else:
-        blog = Blog.query.get_or_404(blog_id)
+        blog = db.first_or_404(queries.blog_by_id(blog_id))
+    g.page_cache_blog_id = blog.id
     form = EmptyForm()
-    # Use the relationship defined in the Blog model
-    page = request.args.get("page", 1, type=int)
-    query = (
-        sa.select(Post).where(Post.blog_id == blog_id).order_by(Post.created_at.desc())
-    )
-    posts = db.paginate(
-        query, page=page, per_page=current_app.config["POSTS_PER_PAGE"], error_out=False
-    )
-    next_url = (
-        url_for("view_blog", blog_id=blog_id, page=posts.next_num, slug=slug)
-        if posts.has_next
-        else None
-    )
-    prev_url = (
-        url_for("view_blog", blog_id=blog_id, page=posts.prev_num, slug=slug)
-        if posts.has_prev
-        else None
+    posts, next_url, prev_url = paginate_posts(
+        queries.blog_posts(blog.id), "main.view_blog", blog_id=blog_id, slug=slug
     )
     return render_template(
         "view_blog.html",
@@ -117,34 +90,101 @@ def view_blog(blog_id=None, slug=None):
     )
 
 
+@bp.route("/blog/<int:blog_id>/subscribe", methods=["POST"])
+@auth_required()
+def subscribe(blog_id):
+    form = EmptyForm()
+    if form.validate_on_submit():
+        blog = db.first_or_404(queries.blog_by_id(blog_id))
+        if not blog.newsletter:
+            abort(404)
+        blog.subscribe(current_user)
+        db.session.commit()
+        flash(_("You are subscribed to %(title)s.", title=blog.title), "success")
+    return redirect(url_for("main.view_blog", blog_id=blog_id))
+
+
+@bp.route("/blog/<int:blog_id>/unsubscribe", methods=["POST"])
+@auth_required()
+def unsubscribe(blog_id):
+    form = EmptyForm()
+    if form.validate_on_submit():
+        blog = db.first_or_404(queries.blog_by_id(blog_id))
+        blog.unsubscribe(current_user)
+        db.session.commit()
+        flash(_("You are unsubscribed from %(title)s.", title=blog.title), "success")
+    return redirect(url_for("main.view_blog", blog_id=blog_id))
+
+
+@bp.route("/newsletter/unsubscribe/<token>", methods=["GET", "POST"])
+@csrf.exempt
+def newsletter_unsubscribe(token):
+    """Unsubscribe link of newsletter emails; no login needed.
+
+    GET asks for confirmation so link scanners do not unsubscribe anyone.
+    POST, including RFC 8058 one-click requests from mail clients,
+    unsubscribes the reader named in the signed token.
+    """
+    ids = newsletter.read_unsubscribe_token(token)
+    if ids is None:
+        abort(404)
+    blog = db.get_or_404(Blog, ids[0])
+    reader = db.get_or_404(User, ids[1])
+    if request.method == "GET":
+        return render_template("unsubscribe.html", blog=blog, form=EmptyForm())
+    blog.unsubscribe(reader)
+    db.session.commit()
+    if request.form.get("List-Unsubscribe") == "One-Click":
+        return "", 204
+    flash(_("You are unsubscribed from %(title)s.", title=blog.title), "success")
+    return redirect(url_for("main.view_blog", blog_id=blog.id))
+
+
+def _feed_blog(blog_id, slug):
+    if slug:
+        return Blog.query.filter_by(slug=slug).first_or_404()
+    return Blog.query.get_or_404(blog_id)
+
+
 @bp.route("/blog/<int:blog_id>/rss.xml")
 @bp.route("/blog/<slug>/rss.xml")
 @bp.route("/rss.xml", subdomain="<slug>")
+@replica_reads
 def blog_rss(blog_id=None, slug=None):
-    if slug:
-        blog = Blog.query.filter_by(slug=slug).first_or_404()
-    else:
-        blog = Blog.query.get_or_404(blog_id)
+    return feeds.feed_response(_feed_blog(blog_id, slug), "rss")
 
-    posts = Post.query.filter_by(blog_id=blog.id).order_by(Post.created_at.desc()).all()
 
-    return render_template(
-        "rss.xml", blog=blog, posts=posts, build_date=datetime.now(timezone.utc)
-    )
+@bp.route("/blog/<int:blog_id>/atom.xml")
+@bp.route("/blog/<slug>/atom.xml")
+@bp.route("/atom.xml", subdomain="<slug>")
+@replica_reads
+def blog_atom(blog_id=None, slug=None):
+    return feeds.feed_response(_feed_blog(blog_id, slug), "atom")
+
+
+@bp.route("/blog/<int:blog_id>/feed.json")
+@bp.route("/blog/<slug>/feed.json")
+@bp.route("/feed.json", subdomain="<slug>")
+@replica_reads
+def blog_json_feed(blog_id=None, slug=None):
+    return feeds.feed_response(_feed_blog(blog_id, slug), "json")
 
 
 @bp.route("/post/<slug>/<int:post_id>", methods=["GET", "POST"])
 @bp.route("/post/<int:post_id>", methods=["GET", "POST"], subdomain="<slug>")
+@replica_reads
+@cached_page
 def view_post(post_id: int, slug=None):
     if slug:
-        post: Post = Post.query.filter_by(slug=slug, id=post_id).first_or_404()
-        blog: Blog = Blog.query.filter_by(slug=slug).first_or_404()
-        if blog.id != post.blog_id:
-            abort(404, description=_("Post not found in this blog."))
-    else: 
+        post: Post = db.first_or_404(
+            queries.post_in_blog(post_id, slug),
+            description=_("Post not found in this blog."),
+        )
+    else:
         post: Post = Post.query.get_or_404(post_id)
     comment_form = CommentForm()
     blog = post.blog
+    g.page_cache_blog_id = blog.id
     comments = post.comments
     if comment_form.validate_on_submit():
         new_comment = Comment(
@@ -168,9 +208,12 @@ def view_post(post_id: int, slug=None):
 
 @bp.route("/page/<int:page_id>", methods=["GET", "POST"])
 @bp.route("/page/<int:page_id>", methods=["GET", "POST"], subdomain="<slug>")
+@replica_reads
+@cached_page
 def view_page(page_id: int, slug=None):
     page = Page.query.get_or_404(page_id)
     blog = page.blog
+    g.page_cache_blog_id = blog.id
     return render_template(
         "view_page.html",
         post=page,
@@ -180,30 +223,20 @@ def view_page(page_id: int, slug=None):
 
 
 @bp.route("/user/<username>")
+@replica_reads
 def view_user(username):
-    def get_all_posts_and_comments(user_id, sort_by="created_at", descending=False):
-        posts_query = db.session.query(Post).filter_by(user_id=user_id)
-        comments_query = db.session.query(Comment).filter_by(user_id=user_id)
-
-        posts = posts_query.all()
-        comments = comments_query.all()
-
-        combined = posts + comments
-        if not all(hasattr(item, sort_by) for item in combined):
-            raise AttributeError("Invalid sort attribute provided.")
-
-        combined.sort(key=lambda item: getattr(item, sort_by), reverse=descending)
-        return combined
-
     form = EmptyForm()
     user = User.query.filter_by(username=username).first_or_404()
+    posts = db.session.scalars(queries.user_posts(user.id)).all()
+    comments = db.session.scalars(queries.user_comments(user.id)).all()
+    all_activity = sorted(posts + comments, key=lambda item: item.created_at)
     return render_template(
         "view_user.html",
         user=user,
-        posts=user.posts,
+        posts=posts,
         blogs=user.blogs,
-        comments=user.comments,
-        all_activity=get_all_posts_and_comments(user.id),
+        comments=comments,
+        all_activity=all_activity,
         current_user=current_user,
         form=form,
     )
@@ -231,6 +264,8 @@ def search():
         "search.html",
         title=_("Search"),
         posts=posts,
+        count=total,
+        query=g.search_form.q.data,
         next_url=next_url,
         prev_url=prev_url,
     )
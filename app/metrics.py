@@ -0,0 +1,36 @@
+"""Application counters shared by every worker through Redis.
+
+Counters live in a single Redis hash so any process can bump them and
+``/metrics`` can report the totals in the Prometheus text format.
+Metrics are best effort: a Redis outage never fails the request that
+tried to record one.
+"""
+
+from flask import current_app
+from redis.exceptions import RedisError
+
+METRICS_KEY = "metrics:counters"
+
+
+def incr(name, amount=1):
+    try:
+        current_app.redis.hincrby(METRICS_KEY, name, amount)
+    except RedisError:
+        pass
+
+
+def counters():
+    try:
+        values = current_app.redis.hgetall(METRICS_KEY)
+    except RedisError:
+        return {}
+    return {key.decode(): int(value) for key, value in values.items()}
+
+
+def render_prometheus():
+    lines = []
+    for name, value in sorted(counters().items()):
+        metric = "flaskcms_" + name.replace(".", "_").replace("-", "_")
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
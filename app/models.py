@@ -9,11 +9,17 @@ from hashlib import md5
 from typing import Optional
 from flask import current_app
 import redis
-import rq
-from app.search import add_to_index, remove_from_index, query_index
+from app.search import (
+    query_index,
+    build_document,
+    bulk_index,
+    bulk_remove,
+    queue_index_changes,
+)
 import sqlalchemy as sa
 import json
-from time import time
+from collections import defaultdict
+from time import time, monotonic
 
 
 class SearchableMixin(object):
@@ -31,34 +37,110 @@ class SearchableMixin(object):
         return db.session.scalars(query), total
 
     @classmethod
-    def before_commit(cls, session):
-        session._changes = {
-            "add": list(session.new),
-            "update": list(session.dirty),
-            "delete": list(session.deleted),
-        }
+    def after_flush(cls, session, flush_context):
+        changes = session.info.setdefault("search_changes", {})
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, SearchableMixin):
+                changes[(obj.__tablename__, obj.id)] = "index"
+        for obj in session.deleted:
+            if isinstance(obj, SearchableMixin):
+                # deleted rows can't be refreshed, use the identity key instead
+                changes[(obj.__tablename__, sa.inspect(obj).identity[0])] = "delete"
 
     @classmethod
     def after_commit(cls, session):
-        for obj in session._changes["add"]:
-            if isinstance(obj, SearchableMixin):
-                add_to_index(obj.__tablename__, obj)
-        for obj in session._changes["update"]:
-            if isinstance(obj, SearchableMixin):
-                add_to_index(obj.__tablename__, obj)
-        for obj in session._changes["delete"]:
-            if isinstance(obj, SearchableMixin):
-                remove_from_index(obj.__tablename__, obj)
-        session._changes = None
+        changes = session.info.pop("search_changes", None)
+        if not changes:
+            return
+        if queue_index_changes([(index, id, op) for (index, id), op in changes.items()]):
+            return
+        # the committed session can't emit SQL, so load the rows in a new one
+        with so.Session(db.engine) as fresh:
+            cls.apply_index_changes(changes, session=fresh)
 
     @classmethod
-    def reindex(cls):
-        for obj in db.session.scalars(sa.select(cls)):
-            add_to_index(cls.__tablename__, obj)
+    def after_rollback(cls, session):
+        session.info.pop("search_changes", None)
 
+    @classmethod
+    def searchable_models(cls):
+        return {model.__tablename__: model for model in SearchableMixin.__subclasses__()}
 
-db.event.listen(db.session, "before_commit", SearchableMixin.before_commit)
+    @classmethod
+    def apply_index_changes(cls, changes, batch_size=None, session=None):
+        """Apply ``{(index, id): op}`` changes from the outbox in bulk."""
+        session = session or db.session
+        batch_size = batch_size or current_app.config["SEARCH_SYNC_BATCH_SIZE"]
+        pending = defaultdict(lambda: {"index": [], "delete": []})
+        for (index, id), op in changes.items():
+            pending[index][op].append(id)
+        models = cls.searchable_models()
+        for index, ops in pending.items():
+            model = models.get(index)
+            if model is None:
+                continue
+            removed = set(ops["delete"])
+            for start in range(0, len(ops["index"]), batch_size):
+                ids = ops["index"][start : start + batch_size]
+                batch = session.scalars(sa.select(model).where(model.id.in_(ids))).all()
+                bulk_index(index, [(obj.id, build_document(obj)) for obj in batch])
+                # rows deleted since the change was queued
+                removed.update(set(ids) - {obj.id for obj in batch})
+                for obj in batch:
+                    session.expunge(obj)
+            if removed:
+                bulk_remove(index, sorted(removed))
+
+    @classmethod
+    def reindex(cls, chunk_size=None, thread_count=None, progress=None):
+        """Rebuild the search index for this model using the bulk API.
+
+        Rows are read in keyset-paginated batches of ``chunk_size *
+        thread_count`` and expunged once shipped, so memory use stays flat
+        however large the table is. ``progress`` is called after every batch
+        with ``(done, total, docs_per_second)``.
+
+        Returns ``(indexed, failed)``: documents the backend accepted and
+        documents it rejected.
+        """
+        chunk_size = chunk_size or current_app.config["ELASTICSEARCH_BULK_CHUNK_SIZE"]
+        thread_count = thread_count or current_app.config["ELASTICSEARCH_BULK_THREADS"]
+        batch_size = chunk_size * thread_count
+        total = db.session.scalar(sa.select(sa.func.count()).select_from(cls))
+        done = indexed = 0
+        last_id = 0
+        started = monotonic()
+        while True:
+            query = (
+                sa.select(cls)
+                .where(cls.id > last_id)
+                .order_by(cls.id)
+                .limit(batch_size)
+                .execution_options(yield_per=chunk_size)
+            )
+            batch = db.session.scalars(query).all()
+            if not batch:
+                break
+            documents = [(obj.id, build_document(obj)) for obj in batch]
+            last_id = batch[-1].id
+            for obj in batch:
+                db.session.expunge(obj)
+            indexed += bulk_index(
+                cls.__tablename__,
+                documents,
+                chunk_size=chunk_size,
+                thread_count=thread_count,
+            )
+            done += len(documents)
+            rate = done / max(monotonic() - started, 1e-6)
+            if progress is not None:
+                progress(done, total, rate)
+        return indexed, done - indexed
+
+
+db.event.listen(db.session, "after_flush", SearchableMixin.after_flush)
 db.event.listen(db.session, "after_commit", SearchableMixin.after_commit)
+db.event.listen(db.session, "after_rollback", SearchableMixin.after_rollback)
 
 fsqla.FsModels.set_db_info(db)
 
@@ -95,7 +177,9 @@ class Blog(SearchableMixin, db.Model):
 
     id: so.Mapped[int] = so.mapped_column(sa.Integer, primary_key=True)
     title: so.Mapped[str] = so.mapped_column(sa.String(150), nullable=False)
-    slug: so.Mapped[str] = so.mapped_column(sa.String(150), nullable=True)
+    slug: so.Mapped[str] = so.mapped_column(
+        sa.String(150), nullable=True, unique=True, index=True
+    )
     description: so.Mapped[str] = so.mapped_column(sa.Text, nullable=True)
     user_id: so.Mapped[int] = so.mapped_column(sa.Integer, sa.ForeignKey("user.id"))
 
@@ -109,14 +193,41 @@ class Blog(SearchableMixin, db.Model):
     webmentions: so.Mapped[list["Webmention"]] = so.relationship(
         "Webmention", back_populates="blog"
     )
+    subscribers: so.WriteOnlyMapped["User"] = so.relationship(
+        secondary=blog_followers, back_populates="subscriptions"
+    )
+
+    def is_subscriber(self, user):
+        query = self.subscribers.select().where(User.id == user.id)
+        return db.session.scalar(query) is not None
+
+    def subscribe(self, user):
+        if not self.is_subscriber(user):
+            self.subscribers.add(user)
+
+    def unsubscribe(self, user):
+        if self.is_subscriber(user):
+            self.subscribers.remove(user)
 
 
 class Post(SearchableMixin, db.Model):
     __searchable__ = ["title", "content"]
+    __table_args__ = (
+        # keyset pagination of blog listings and user outboxes
+        sa.Index("ix_post_blog_id_created_at_id", "blog_id", "created_at", "id"),
+        sa.Index("ix_post_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id: so.Mapped[int] = so.mapped_column(sa.Integer, primary_key=True)
     title: so.Mapped[str] = so.mapped_column(sa.String(150), nullable=False)
     content: so.Mapped[str] = so.mapped_column(sa.Text, nullable=False)
+    # "html" or "markdown"; content_html and excerpt are rendered from the
+    # source on flush by app.content
+    content_format: so.Mapped[str] = so.mapped_column(
+        sa.String(10), default="html", server_default="html"
+    )
+    content_html: so.Mapped[Optional[str]] = so.mapped_column(sa.Text)
+    excerpt: so.Mapped[Optional[str]] = so.mapped_column(sa.String(255))
     blog_id: so.Mapped[int] = so.mapped_column(sa.Integer, sa.ForeignKey("blog.id"))
     user_id: so.Mapped[int] = so.mapped_column(sa.Integer, sa.ForeignKey("user.id"))
 
@@ -133,6 +244,17 @@ class Post(SearchableMixin, db.Model):
     comments: so.Mapped[list["Comment"]] = so.relationship("Comment", back_populates="post", cascade="all, delete")
 
 
+# Feeds only read published posts; the partial index skips drafts entirely.
+sa.Index(
+    "ix_post_published_blog_id_created_at_id",
+    Post.blog_id,
+    Post.created_at,
+    Post.id,
+    postgresql_where=Post.published.is_(True),
+    sqlite_where=Post.published.is_(True),
+)
+
+
 class Page(SearchableMixin, db.Model):
     __searchable__ = ["title", "content"]
 
@@ -159,6 +281,10 @@ class WebAuthn(db.Model, fsqla.FsWebAuthnMixin):
 
 
 class Comment(db.Model):
+    __table_args__ = (
+        sa.Index("ix_comment_user_id_created_at", "user_id", "created_at"),
+    )
+
     id = so.mapped_column(sa.Integer, primary_key=True)
     content = so.mapped_column(sa.Text, nullable=False)
 
@@ -167,7 +293,7 @@ class Comment(db.Model):
         sa.DateTime, default=sa.func.now(), onupdate=sa.func.now()
     )
 
-    post_id = so.mapped_column(sa.Integer, sa.ForeignKey("post.id"))
+    post_id = so.mapped_column(sa.Integer, sa.ForeignKey("post.id"), index=True)
     user_id = so.mapped_column(sa.Integer, sa.ForeignKey("user.id"))
 
     post = so.relationship("Post", back_populates="comments")
@@ -200,6 +326,7 @@ class User(db.Model, UserMixin):
     current_login_at: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime())
     last_login_ip: so.Mapped[Optional[str]] = so.mapped_column(sa.String(100))
     current_login_ip: so.Mapped[Optional[str]] = so.mapped_column(sa.String(100))
+    last_seen: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime())
     roles: so.Mapped[list["Role"]] = so.relationship(
         "Role", secondary=roles_users, backref=db.backref("users", lazy="dynamic")
     )
@@ -223,6 +350,9 @@ class User(db.Model, UserMixin):
         back_populates="user"
     )
     tasks: so.WriteOnlyMapped["Task"] = so.relationship(back_populates="user")
+    subscriptions: so.WriteOnlyMapped["Blog"] = so.relationship(
+        secondary=blog_followers, back_populates="subscribers"
+    )
     themes: so.Mapped[list["Theme"]] = so.relationship("Theme", back_populates="user")
     about_me: so.Mapped[Optional[str]] = so.mapped_column(sa.Text, nullable=True)
 
@@ -241,16 +371,16 @@ class User(db.Model, UserMixin):
 
     def launch_task(self, name, description, *args, **kwargs):
         rq_job = current_app.task_queue.enqueue(f"app.{name}", self.id, *args, **kwargs)
-        task = Task(id=rq_job.get_id(), name=name, description=description, user=self)
+        task = Task(id=rq_job.id, name=name, description=description, user=self)
         db.session.add(task)
         return task
 
     def get_tasks_in_progress(self):
-        query = self.tasks.select().where(Task.complete is False)
+        query = self.tasks.select().where(Task.complete.is_(False))
         return db.session.scalars(query)
 
     def get_task_in_progress(self, name):
-        query = self.tasks.select().where(Task.name == name, Task.complete is False)
+        query = self.tasks.select().where(Task.name == name, Task.complete.is_(False))
         return db.session.scalar(query)
 
 
@@ -274,6 +404,8 @@ class Task(db.Model):
     user: so.Mapped[Optional[User]] = so.relationship(back_populates="tasks")
 
     def get_rq_job(self):
+        import rq
+
         try:
             rq_job = rq.job.Job.fetch(self.id, connection=current_app.redis)
         except (redis.exceptions.RedisError, rq.exceptions.NoSuchJobError):
@@ -281,6 +413,14 @@ class Task(db.Model):
         return rq_job
 
     def get_progress(self):
+        from app.progress import read_progress
+
+        try:
+            progress = read_progress(self.id)
+        except redis.exceptions.RedisError:
+            progress = None
+        if progress is not None:
+            return progress["progress"]
         job = self.get_rq_job()
         return job.meta.get("progress", 0) if job is not None else 100
 
@@ -297,7 +437,7 @@ class Task(db.Model):
 
         # Create a new Task instance with no user_id
         new_task = cls(
-            id=rq_job.get_id(),
+            id=rq_job.id,
             name=name,
             description=description,
             user_id=None,  # Explicitly set user_id to None
@@ -358,7 +498,7 @@ class Webmention(db.Model):
     content: so.Mapped[Optional[str]] = so.mapped_column(sa.Text, nullable=True)
 
     blog_id: so.Mapped[Optional[int]] = so.mapped_column(
-        sa.ForeignKey("blog.id"), nullable=True
+        sa.ForeignKey("blog.id"), nullable=True, index=True
     )  # optional: if the webmention is associated with a blog
     blog: so.Mapped[Optional[Blog]] = so.relationship(
         "Blog", back_populates="webmentions"
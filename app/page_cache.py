@@ -0,0 +1,188 @@
+"""Full-response cache for the public blog pages.
+
+Responses are stored under a hash of (host, path and query, locale, auth
+state) together with the id of the blog they render and that blog's
+current cache generation. Committing a change to a Post, Page, Blog,
+Comment or Theme swaps the generation of every blog it touches, which
+invalidates exactly that blog's pages without scanning for keys.
+"""
+
+import secrets
+from functools import wraps
+from hashlib import sha1
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from redis.exceptions import RedisError
+from flask import current_app, g, make_response, request, session
+from flask_security import current_user
+from app.extensions import cache, db
+from app.models import Blog, Comment, Page, Post, Theme
+from app import metrics
+from app.database import use_primary
+
+
+def _generation_key(blog_id):
+    return f"page-cache:generation:{blog_id}"
+
+
+def blog_generation(blog_id):
+    key = _generation_key(blog_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, secrets.token_hex(8), timeout=0)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate_blogs(blog_ids):
+    for blog_id in blog_ids:
+        cache.set(_generation_key(blog_id), secrets.token_hex(8), timeout=0)
+
+
+def _request_key():
+    parts = [
+        request.host,
+        request.full_path,
+        str(g.get("locale", "")),
+        "auth" if current_user.is_authenticated else "anon",
+    ]
+    return "page-cache:" + sha1("|".join(parts).encode()).hexdigest()
+
+
+def _cacheable():
+    return (
+        current_app.config["PAGE_CACHE_ENABLED"]
+        and request.method == "GET"
+        and not current_user.is_authenticated
+        and "_flashes" not in session
+    )
+
+
+def cached_page(view):
+    """Serve anonymous GETs of ``view`` from the page cache.
+
+    The view must set ``g.page_cache_blog_id`` to the blog it renders;
+    responses without it are never stored.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _cacheable():
+            return view(*args, **kwargs)
+        key = _request_key()
+        entry = cache.get(key)
+        if entry is not None and (
+            entry["generation"] == blog_generation(entry["blog_id"])
+        ):
+            metrics.incr("page_cache.hits")
+            response = make_response(entry["body"], entry["status"], entry["headers"])
+            response.headers["X-Cache"] = "HIT"
+            return response
+        metrics.incr("page_cache.misses")
+        use_primary()
+        response = make_response(view(*args, **kwargs))
+        blog_id = g.get("page_cache_blog_id")
+        if response.status_code == 200 and blog_id is not None:
+            cache.set(
+                key,
+                {
+                    "blog_id": blog_id,
+                    "generation": blog_generation(blog_id),
+                    "status": response.status_code,
+                    "headers": [
+                        (name, value)
+                        for name, value in response.headers.items()
+                        if name.lower() not in ("set-cookie", "content-length")
+                    ],
+                    "body": response.get_data(),
+                },
+                timeout=current_app.config["PAGE_CACHE_TIMEOUT"],
+            )
+        response.headers["X-Cache"] = "MISS"
+        return response
+
+    return wrapper
+
+
+def _loaded(obj, name):
+    """Return ``obj.<name>`` if it is loaded, without emitting SQL."""
+    value = sa.inspect(obj).attrs[name].loaded_value
+    return None if value is so.NO_VALUE else value
+
+
+def _affected_blog_ids(session, obj, unresolved):
+    """Blog ids touched by ``obj``, read from what is already loaded.
+
+    This runs inside ``after_flush``, where SQL must not be emitted. A
+    comment or theme whose blogs are not in memory is recorded in
+    ``unresolved`` and looked up after the commit.
+    """
+    if isinstance(obj, Blog):
+        return {_loaded(obj, "id")}
+    if isinstance(obj, (Post, Page)):
+        # a post moved between blogs invalidates both
+        moved_from = sa.inspect(obj).attrs.blog_id.history.deleted or ()
+        return {_loaded(obj, "blog_id"), *moved_from}
+    if isinstance(obj, Comment):
+        post_id = _loaded(obj, "post_id")
+        post = _loaded(obj, "post")
+        if post is None and post_id is not None:
+            post = session.identity_map.get(session.identity_key(Post, post_id))
+        blog_id = _loaded(post, "blog_id") if post is not None else None
+        if blog_id is None and post_id is not None:
+            unresolved["posts"].add(post_id)
+        return {blog_id}
+    if isinstance(obj, Theme):
+        blogs = _loaded(obj, "blogs")
+        if blogs is None:
+            unresolved["themes"].add(_loaded(obj, "id"))
+            return set()
+        return {_loaded(blog, "id") for blog in blogs}
+    return set()
+
+
+def _resolve(unresolved):
+    posts, themes = unresolved["posts"], unresolved["themes"] - {None}
+    if not posts and not themes:
+        return set()
+    # the session cannot emit SQL after its commit, so use a connection
+    with db.engine.connect() as connection:
+        blog_ids = set(
+            connection.scalars(sa.select(Post.blog_id).where(Post.id.in_(posts)))
+        )
+        blog_ids.update(
+            connection.scalars(sa.select(Blog.id).where(Blog.theme_id.in_(themes)))
+        )
+    return blog_ids
+
+
+def after_flush(session, flush_context):
+    blog_ids = session.info.setdefault("page_cache_blogs", set())
+    unresolved = session.info.setdefault(
+        "page_cache_unresolved", {"posts": set(), "themes": set()}
+    )
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        blog_ids.update(_affected_blog_ids(session, obj, unresolved))
+
+
+def after_commit(session):
+    blog_ids = session.info.pop("page_cache_blogs", None) or set()
+    unresolved = session.info.pop("page_cache_unresolved", None)
+    try:
+        if unresolved:
+            blog_ids |= _resolve(unresolved)
+        blog_ids = {blog_id for blog_id in blog_ids if blog_id is not None}
+        if blog_ids:
+            invalidate_blogs(blog_ids)
+    except (RedisError, sa.exc.SQLAlchemyError):
+        current_app.logger.exception("Failed to invalidate cached pages")
+
+
+def after_rollback(session):
+    session.info.pop("page_cache_blogs", None)
+    session.info.pop("page_cache_unresolved", None)
+
+
+db.event.listen(db.session, "after_flush", after_flush)
+db.event.listen(db.session, "after_commit", after_commit)
+db.event.listen(db.session, "after_rollback", after_rollback)
@@ -0,0 +1,128 @@
+"""Keyset (cursor) pagination for post listings.
+
+OFFSET pagination has to walk past every skipped row and needs a COUNT
+per page. Listings here are ordered by ``(created_at, id)`` instead, and a
+page is fetched with a row-value comparison against the last row shown,
+so deep pages cost the same as the first one when an index on
+``(..., created_at, id)`` is available.
+"""
+
+import base64
+from datetime import datetime
+import sqlalchemy as sa
+from flask import abort, current_app, request, url_for
+from app.extensions import cache, db
+from app.models import Post
+
+
+def encode_cursor(post):
+    raw = f"{post.created_at.isoformat()}|{post.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(id)
+    except ValueError:
+        abort(400, "Invalid pagination cursor")
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, prev_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_paginate(query, per_page, after=None, before=None):
+    """Return the page of ``query`` (posts, newest first) around a cursor.
+
+    ``after`` continues with older posts than the cursor, ``before`` goes
+    back to newer ones. Any ordering on ``query`` is replaced.
+    """
+    key = sa.tuple_(Post.created_at, Post.id)
+    query = query.order_by(None)
+    if before:
+        created_at, id = decode_cursor(before)
+        query = query.where(key > sa.tuple_(sa.literal(created_at, sa.DateTime), id))
+        query = query.order_by(Post.created_at.asc(), Post.id.asc())
+    else:
+        if after:
+            created_at, id = decode_cursor(after)
+            query = query.where(
+                key < sa.tuple_(sa.literal(created_at, sa.DateTime), id)
+            )
+        query = query.order_by(Post.created_at.desc(), Post.id.desc())
+    items = db.session.scalars(query.limit(per_page + 1)).all()
+    more = len(items) > per_page
+    items = items[:per_page]
+    if before:
+        items.reverse()
+        next_cursor = encode_cursor(items[-1]) if items else None
+        prev_cursor = encode_cursor(items[0]) if items and more else None
+    else:
+        next_cursor = encode_cursor(items[-1]) if items and more else None
+        prev_cursor = encode_cursor(items[0]) if items and after else None
+    return KeysetPage(items, next_cursor, prev_cursor)
+
+
+def paginate_posts(query, endpoint, **values):
+    """Paginate a post listing and build its navigation links.
+
+    Legacy ``?page=N`` links keep using OFFSET pagination; everything else
+    uses ``?after=``/``?before=`` cursors. Returns ``(posts, next_url,
+    prev_url)``.
+    """
+    per_page = current_app.config["POSTS_PER_PAGE"]
+    if "page" in request.args:
+        posts = db.paginate(
+            query,
+            page=request.args.get("page", 1, type=int),
+            per_page=per_page,
+            error_out=False,
+        )
+        next_url = (
+            url_for(endpoint, page=posts.next_num, **values) if posts.has_next else None
+        )
+        prev_url = (
+            url_for(endpoint, page=posts.prev_num, **values) if posts.has_prev else None
+        )
+        return posts, next_url, prev_url
+    posts = keyset_paginate(
+        query,
+        per_page,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+    )
+    next_url = (
+        url_for(endpoint, after=posts.next_cursor, **values) if posts.has_next else None
+    )
+    prev_url = (
+        url_for(endpoint, before=posts.prev_cursor, **values) if posts.has_prev else None
+    )
+    return posts, next_url, prev_url
+
+
+def cached_count(key, statement):
+    """Run a COUNT statement at most once per ``COUNT_CACHE_TIMEOUT``."""
+    total = cache.get(key)
+    if total is None:
+        total = db.session.scalar(statement)
+        cache.set(key, total, timeout=current_app.config["COUNT_CACHE_TIMEOUT"])
+    return total
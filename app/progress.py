@@ -0,0 +1,152 @@
+"""Throttled progress reporting for background tasks.
+
+Jobs report progress through a ``ProgressReporter`` instead of touching
+the database on every tick. Intermediate updates are written only to a
+small Redis hash (``task:progress:<task id>``), and only when at least
+``TASK_PROGRESS_INTERVAL`` seconds have passed *and* the percentage moved
+by ``TASK_PROGRESS_MIN_DELTA``. The ``Task`` row, its notification and the
+RQ job meta are written once, when the reporter finishes. The dashboard
+polls or streams the Redis hash (see ``read_progress``).
+"""
+
+import json
+from time import monotonic, time
+
+from flask import current_app
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.extensions import db
+from app.models import Task
+
+PROGRESS_KEY = "task:progress:{}"
+
+
+def progress_key(task_id):
+    return PROGRESS_KEY.format(task_id)
+
+
+def read_progress(task_id):
+    """Return the last published progress of a task, or None if unknown."""
+    data = current_app.redis.hgetall(progress_key(task_id))
+    if not data:
+        return None
+    data = {key.decode(): value.decode() for key, value in data.items()}
+    return {
+        "task_id": task_id,
+        "user_id": int(data["user_id"]) if data.get("user_id") else None,
+        "progress": int(data.get("progress", 0)),
+        "updated": float(data.get("updated", 0)),
+        "meta": json.loads(data.get("meta", "{}")),
+    }
+
+
+class ProgressReporter:
+    """Rate-limited progress updates for the current RQ job.
+
+    ``update`` may be called as often as the caller likes; it only writes
+    to Redis when the update is due. ``finish`` always publishes 100% and
+    persists the outcome to the database. Outside a job (for instance when
+    a task function is called directly) the reporter is a no-op.
+    """
+
+    def __init__(self, job=None, user_id=None, min_interval=None, min_delta=None):
+        from rq import get_current_job
+
+        config = current_app.config
+        self.job = job or get_current_job()
+        self.task_id = self.job.id if self.job else None
+        self.user_id = user_id
+        self.min_interval = (
+            config["TASK_PROGRESS_INTERVAL"] if min_interval is None else min_interval
+        )
+        self.min_delta = (
+            config["TASK_PROGRESS_MIN_DELTA"] if min_delta is None else min_delta
+        )
+        self.progress = 0
+        self.meta = {}
+        self.published = None
+        self.published_at = None
+        self.finished = False
+
+    def _due(self, progress):
+        if self.published is None:
+            return True
+        if progress - self.published < self.min_delta:
+            return False
+        return monotonic() - self.published_at >= self.min_interval
+
+    def update(self, progress, **meta):
+        """Record ``progress`` (0-100) and publish it if an update is due.
+
+        Keyword arguments are small values shown alongside the progress,
+        such as a document rate; they are published with the next update.
+        """
+        self.progress = max(self.progress, min(int(progress), 99))
+        self.meta.update(meta)
+        if self.job is None or not self._due(self.progress):
+            return False
+        self._publish()
+        return True
+
+    def update_count(self, done, total, **meta):
+        return self.update(100 * done // total if total else 100, **meta)
+
+    def _publish(self):
+        self.published = self.progress
+        self.published_at = monotonic()
+        mapping = {
+            "progress": self.progress,
+            "updated": time(),
+            "meta": json.dumps(self.meta),
+        }
+        if self.user_id is not None:
+            mapping["user_id"] = self.user_id
+        key = progress_key(self.task_id)
+        try:
+            pipe = current_app.redis.pipeline()
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, current_app.config["TASK_PROGRESS_TTL"])
+            pipe.execute()
+        except RedisError:
+            current_app.logger.warning("Could not publish task progress", exc_info=True)
+
+    def finish(self, **result):
+        """Publish 100%, save the job meta and mark the task complete.
+
+        ``result`` is stored in the RQ job meta only, so it may be larger
+        than what is worth publishing on every update. The session is
+        committed, together with whatever the job has added to it. If the
+        job's own flush or commit failed, or its pending work cannot be
+        committed, that work is rolled back so the task is still marked
+        complete; otherwise it would block the user's next import or export.
+        """
+        if self.finished or self.job is None:
+            return
+        self.finished = True
+        self.progress = 100
+        self._publish()
+        self.job.meta.update(self.meta, **result)
+        self.job.meta["progress"] = 100
+        self.job.save_meta()
+        if not db.session.is_active:
+            db.session.rollback()
+        try:
+            self._complete_task()
+        except SQLAlchemyError:
+            current_app.logger.warning(
+                "Discarding the work of failed task %s", self.task_id, exc_info=True
+            )
+            db.session.rollback()
+            self._complete_task()
+
+    def _complete_task(self):
+        task = db.session.get(Task, self.task_id)
+        if task is None:
+            return
+        task.complete = True
+        if task.user is not None:
+            task.user.add_notification(
+                "task_progress", {"task_id": self.task_id, "progress": 100}
+            )
+        db.session.commit()
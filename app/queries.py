@@ -0,0 +1,122 @@
+"""Query shapes for the public read paths.
+
+Listings render the author name and blog slug of every post, so these
+helpers load them up front instead of lazily once per card, and only pull
+the columns the templates use from the related tables.
+"""
+
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from app.models import Blog, Comment, Post, User
+
+
+def post_card_options(blog_joined=False):
+    """Loader options for post cards.
+
+    Pass ``blog_joined=True`` when the query already joins ``Post.blog``,
+    so the blog is filled from that join instead of a second one.
+    """
+    blog = so.contains_eager(Post.blog) if blog_joined else so.joinedload(Post.blog)
+    # cards show the pre-rendered excerpt, so skip the full bodies
+    return (
+        so.defer(Post.content),
+        so.defer(Post.content_html),
+        so.joinedload(Post.author).load_only(User.id, User.username),
+        blog.load_only(Blog.id, Blog.slug, Blog.title),
+    )
+
+
+def feed_posts():
+    return (
+        sa.select(Post)
+        .join(Post.blog)
+        .options(*post_card_options(blog_joined=True))
+        .order_by(Post.created_at.desc(), Post.id.desc())
+    )
+
+
+def blog_posts(blog_id):
+    return (
+        sa.select(Post)
+        .where(Post.blog_id == blog_id)
+        .options(*post_card_options())
+        .order_by(Post.created_at.desc(), Post.id.desc())
+    )
+
+
+def user_posts(user_id):
+    return (
+        sa.select(Post)
+        .where(Post.user_id == user_id)
+        .options(*post_card_options())
+        .order_by(Post.created_at.desc(), Post.id.desc())
+    )
+
+
+def user_comments(user_id):
+    return (
+        sa.select(Comment)
+        .where(Comment.user_id == user_id)
+        .options(
+            so.joinedload(Comment.post)
+            .load_only(Post.id, Post.blog_id)
+            .joinedload(Post.blog)
+            .load_only(Blog.id, Blog.slug)
+        )
+        .order_by(Comment.created_at.desc())
+    )
+
+
+def explore_blogs():
+    return sa.select(Blog).order_by(Blog.id)
+
+
+def blog_by_slug(slug):
+    return sa.select(Blog).where(Blog.slug == slug).options(
+        so.joinedload(Blog.author).load_only(User.id, User.username)
+    )
+
+
+def post_in_blog(post_id, slug):
+    return (
+        sa.select(Post)
+        .join(Post.blog)
+        .where(Post.id == post_id, Blog.slug == slug)
+        .options(so.contains_eager(Post.blog))
+    )
+
+
+def blog_by_id(blog_id):
+    return sa.select(Blog).where(Blog.id == blog_id).options(
+        so.joinedload(Blog.author).load_only(User.id, User.username)
+    )
+
+
+def feed_items(blog_id, limit):
+    return (
+        sa.select(Post)
+        .where(Post.blog_id == blog_id, Post.published.is_(True))
+        .options(
+            so.load_only(
+                Post.id, Post.title, Post.excerpt, Post.created_at, Post.updated_at
+            )
+        )
+        .order_by(Post.created_at.desc(), Post.id.desc())
+        .limit(limit)
+    )
+
+
+def outbox_posts(user_id):
+    return (
+        sa.select(Post)
+        .where(Post.user_id == user_id)
+        .options(
+            so.load_only(Post.id, Post.content_html, Post.created_at),
+            so.joinedload(Post.blog).load_only(Blog.id, Blog.slug),
+        )
+        .order_by(Post.created_at.desc(), Post.id.desc())
+    )
+
+
+def count_posts(*criteria):
+    return sa.select(sa.func.count(Post.id)).where(*criteria)
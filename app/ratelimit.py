@@ -0,0 +1,50 @@
+"""Redis token buckets shared by every worker.
+
+Each bucket is a small hash holding the token count and the time it was
+last refilled. Buckets refill continuously at ``rate`` tokens per second up
+to ``capacity`` and expire once they would be full again, so idle keys do
+not pile up. Updates use WATCH/MULTI, which keeps them atomic across
+processes without server-side scripting.
+"""
+
+from math import ceil
+from time import time
+
+from flask import current_app
+
+
+def take_token(key, capacity, rate, now=None):
+    """Take one token from bucket ``key``; returns False when it is empty."""
+    return take_tokens([(key, capacity, rate)], now=now) is None
+
+
+def take_tokens(buckets, now=None):
+    """Take one token from every ``(key, capacity, rate)`` bucket, or from none.
+
+    All buckets are checked in one transaction, so a request rejected by a
+    later bucket does not use up tokens of the earlier ones. Returns the
+    position of the first empty bucket, or None when the tokens were taken.
+    """
+    keys = [f"ratelimit:{key}" for key, _, _ in buckets]
+
+    def attempt(pipe):
+        current = time() if now is None else now
+        levels = []
+        for key, (_, capacity, rate) in zip(keys, buckets):
+            tokens, updated = pipe.hmget(key, "tokens", "updated")
+            if tokens is None:
+                tokens = capacity
+            else:
+                elapsed = max(current - float(updated), 0)
+                tokens = min(capacity, float(tokens) + elapsed * rate)
+            levels.append(tokens)
+        empty = next((i for i, tokens in enumerate(levels) if tokens < 1), None)
+        pipe.multi()
+        for key, tokens, (_, capacity, rate) in zip(keys, levels, buckets):
+            if empty is None:
+                tokens -= 1
+            pipe.hset(key, mapping={"tokens": tokens, "updated": current})
+            pipe.expire(key, ceil(capacity / rate) + 1)
+        return empty
+
+    return current_app.redis.transaction(attempt, *keys, value_from_callable=True)
@@ -0,0 +1,133 @@
+from flask import current_app
+from redis.exceptions import RedisError, ResponseError
+
+OUTBOX_KEY = "search:outbox"
+OUTBOX_PROCESSING_KEY = "search:outbox:processing"
+OUTBOX_SCHEDULED_KEY = "search:outbox:scheduled"
+
+
+def build_document(model):
+    payload = {}
+    for field in model.__searchable__:
+        payload[field] = getattr(model, field)
+    return payload
+
+
+def add_to_index(index, model):
+    if not current_app.search_backend:
+        return
+    payload = build_document(model)
+    current_app.search_backend.index(index, model.id, payload)
+
+
+def bulk_index(index, documents, chunk_size=None, thread_count=None):
+    """Index ``(id, document)`` pairs in bulk.
+
+    Returns the number of documents that were indexed.
+    """
+    if not current_app.search_backend:
+        return 0
+    chunk_size = chunk_size or current_app.config["ELASTICSEARCH_BULK_CHUNK_SIZE"]
+    thread_count = thread_count or current_app.config["ELASTICSEARCH_BULK_THREADS"]
+    return current_app.search_backend.bulk_index(
+        index, documents, chunk_size, thread_count
+    )
+
+
+def bulk_remove(index, ids, chunk_size=None):
+    if not current_app.search_backend:
+        return 0
+    chunk_size = chunk_size or current_app.config["ELASTICSEARCH_BULK_CHUNK_SIZE"]
+    return current_app.search_backend.bulk_remove(index, ids, chunk_size)
+
+
+def remove_from_index(index, model):
+    if not current_app.search_backend:
+        return
+    current_app.search_backend.remove(index, model.id)
+
+
+def query_index(index, query, page, per_page):
+    if not current_app.search_backend:
+        return [], 0
+    return current_app.search_backend.query(index, query, page, per_page)
+
+
+def queue_index_changes(changes):
+    """Record ``(index, id, op)`` changes in the Redis outbox.
+
+    Changes are stored in a hash keyed by ``index:id`` so repeated updates to
+    the same row collapse into one entry, and a single ``sync_search_index``
+    job is scheduled to drain them. Returns False when the caller should
+    apply the changes inline instead.
+    """
+    if not current_app.search_backend:
+        return True
+    if not current_app.config["SEARCH_SYNC_ASYNC"]:
+        return False
+    try:
+        pipe = current_app.redis.pipeline()
+        pipe.hset(
+            OUTBOX_KEY, mapping={f"{index}:{id}": op for index, id, op in changes}
+        )
+        pipe.execute()
+        schedule_index_sync()
+    except RedisError:
+        current_app.logger.warning(
+            "Search outbox unavailable, indexing inline", exc_info=True
+        )
+        return False
+    return True
+
+
+def schedule_index_sync():
+    """Enqueue one ``sync_search_index`` job unless one is already pending.
+
+    Failed runs are retried by RQ; their batch stays in the processing key
+    until it is acknowledged.
+    """
+    from rq import Retry
+
+    redis = current_app.redis
+    if not redis.set(OUTBOX_SCHEDULED_KEY, 1, nx=True):
+        return
+    config = current_app.config
+    current_app.task_queue.enqueue(
+        "app.tasks.sync_search_index",
+        retry=Retry(
+            max=config["SEARCH_SYNC_RETRIES"],
+            interval=config["SEARCH_SYNC_RETRY_INTERVAL"],
+        ),
+    )
+
+
+def pop_index_changes():
+    """Claim everything queued in the outbox as ``{(index, id): op}``.
+
+    A batch left behind by a crashed worker is picked up again before new
+    changes are claimed; call :func:`ack_index_changes` once applied.
+    """
+    redis = current_app.redis
+    redis.delete(OUTBOX_SCHEDULED_KEY)
+    if not redis.exists(OUTBOX_PROCESSING_KEY):
+        try:
+            redis.rename(OUTBOX_KEY, OUTBOX_PROCESSING_KEY)
+        except ResponseError:
+            return {}
+    changes = {}
+    for key, op in redis.hgetall(OUTBOX_PROCESSING_KEY).items():
+        index, id = key.decode().rsplit(":", 1)
+        changes[(index, int(id))] = op.decode()
+    return changes
+
+
+def ack_index_changes():
+    """Drop the applied batch and schedule a run for changes queued since.
+
+    New changes may have arrived while a leftover batch was being replayed,
+    after this run had already cleared the scheduled flag.
+    """
+    redis = current_app.redis
+    redis.delete(OUTBOX_PROCESSING_KEY)
+    if redis.exists(OUTBOX_KEY):
+        schedule_index_sync()
@@ -0,0 +1,241 @@
+import re
+import sqlalchemy as sa
+from flask import current_app
+from app.extensions import db
+
+
+class SearchBackend:
+    """Interface implemented by every search backend.
+
+    ``index`` names are model table names and documents are the plain
+    dictionaries produced by ``build_document``.
+    """
+
+    def index(self, index, id, document):
+        raise NotImplementedError
+
+    def remove(self, index, id):
+        raise NotImplementedError
+
+    def query(self, index, query, page, per_page):
+        """Return ``(ids, total)`` for one page of results, best match first."""
+        raise NotImplementedError
+
+    def bulk_index(self, index, documents, chunk_size, thread_count):
+        for id, document in documents:
+            self.index(index, id, document)
+        return len(documents)
+
+    def bulk_remove(self, index, ids, chunk_size):
+        for id in ids:
+            self.remove(index, id)
+        return len(ids)
+
+
+class ElasticsearchBackend(SearchBackend):
+    def __init__(self, client):
+        self.client = client
+
+    def index(self, index, id, document):
+        self.client.index(index=index, id=id, document=document)
+
+    def remove(self, index, id):
+        self.client.delete(index=index, id=id)
+
+    def query(self, index, query, page, per_page):
+        search = self.client.search(
+            index=index,
+            query={"multi_match": {"query": query, "fields": ["*"]}},
+            from_=(page - 1) * per_page,
+            size=per_page,
+        )
+        ids = [int(hit["_id"]) for hit in search["hits"]["hits"]]
+        return ids, search["hits"]["total"]["value"]
+
+    def bulk_index(self, index, documents, chunk_size, thread_count):
+        # Documents must already be plain data: with thread_count > 1 the
+        # actions are consumed from worker threads that have no app context.
+        actions = [
+            {"_index": index, "_id": id, "_source": document}
+            for id, document in documents
+        ]
+        return self._bulk(actions, chunk_size, thread_count)
+
+    def bulk_remove(self, index, ids, chunk_size):
+        actions = [{"_op_type": "delete", "_index": index, "_id": id} for id in ids]
+        return self._bulk(actions, chunk_size, 1, ignore_status=404)
+
+    def _bulk(self, actions, chunk_size, thread_count, **kwargs):
+        # imported here: the client library is slow to import and only
+        # needed when Elasticsearch is enabled
+        from elasticsearch.helpers import parallel_bulk, streaming_bulk
+
+        if thread_count > 1:
+            results = parallel_bulk(
+                self.client,
+                actions,
+                chunk_size=chunk_size,
+                thread_count=thread_count,
+                raise_on_error=False,
+                **kwargs,
+            )
+        else:
+            results = streaming_bulk(
+                self.client,
+                actions,
+                chunk_size=chunk_size,
+                raise_on_error=False,
+                **kwargs,
+            )
+        succeeded = 0
+        for ok, info in results:
+            if ok:
+                succeeded += 1
+            else:
+                current_app.logger.warning("Bulk search action failed: %s", info)
+        return succeeded
+
+
+class DatabaseBackend(SearchBackend):
+    """Full-text search inside the application database.
+
+    Each index gets its own table keyed by the model id: an FTS5 virtual
+    table on SQLite, ranked with bm25, or a ``tsvector`` column with a GIN
+    index on PostgreSQL, ranked with ``ts_rank_cd``. Tables are created on
+    first use, so no migration is needed to switch backends.
+    """
+
+    def __init__(self, language="english"):
+        self.language = language
+        self._tables = set()
+
+    @property
+    def engine(self):
+        return db.engine
+
+    def index(self, index, id, document):
+        self.bulk_index(index, [(id, document)], None, 1)
+
+    def remove(self, index, id):
+        self.bulk_remove(index, [id], None)
+
+    def bulk_index(self, index, documents, chunk_size, thread_count):
+        if not documents:
+            return 0
+        table = self._table(index)
+        rows = [{"id": id, "body": self._text(document)} for id, document in documents]
+        with self.engine.begin() as conn:
+            self._ensure_table(conn, table)
+            if self.engine.dialect.name == "postgresql":
+                conn.execute(
+                    sa.text(
+                        f"INSERT INTO {table} (id, document) "
+                        "VALUES (:id, to_tsvector(CAST(:language AS regconfig), :body)) "
+                        "ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document"
+                    ),
+                    [dict(row, language=self.language) for row in rows],
+                )
+            else:
+                conn.execute(
+                    sa.text(f"DELETE FROM {table} WHERE rowid = :id"),
+                    [{"id": row["id"]} for row in rows],
+                )
+                conn.execute(
+                    sa.text(f"INSERT INTO {table} (rowid, body) VALUES (:id, :body)"),
+                    rows,
+                )
+        return len(rows)
+
+    def bulk_remove(self, index, ids, chunk_size):
+        if not ids:
+            return 0
+        table = self._table(index)
+        key = "id" if self.engine.dialect.name == "postgresql" else "rowid"
+        with self.engine.begin() as conn:
+            self._ensure_table(conn, table)
+            conn.execute(
+                sa.text(f"DELETE FROM {table} WHERE {key} = :id"),
+                [{"id": id} for id in ids],
+            )
+        return len(ids)
+
+    def query(self, index, query, page, per_page):
+        table = self._table(index)
+        params = {"limit": per_page, "offset": (page - 1) * per_page}
+        if self.engine.dialect.name == "postgresql":
+            params.update(query=query, language=self.language)
+            sql = (
+                "SELECT id, count(*) OVER () AS total FROM {table}, "
+                "websearch_to_tsquery(CAST(:language AS regconfig), :query) AS q "
+                "WHERE document @@ q ORDER BY ts_rank_cd(document, q) DESC, id "
+                "LIMIT :limit OFFSET :offset"
+            )
+        else:
+            # quote every term so user input can't use FTS5 query syntax
+            terms = ['"{}"'.format(term.replace('"', '""')) for term in query.split()]
+            if not terms:
+                return [], 0
+            params["query"] = " ".join(terms)
+            sql = (
+                "SELECT rowid, count(*) OVER () AS total FROM {table} "
+                "WHERE {table} MATCH :query ORDER BY rank, rowid "
+                "LIMIT :limit OFFSET :offset"
+            )
+        with self.engine.begin() as conn:
+            self._ensure_table(conn, table)
+            rows = conn.execute(sa.text(sql.format(table=table)), params).all()
+        if not rows:
+            return [], 0
+        return [row[0] for row in rows], rows[0][1]
+
+    def _table(self, index):
+        if not re.fullmatch(r"\w+", index):
+            raise ValueError(f"Invalid search index name: {index!r}")
+        return f"search_{index}"
+
+    def _ensure_table(self, conn, table):
+        if table in self._tables:
+            return
+        if self.engine.dialect.name == "postgresql":
+            conn.execute(
+                sa.text(
+                    f"CREATE TABLE IF NOT EXISTS {table} "
+                    "(id INTEGER PRIMARY KEY, document TSVECTOR NOT NULL)"
+                )
+            )
+            conn.execute(
+                sa.text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{table}_document "
+                    f"ON {table} USING GIN (document)"
+                )
+            )
+        else:
+            conn.execute(
+                sa.text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5"
+                    "(body, tokenize = 'unicode61 remove_diacritics 2')"
+                )
+            )
+        self._tables.add(table)
+
+    @staticmethod
+    def _text(document):
+        return " ".join(
+            str(value) for value in document.values() if isinstance(value, str)
+        )
+
+
+def create_search_backend(app):
+    name = app.config["SEARCH_BACKEND"]
+    if name == "elasticsearch":
+        return ElasticsearchBackend(app.elasticsearch) if app.elasticsearch else None
+    if name == "database":
+        return DatabaseBackend(app.config["SEARCH_LANGUAGE"])
+    return None
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Keep Alembic autogenerate from dropping the database backend's tables."""
+    return not (
+        type_ == "table" and reflected and compare_to is None and name.startswith("search_")
+    )
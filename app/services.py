@@ -0,0 +1,148 @@
+"""Lazily created clients shared by the whole app.
+
+``create_app`` registers a factory per service instead of building every
+client up front; ``app.redis``, ``app.task_queue``, ``app.elasticsearch``,
+``app.search_backend`` and ``app.translator`` are created on first use and
+then reused. Redis clients share one ``ConnectionPool`` tuned by the
+``REDIS_*`` settings, which redis-py already resets after a fork. Services
+that are not fork-safe (the Elasticsearch client and what is built on it)
+are rebuilt in a forked child instead of reusing the parent's sockets, and
+SQLAlchemy pools are discarded in the child too, so gunicorn ``--preload``
+workers and RQ work horses never share connections with their parent.
+``Services.close`` tears everything down at exit.
+"""
+
+import atexit
+import os
+import threading
+import weakref
+
+from flask import Flask
+from werkzeug.utils import import_string
+
+_apps = weakref.WeakSet()
+
+
+class Services:
+    def __init__(self, app):
+        self.app = app
+        self._factories = {}
+        self._instances = {}
+        self._pid = os.getpid()
+        self._lock = threading.RLock()
+        self._registered = False
+
+    def register(self, name, factory, close=None, fork_safe=True):
+        self._factories[name] = (factory, close, fork_safe)
+
+    def _after_fork(self):
+        # the parent's sockets are not ours to close; just forget them
+        self._instances = {
+            name: instance
+            for name, instance in self._instances.items()
+            if self._factories.get(name, (None, None, True))[2]
+        }
+        self._pid = os.getpid()
+
+    def get(self, name):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._after_fork()
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._instances:
+                factory = self._factories[name][0]
+                self._instances[name] = factory(self.app)
+                if not self._registered:
+                    atexit.register(self.close)
+                    self._registered = True
+            return self._instances[name]
+
+    def set(self, name, value):
+        self._instances[name] = value
+
+    def created(self, name):
+        return name in self._instances
+
+    def close(self):
+        with self._lock:
+            instances, self._instances = self._instances, {}
+        for name, instance in instances.items():
+            close = self._factories.get(name, (None, None, True))[1]
+            if close is not None and instance is not None:
+                try:
+                    close(instance)
+                except Exception:
+                    self.app.logger.warning("Could not close %s", name, exc_info=True)
+
+
+def service(name):
+    def get(app):
+        return app.services.get(name)
+
+    def set(app, value):
+        app.services.set(name, value)
+
+    return property(get, set, doc=f"The lazily created {name} service.")
+
+
+class ServiceFlask(Flask):
+    redis = service("redis")
+    task_queue = service("task_queue")
+    elasticsearch = service("elasticsearch")
+    search_backend = service("search_backend")
+    translator = service("translator")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.services = Services(self)
+        _apps.add(self)
+
+
+def create_redis(app):
+    config = app.config
+    redis_class = import_string(config.get("RQ_CONNECTION_CLASS", "redis.Redis"))
+    return redis_class.from_url(
+        config["RQ_REDIS_URL"],
+        max_connections=config["REDIS_MAX_CONNECTIONS"],
+        socket_timeout=config["REDIS_SOCKET_TIMEOUT"],
+        socket_connect_timeout=config["REDIS_CONNECT_TIMEOUT"],
+        socket_keepalive=True,
+        health_check_interval=config["REDIS_HEALTH_CHECK_INTERVAL"],
+    )
+
+
+def create_task_queue(app):
+    import rq
+
+    return rq.Queue("microblog-tasks", connection=app.redis)
+
+
+def create_elasticsearch(app):
+    if not app.config["ELASTICSEARCH_ENABLED"]:
+        return None
+    from elasticsearch import Elasticsearch
+
+    return Elasticsearch(
+        [app.config["ELASTICSEARCH_URL"]],
+        api_key=app.config["ELASTICSEARCH_API_KEY"],
+    )
+
+
+def _dispose_engines():
+    from app.extensions import db
+
+    for app in list(_apps):
+        if "sqlalchemy" not in app.extensions:
+            continue
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_engines)
@@ -0,0 +1,84 @@
+"""Startup timing.
+
+``create_app`` records how long each phase of building the app took in
+``app.startup_timings``. ``measure_startup`` boots the app in a fresh
+interpreter running with ``-X importtime``, so nothing is already imported,
+and returns those phases with the time spent importing each module.
+``flask perf startup`` prints the result.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from time import perf_counter
+
+_BOOT = """
+import json, sys
+from time import perf_counter
+started = perf_counter()
+from app import create_app
+imported = perf_counter()
+app = create_app(sys.argv[1])
+finished = perf_counter()
+print(json.dumps({
+    "import": imported - started,
+    "create_app": finished - imported,
+    "phases": app.startup_timings,
+}))
+"""
+
+
+class StartupTimer:
+    def __init__(self):
+        self.timings = {}
+        self._last = perf_counter()
+
+    def mark(self, phase):
+        now = perf_counter()
+        self.timings[phase] = self.timings.get(phase, 0.0) + now - self._last
+        self._last = now
+
+
+def parse_importtime(output):
+    """Return ``(module, self_seconds, cumulative_seconds)`` per import."""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        try:
+            own, cumulative, module = line[len("import time:"):].split("|")
+            imports.append((module.strip(), int(own) / 1e6, int(cumulative) / 1e6))
+        except ValueError:
+            continue  # the header line
+    return imports
+
+
+def by_package(imports):
+    """Sum the import time of every module per top-level package."""
+    packages = defaultdict(lambda: [0.0, 0])
+    for module, own, _ in imports:
+        package = packages[module.split(".")[0]]
+        package[0] += own
+        package[1] += 1
+    return sorted(
+        ((name, own, count) for name, (own, count) in packages.items()),
+        key=lambda package: package[1],
+        reverse=True,
+    )
+
+
+def measure_startup(config="config.Config", cwd=None):
+    cwd = cwd or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _BOOT, config],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(f"App failed to start:\n{result.stderr[-2000:]}")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["imports"] = parse_importtime(result.stderr)
+    return timings
@@ -1,68 +1,188 @@
-import json
 import sys
-import time
-import sqlalchemy as sa
-from flask import render_template
+from flask import current_app, has_app_context, render_template
 from rq import get_current_job
 from app import create_app
 from app.extensions import db
-from app.models import User, Post, Task
+from app.models import User, SearchableMixin
 from app.email import send_email
+from app.search import pop_index_changes, ack_index_changes
+from app import activity, language, imports, exports
+from app.jobs.webmention import process_pending_webmentions
+from app.jobs import newsletter
+from app.progress import ProgressReporter
 
-app = create_app()
-app.app_context().push()
+_worker_app = None
 
 
-def _set_task_progress(progress):
-    job = get_current_job()
-    if job:
-        job.meta["progress"] = progress
-        job.save_meta()
-        task = db.session.get(Task, job.get_id())
-        task.user.add_notification(
-            "task_progress", {"task_id": job.get_id(), "progress": progress}
-        )
-        if progress >= 100:
-            task.complete = True
-        db.session.commit()
+def _app():
+    """Return the current app, creating one for a plain ``rq worker``.
 
+    ``flask worker`` runs jobs inside its own app context; only workers
+    started without one build an app, once per process, on their first job.
+    """
+    global _worker_app
+    if has_app_context():
+        return current_app._get_current_object()
+    if _worker_app is None:
+        _worker_app = create_app()
+        _worker_app.app_context().push()
+    return _worker_app
 
-def export_posts_json(user_id):
+
+def export_posts(user_id, format="jsonl", account_url=None):
+    app = _app()
+    progress = ProgressReporter(user_id=user_id)
     try:
         user = db.session.get(User, user_id)
-        _set_task_progress(0)
-        data = []
-        i = 0
-        total_posts = db.session.scalar(
-            sa.select(sa.func.count()).select_from(user.posts.select().subquery())
+        job = get_current_job()
+        task_id = job.id if job else "local"
+        progress.update(0)
+        exports.write_export(user_id, task_id, format, progress=progress.update_count)
+        user.add_notification(
+            "export_ready", {"task_id": task_id, "format": format}
         )
-        for post in db.session.scalars(
-            user.posts.select().order_by(Post.timestamp.asc())
-        ):
-            data.append(
-                {"body": post.body, "timestamp": post.timestamp.isoformat() + "Z"}
+        db.session.commit()
+        try:
+            send_email(
+                "[Flask CMS] Your blog posts",
+                sender=None,
+                recipients=[user.email],
+                text_body=render_template(
+                    "email/export_posts.txt", user=user, url=account_url
+                ),
+                html_body=render_template(
+                    "email/export_posts.html", user=user, url=account_url
+                ),
+                sync=True,
             )
-            time.sleep(5)
-            i += 1
-            _set_task_progress(100 * i // total_posts)
-
-        send_email(
-            "[Flask CMS] Your blog posts",
-            sender=app.config["ADMINS"][0],
-            recipients=[user.email],
-            text_body=render_template("email/export_posts.txt", user=user),
-            html_body=render_template("email/export_posts.html", user=user),
-            attachments=[
-                (
-                    "posts.json",
-                    "application/json",
-                    json.dumps({"posts": data}, indent=4),
-                )
-            ],
-            sync=True,
+        except Exception:
+            app.logger.warning("Could not email export link", exc_info=True)
+    except Exception:
+        app.logger.error("Unhandled exception", exc_info=sys.exc_info())
+    finally:
+        progress.finish()
+
+
+def reindex(model_name, chunk_size=None, thread_count=None):
+    app = _app()
+    progress = ProgressReporter()
+    try:
+        model = SearchableMixin.searchable_models()[model_name]
+        progress.update(0)
+
+        def report(done, total, rate):
+            progress.update_count(done, total, docs_per_second=round(rate, 1))
+
+        indexed, failed = model.reindex(
+            chunk_size=chunk_size, thread_count=thread_count, progress=report
+        )
+        progress.meta.update(indexed=indexed, failed=failed)
+        app.logger.info(
+            "Reindexed %d %s documents, %d failed (%s docs/s)",
+            indexed,
+            model_name,
+            failed,
+            progress.meta.get("docs_per_second", 0),
+        )
+    except Exception:
+        app.logger.error("Unhandled exception", exc_info=sys.exc_info())
+    finally:
+        progress.finish()
+
+
+def sync_search_index():
+    app = _app()
+    try:
+        changes = pop_index_changes()
+        if changes:
+            SearchableMixin.apply_index_changes(changes)
+        ack_index_changes()
+        app.logger.info("Applied %d queued search index changes", len(changes))
+    except Exception:
+        app.logger.error("Unhandled exception", exc_info=sys.exc_info())
+        # re-raise so RQ retries; the unacknowledged batch is replayed first
+        raise
+
+
+def flush_activity():
+    app = _app()
+    try:
+        flushed = activity.flush_activity()
+        app.logger.info("Flushed last-seen times for %d users", flushed)
+    except Exception:
+        app.logger.error("Unhandled exception", exc_info=sys.exc_info())
+    finally:
+        # schedule the next run, even after a failure
+        app.redis.delete(activity.FLUSH_SCHEDULED_KEY)
+        activity.schedule_flush()
+
+
+def process_webmentions():
+    app = _app()
+    try:
+        stored = process_pending_webmentions()
+        app.logger.info("Stored %d verified webmentions", stored)
+    except Exception:
+        app.logger.error("Unhandled exception", exc_info=sys.exc_info())
+        # re-raise so RQ retries; the unacknowledged batch is replayed first
+        raise
+
+
+def detect_languages():
+    app = _app()
+    try:
+        done = language.process_pending()
+        app.logger.info("Detected the language of %d posts", done)
+    except Exception:
+        app.logger.error("Unhandled exception", exc_info=sys.exc_info())
+
+
+def import_posts(user_id, blog_id, path):
+    app = _app()
+    progress = ProgressReporter(user_id=user_id)
+    results = []
+    try:
+        job = get_current_job()
+        progress.update(0)
+
+        def report(results, done, total):
+            progress.update_count(done, total, files=len(results))
+
+        results = imports.run_import(path, blog_id, user_id, progress=report)
+        failed = [result for result in results if result["status"] == "failed"]
+        user = db.session.get(User, user_id)
+        user.add_notification(
+            "import_finished",
+            {
+                "task_id": job.id if job else None,
+                "imported": len(results) - len(failed),
+                "failed": failed,
+            },
         )
+        db.session.commit()
     except Exception:
-        _set_task_progress(100)
         app.logger.error("Unhandled exception", exc_info=sys.exc_info())
     finally:
-        _set_task_progress(100)
+        progress.finish(results=results)
+
+
+def send_newsletter(blog_id):
+    app = _app()
+    try:
+        issue_id, chunks = newsletter.queue_newsletter(blog_id)
+        app.logger.info(
+            "Queued newsletter %s for blog %s in %d chunks", issue_id, blog_id, chunks
+        )
+    except Exception:
+        app.logger.error("Unhandled exception", exc_info=sys.exc_info())
+
+
+def send_newsletter_chunk(issue_id, user_ids):
+    app = _app()
+    try:
+        sent = newsletter.send_chunk(issue_id, user_ids)
+        app.logger.info("Sent newsletter %s to %d subscribers", issue_id, sent)
+    except Exception:
+        app.logger.error("Unhandled exception", exc_info=sys.exc_info())
+        # re-raise so RQ retries the chunk; delivered recipients are skipped
+        raise
@@ -1,26 +1,190 @@
+"""Machine translation with a two-level cache.
+
+``current_app.translator`` caches every translated segment by the SHA-256
+of its text plus the language pair, first in a per-process LRU and then in
+Redis so all workers share results. Cache misses for a whole list of
+segments are sent to the backend together; Microsoft Translator accepts up
+to ``TRANSLATOR_BATCH_SIZE`` texts per request.
+
+``TRANSLATOR_BACKEND`` selects "microsoft", "local" (an offline stub that
+tags the text with the target language, for tests and development) or
+"none".
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
 import httpx
 from flask import current_app
 from flask_babel import _
+from redis.exceptions import RedisError
+
+from app import metrics
+
+
+class TranslationError(Exception):
+    pass
+
+
+class TranslationBackend:
+    def translate_batch(self, texts, source_language, dest_language):
+        raise NotImplementedError
+
+
+class MicrosoftBackend(TranslationBackend):
+    url = "https://api.cognitive.microsofttranslator.com/translate"
+    # documented per-request limits of the v3 API
+    max_chars = 50_000
+
+    def __init__(self, key, region, batch_size):
+        self.headers = {
+            "Ocp-Apim-Subscription-Key": key,
+            "Ocp-Apim-Subscription-Region": region,
+        }
+        self.batch_size = batch_size
+
+    def _batches(self, texts):
+        batch, chars = [], 0
+        for text in texts:
+            if batch and (
+                len(batch) == self.batch_size or chars + len(text) > self.max_chars
+            ):
+                yield batch
+                batch, chars = [], 0
+            batch.append(text)
+            chars += len(text)
+        if batch:
+            yield batch
+
+    def translate_batch(self, texts, source_language, dest_language):
+        results = []
+        for batch in self._batches(texts):
+            try:
+                r = current_app.http.post(
+                    self.url,
+                    params={
+                        "api-version": "3.0",
+                        "from": source_language,
+                        "to": dest_language,
+                    },
+                    headers=self.headers,
+                    json=[{"Text": text} for text in batch],
+                )
+            except httpx.HTTPError as e:
+                raise TranslationError(str(e)) from e
+            if r.status_code != 200:
+                raise TranslationError(f"Translator returned {r.status_code}")
+            metrics.incr("translation.requests")
+            results.extend(item["translations"][0]["text"] for item in r.json())
+        return results
+
+
+class LocalBackend(TranslationBackend):
+    def translate_batch(self, texts, source_language, dest_language):
+        return [f"[{dest_language}] {text}" for text in texts]
+
+
+class Translator:
+    def __init__(self, backend, redis, cache_size, cache_timeout):
+        self.backend = backend
+        self.redis = redis
+        self.cache_size = cache_size
+        self.cache_timeout = cache_timeout
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(text, source_language, dest_language):
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        return f"translation:{source_language}:{dest_language}:{digest}"
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.cache_size:
+                self._lru.popitem(last=False)
+
+    def translate_many(self, texts, source_language, dest_language):
+        """Translate ``texts`` in order, calling the backend once for all misses."""
+        keys = [self.cache_key(t, source_language, dest_language) for t in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+        metrics.incr("translation.cache.lru_hits", len(found))
+
+        missing = list(dict.fromkeys(k for k in keys if k not in found))
+        if missing:
+            try:
+                cached = self.redis.mget(missing)
+            except RedisError:
+                cached = [None] * len(missing)
+            for key, value in zip(missing, cached):
+                if value is not None:
+                    found[key] = value.decode()
+                    self._remember(key, found[key])
+            metrics.incr("translation.cache.redis_hits", sum(v is not None for v in cached))
+
+        todo = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                todo.setdefault(key, text)
+        if todo:
+            metrics.incr("translation.cache.misses", len(todo))
+            translated = self.backend.translate_batch(
+                list(todo.values()), source_language, dest_language
+            )
+            fresh = dict(zip(todo, translated))
+            try:
+                pipe = self.redis.pipeline()
+                for key, value in fresh.items():
+                    pipe.set(key, value, ex=self.cache_timeout)
+                pipe.execute()
+            except RedisError:
+                pass
+            for key, value in fresh.items():
+                self._remember(key, value)
+            found.update(fresh)
+        return [found[key] for key in keys]
+
+
+def create_translator(app):
+    config = app.config
+    name = config["TRANSLATOR_BACKEND"]
+    if name == "microsoft":
+        backend = MicrosoftBackend(
+            config["MS_TRANSLATOR_KEY"],
+            config["MS_TRANSLATOR_REGION"],
+            config["TRANSLATOR_BATCH_SIZE"],
+        )
+    elif name == "local":
+        backend = LocalBackend()
+    else:
+        return None
+    return Translator(
+        backend,
+        app.redis,
+        config["TRANSLATION_CACHE_SIZE"],
+        config["TRANSLATION_CACHE_TIMEOUT"],
+    )
+
+
+def translate_many(texts, source_language, dest_language):
+    if not current_app.translator:
+        raise TranslationError("The translation service is not configured.")
+    return current_app.translator.translate_many(
+        texts, source_language, dest_language
+    )
 
 
 def translate(text, source_language, dest_language):
-    if (
-        "MS_TRANSLATOR_KEY" not in current_app.config
-        or not current_app.config["MS_TRANSLATOR_KEY"]
-    ):
+    if not current_app.translator:
         return _("Error: the translation service is not configured.")
-    auth = {
-        "Ocp-Apim-Subscription-Key": current_app.config["MS_TRANSLATOR_KEY"],
-        "Ocp-Apim-Subscription-Region": "westus",
-    }
-    r = httpx.post(
-        "https://api.cognitive.microsofttranslator.com"
-        "/translate?api-version=3.0&from={}&to={}".format(
-            source_language, dest_language
-        ),
-        headers=auth,
-        json=[{"Text": text}],
-    )
-    if r.status_code != 200:
+    try:
+        return translate_many([text], source_language, dest_language)[0]
+    except TranslationError:
         return _("Error: the translation service failed.")
-    return r.json()[0]["translations"][0]["text"]
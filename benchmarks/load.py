@@ -0,0 +1,152 @@
+"""Load-test the app under gunicorn to choose worker settings.
+
+Keeps ``--concurrency`` requests in flight against ``--path`` (repeatable)
+for ``--duration`` seconds and reports throughput, latency percentiles and
+errors. Point it at a running server with ``--url``, or let it boot
+gunicorn with ``gunicorn.conf.py`` once per ``--spawn`` spec and compare
+them. A spec is ``CLASS:WORKERS[xTHREADS]``, e.g. ``sync:5``,
+``gthread:3x8`` or ``gevent:2``.
+
+    python benchmarks/load.py --spawn sync:5 --spawn gthread:3x8 \\
+        --path / --path /blog/news --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_spec(spec):
+    worker_class, _, size = spec.partition(":")
+    workers, _, threads = size.partition("x")
+    return worker_class, workers, threads
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn(spec, port):
+    worker_class, workers, threads = parse_spec(spec)
+    env = dict(os.environ, GUNICORN_WORKER_CLASS=worker_class)
+    env["GUNICORN_BIND"] = f"127.0.0.1:{port}"
+    env["GUNICORN_ACCESS_LOG"] = "/dev/null"
+    if workers:
+        env["GUNICORN_WORKERS"] = workers
+    if threads:
+        env["GUNICORN_THREADS"] = threads
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "flaskcms:app"],
+        cwd=ROOT,
+        env=env,
+    )
+
+
+def wait_until_ready(url, server, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {server.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+async def run_load(url, paths, concurrency, duration):
+    samples, errors = [], 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+
+        async def user(offset):
+            nonlocal errors
+            i = offset
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(paths[i % len(paths)])
+                    if response.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                samples.append((time.perf_counter() - started) * 1000)
+                i += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(user(i) for i in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    samples.sort()
+    return {
+        "requests": len(samples),
+        "rps": len(samples) / elapsed,
+        "p50": statistics.median(samples) if samples else 0.0,
+        "p95": samples[int(len(samples) * 0.95) - 1] if samples else 0.0,
+        "p99": samples[int(len(samples) * 0.99) - 1] if samples else 0.0,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Base URL of an already running server.")
+    parser.add_argument("--spawn", action="append", default=[], metavar="SPEC")
+    parser.add_argument("--path", action="append", default=[])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--warmup", type=float, default=2)
+    args = parser.parse_args()
+    paths = args.path or ["/"]
+    if not args.url and not args.spawn:
+        parser.error("give --url or at least one --spawn spec")
+
+    results = {}
+    if args.url:
+        asyncio.run(run_load(args.url, paths, args.concurrency, args.warmup))
+        results[args.url] = asyncio.run(
+            run_load(args.url, paths, args.concurrency, args.duration)
+        )
+    for spec in args.spawn:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = spawn(spec, port)
+        try:
+            wait_until_ready(url, server)
+            asyncio.run(run_load(url, paths, args.concurrency, args.warmup))
+            results[spec] = asyncio.run(
+                run_load(url, paths, args.concurrency, args.duration)
+            )
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+
+    print(
+        f"{'server':<28}{'requests':>10}{'req/s':>10}"
+        f"{'p50':>12}{'p95':>12}{'p99':>12}{'errors':>8}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<28}{result['requests']:>10}{result['rps']:>10.1f}"
+            f"{result['p50']:>10.1f}ms{result['p95']:>10.1f}ms"
+            f"{result['p99']:>10.1f}ms{result['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
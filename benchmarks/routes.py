@@ -0,0 +1,162 @@
+"""Measure public route latency against a large seeded database.
+
+Seeds ``--posts`` posts (1M by default) spread over ``--blogs`` blogs into
+the database named by ``SQLALCHEMY_DATABASE_URI``, then times the hot read
+routes twice: once with the lookup indexes dropped and once with them
+recreated from the model metadata. Page and feed caches are disabled so
+every request reaches the database.
+
+    SQLALCHEMY_DATABASE_URI=sqlite:///bench.db python benchmarks/routes.py
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import Blog, Comment, Post, User, Webmention  # noqa: E402
+from config import Config  # noqa: E402
+
+INDEXES = [
+    "ix_blog_slug",
+    "ix_comment_post_id",
+    "ix_comment_user_id_created_at",
+    "ix_post_blog_id_created_at_id",
+    "ix_post_user_id_created_at_id",
+    "ix_post_published_blog_id_created_at_id",
+    "ix_webmention_blog_id",
+]
+
+
+class BenchmarkConfig(Config):
+    RQ_CONNECTION_CLASS = os.getenv("RQ_CONNECTION_CLASS", "fakeredis.FakeStrictRedis")
+    CACHE_TYPE = "NullCache"
+    PAGE_CACHE_ENABLED = False
+    SEARCH_BACKEND = "none"
+    DEBUG = False
+    DATABASE_CREATE_ALL = "true"
+
+
+def seed(posts, blogs, chunk_size=10_000):
+    if db.session.scalar(sa.select(sa.func.count(Post.id))):
+        return
+    print(f"seeding {posts} posts over {blogs} blogs...", file=sys.stderr)
+    users = [
+        {"id": i, "username": f"user{i}", "email": f"user{i}@example.com",
+         "password": "!", "active": True, "fs_uniquifier": f"bench-{i}"}
+        for i in range(1, blogs + 1)
+    ]
+    db.session.execute(sa.insert(User), users)
+    db.session.execute(
+        sa.insert(Blog),
+        [{"id": i, "title": f"Blog {i}", "slug": f"blog{i}",
+          "description": f"Blog number {i}", "user_id": i}
+         for i in range(1, blogs + 1)],
+    )
+    start = datetime(2020, 1, 1)
+    for offset in range(0, posts, chunk_size):
+        rows = []
+        for i in range(offset, min(offset + chunk_size, posts)):
+            owner = i % blogs + 1
+            created_at = start + timedelta(minutes=i)
+            rows.append({
+                "title": f"Post {i}", "content": "<p>Lorem ipsum</p>" * 20,
+                "content_html": "<p>Lorem ipsum</p>" * 20,
+                "excerpt": ("Lorem ipsum " * 20).strip(),
+                "blog_id": owner, "user_id": owner, "published": i % 4 != 0,
+                "created_at": created_at, "updated_at": created_at,
+            })
+        db.session.execute(sa.insert(Post), rows)
+        db.session.execute(
+            sa.insert(Comment),
+            [{"content": "Nice", "post_id": offset + j + 1,
+              "user_id": (offset + j) % blogs + 1, "created_at": start}
+             for j in range(0, len(rows), 10)],
+        )
+        db.session.execute(
+            sa.insert(Webmention),
+            [{"source": f"https://example.com/{offset + j}", "target": "/",
+              "blog_id": (offset + j) % blogs + 1, "type": "mention"}
+             for j in range(0, len(rows), 100)],
+        )
+        db.session.commit()
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("ANALYZE")
+
+
+def set_indexes(enabled):
+    tables = [Blog.__table__, Comment.__table__, Post.__table__, Webmention.__table__]
+    with db.engine.begin() as connection:
+        for table in tables:
+            for index in table.indexes:
+                if index.name not in INDEXES:
+                    continue
+                if enabled:
+                    index.create(connection, checkfirst=True)
+                else:
+                    index.drop(connection, checkfirst=True)
+
+
+def time_routes(client, urls, requests):
+    results = {}
+    for name, url in urls.items():
+        client.get(url)
+        samples = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = client.get(url)
+            samples.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, (url, response.status_code)
+        samples.sort()
+        results[name] = (
+            statistics.median(samples),
+            samples[int(len(samples) * 0.95) - 1],
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    parser.add_argument("--blogs", type=int, default=1_000)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app(BenchmarkConfig)
+    with app.app_context():
+        seed(args.posts, args.blogs)
+        blog = db.session.scalar(sa.select(Blog).order_by(Blog.id.desc()))
+        post_id = db.session.scalar(
+            sa.select(sa.func.max(Post.id)).where(Post.blog_id == blog.id)
+        )
+        urls = {
+            "view_blog": f"/blog/{blog.slug}",
+            "view_post": f"/post/{blog.slug}/{post_id}",
+            "view_user": f"/user/{blog.author.username}",
+            "blog_rss": f"/blog/{blog.id}/rss.xml",
+            "api.outbox": f"/actors/{blog.author.username}/outbox",
+        }
+        client = app.test_client()
+
+        set_indexes(False)
+        before = time_routes(client, urls, args.requests)
+        set_indexes(True)
+        after = time_routes(client, urls, args.requests)
+
+    print(f"{'route':<24}{'before p50':>12}{'p95':>10}{'after p50':>12}{'p95':>10}")
+    for name in urls:
+        print(
+            f"{name:<24}{before[name][0]:>10.2f}ms{before[name][1]:>8.2f}ms"
+            f"{after[name][0]:>10.2f}ms{after[name][1]:>8.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
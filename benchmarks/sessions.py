@@ -0,0 +1,93 @@
+"""Compare per-request session overhead of the filesystem and Redis backends.
+
+Each backend serves ``--requests`` requests that only read the session and
+the same number that modify it, through the Flask test client with a
+session cookie set. The Redis backend talks to ``RQ_REDIS_URL``; set
+``RQ_CONNECTION_CLASS=fakeredis.FakeStrictRedis`` to run without a server
+(which then measures serialization only, not the network round trip).
+
+    RQ_REDIS_URL=redis://localhost:6379/0 python benchmarks/sessions.py
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from flask import session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+
+
+class BenchmarkConfig(Config):
+    RQ_CONNECTION_CLASS = os.getenv("RQ_CONNECTION_CLASS", "redis.Redis")
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    CACHE_TYPE = "NullCache"
+    SEARCH_BACKEND = "none"
+    DEBUG = False
+    DATABASE_CREATE_ALL = "true"
+
+
+def make_app(backend, session_dir):
+    config = type(
+        "SessionBenchmarkConfig",
+        (BenchmarkConfig,),
+        {"SESSION_TYPE": backend, "SESSION_FILE_DIR": session_dir},
+    )
+    app = create_app(config)
+
+    @app.route("/_bench/read")
+    def read():
+        return str(session.get("counter", 0))
+
+    @app.route("/_bench/write")
+    def write():
+        session["counter"] = session.get("counter", 0) + 1
+        return "ok"
+
+    return app
+
+
+def time_requests(client, url, requests):
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get(url)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, (url, response.status_code)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as session_dir:
+        for backend in ("filesystem", "redis"):
+            app = make_app(backend, session_dir)
+            client = app.test_client()
+            client.get("/_bench/write")
+            results[backend] = {
+                "read": time_requests(client, "/_bench/read", args.requests),
+                "write": time_requests(client, "/_bench/write", args.requests),
+            }
+
+    print(f"{'backend':<12}{'read p50':>12}{'p95':>10}{'write p50':>12}{'p95':>10}")
+    for backend, timings in results.items():
+        read, write = timings["read"], timings["write"]
+        print(
+            f"{backend:<12}{read[0]:>10.3f}ms{read[1]:>8.3f}ms"
+            f"{write[0]:>10.3f}ms{write[1]:>8.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
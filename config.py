@@ -11,23 +11,168 @@ class Config:
     Set Flask configuration variables using environment variables with sensible defaults.
     """
 
-    SESSION_TYPE = os.getenv("SESSION_TYPE", "filesystem")
+    # Server-side sessions live in Redis (sharing app.redis) as msgpack with a
+    # TTL, and are only written when modified. "filesystem" is still supported.
+    SESSION_TYPE = os.getenv("SESSION_TYPE", "redis")
     SESSION_FILE_DIR = os.getenv("SESSION_FILE_DIR", "cache")
+    SESSION_KEY_PREFIX = os.getenv("SESSION_KEY_PREFIX", "session:")
+    SESSION_SERIALIZATION_FORMAT = "msgpack"
+    SESSION_REFRESH_EACH_REQUEST: bool = os.getenv("SESSION_REFRESH_EACH_REQUEST", "false").lower() == "true"
+    PERMANENT_SESSION_LIFETIME: int = int(os.getenv("PERMANENT_SESSION_LIFETIME", 14 * 24 * 3600))
     LANGUAGES: list[str] = os.getenv("LANGUAGES", "en").split(",")
     RQ_REDIS_URL = os.getenv("RQ_REDIS_URL", "redis://localhost:6379/0")
+    # One connection pool is shared by RQ, the cache, sessions and app code
+    REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5))
+    REDIS_CONNECT_TIMEOUT: float = float(os.getenv("REDIS_CONNECT_TIMEOUT", 2))
+    REDIS_HEALTH_CHECK_INTERVAL: int = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
     
     ELASTICSEARCH_ENABLED: bool = os.getenv("ELASTICSEARCH_ENABLED", "false").lower() == "true"
     ELASTICSEARCH_URL: Optional[str] = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
     ELASTICSEARCH_API_KEY: Optional[str] = os.getenv("ELASTICSEARCH_API_KEY")
+    ELASTICSEARCH_BULK_CHUNK_SIZE: int = int(os.getenv("ELASTICSEARCH_BULK_CHUNK_SIZE", 500))
+    ELASTICSEARCH_BULK_THREADS: int = int(os.getenv("ELASTICSEARCH_BULK_THREADS", 4))
+    # "elasticsearch", "database" (SQLite FTS5 / PostgreSQL tsvector) or "none"
+    SEARCH_BACKEND: str = os.getenv(
+        "SEARCH_BACKEND", "elasticsearch" if ELASTICSEARCH_ENABLED else "database"
+    )
+    SEARCH_LANGUAGE: str = os.getenv("SEARCH_LANGUAGE", "english")
+    # Queue index changes in Redis and apply them from a worker instead of inline
+    SEARCH_SYNC_ASYNC: bool = os.getenv("SEARCH_SYNC_ASYNC", "true").lower() == "true"
+    SEARCH_SYNC_BATCH_SIZE: int = int(os.getenv("SEARCH_SYNC_BATCH_SIZE", 500))
+    SEARCH_SYNC_RETRIES: int = int(os.getenv("SEARCH_SYNC_RETRIES", 3))
+    SEARCH_SYNC_RETRY_INTERVAL: int = int(os.getenv("SEARCH_SYNC_RETRY_INTERVAL", 30))
+
+    CACHE_TYPE: str = os.getenv("CACHE_TYPE", "RedisCache")
+    CACHE_KEY_PREFIX: str = os.getenv("CACHE_KEY_PREFIX", "flaskcms:")
+    PAGE_CACHE_ENABLED: bool = os.getenv("PAGE_CACHE_ENABLED", "true").lower() == "true"
+    PAGE_CACHE_TIMEOUT: int = int(os.getenv("PAGE_CACHE_TIMEOUT", 300))
+
+    # Newest published posts included in RSS/Atom/JSON feeds
+    FEED_ITEMS: int = int(os.getenv("FEED_ITEMS", 20))
+    FEED_CACHE_TIMEOUT: int = int(os.getenv("FEED_CACHE_TIMEOUT", 3600))
+    FEED_MAX_AGE: int = int(os.getenv("FEED_MAX_AGE", 300))
+
+    # Last-seen timestamps are buffered in Redis and flushed by a scheduled job
+    ACTIVITY_RESOLUTION: int = int(os.getenv("ACTIVITY_RESOLUTION", 60))
+    ACTIVITY_FLUSH_INTERVAL: int = int(os.getenv("ACTIVITY_FLUSH_INTERVAL", 60))
+    ACTIVITY_FLUSH_BATCH_SIZE: int = int(os.getenv("ACTIVITY_FLUSH_BATCH_SIZE", 500))
+
+    # Shared outbound HTTP client (app/http.py)
+    HTTP_TIMEOUT: float = float(os.getenv("HTTP_TIMEOUT", 10))
+    HTTP_CONNECT_TIMEOUT: float = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+    HTTP_POOL_TIMEOUT: float = float(os.getenv("HTTP_POOL_TIMEOUT", 5))
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+    HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", 4))
+    HTTP_MAX_RESPONSE_BYTES: int = int(os.getenv("HTTP_MAX_RESPONSE_BYTES", 2 * 1024 * 1024))
+    HTTP_HTTP2: bool = os.getenv("HTTP_HTTP2", "true").lower() == "true"
+    HTTP_USER_AGENT: str = os.getenv("HTTP_USER_AGENT", "flask-cms (+https://github.com/avycado13/flask-cms)")
+
+    # Webmentions are verified in batches by concurrent streaming fetches
+    WEBMENTION_BATCH_SIZE: int = int(os.getenv("WEBMENTION_BATCH_SIZE", 200))
+    WEBMENTION_CONCURRENCY: int = int(os.getenv("WEBMENTION_CONCURRENCY", 20))
+    WEBMENTION_MAX_BYTES: int = int(os.getenv("WEBMENTION_MAX_BYTES", 1024 * 1024))
+    # Ingestion limits: token buckets per source host and per target blog,
+    # a window in which repeated (source, target) pings are ignored, and
+    # queue depths above which the endpoint answers 429
+    WEBMENTION_SOURCE_BURST: int = int(os.getenv("WEBMENTION_SOURCE_BURST", 10))
+    WEBMENTION_SOURCE_PER_MINUTE: int = int(os.getenv("WEBMENTION_SOURCE_PER_MINUTE", 10))
+    WEBMENTION_TARGET_BURST: int = int(os.getenv("WEBMENTION_TARGET_BURST", 60))
+    WEBMENTION_TARGET_PER_MINUTE: int = int(os.getenv("WEBMENTION_TARGET_PER_MINUTE", 60))
+    WEBMENTION_DEDUP_WINDOW: int = int(os.getenv("WEBMENTION_DEDUP_WINDOW", 3600))
+    WEBMENTION_MAX_QUEUE_DEPTH: int = int(os.getenv("WEBMENTION_MAX_QUEUE_DEPTH", 1000))
+    WEBMENTION_MAX_PENDING: int = int(os.getenv("WEBMENTION_MAX_PENDING", 5000))
+    WEBMENTION_RETRY_AFTER: int = int(os.getenv("WEBMENTION_RETRY_AFTER", 60))
+    # a failed verification run, or a source that could not be fetched, is
+    # retried this many times, this many seconds apart
+    WEBMENTION_RETRIES: int = int(os.getenv("WEBMENTION_RETRIES", 3))
+    WEBMENTION_RETRY_INTERVAL: int = int(os.getenv("WEBMENTION_RETRY_INTERVAL", 30))
+
+    # Machine translation: "microsoft", "local" (offline stub) or "none"
+    MS_TRANSLATOR_KEY: Optional[str] = os.getenv("MS_TRANSLATOR_KEY")
+    MS_TRANSLATOR_REGION: str = os.getenv("MS_TRANSLATOR_REGION", "westus")
+    TRANSLATOR_BACKEND: str = os.getenv(
+        "TRANSLATOR_BACKEND", "microsoft" if MS_TRANSLATOR_KEY else "none"
+    )
+    TRANSLATOR_BATCH_SIZE: int = int(os.getenv("TRANSLATOR_BATCH_SIZE", 100))
+    TRANSLATION_CACHE_SIZE: int = int(os.getenv("TRANSLATION_CACHE_SIZE", 1024))
+    TRANSLATION_CACHE_TIMEOUT: int = int(os.getenv("TRANSLATION_CACHE_TIMEOUT", 30 * 24 * 3600))
+
+    # Post language detection runs in the background in batches
+    LANGUAGE_DETECT_BATCH_SIZE: int = int(os.getenv("LANGUAGE_DETECT_BATCH_SIZE", 200))
+    LANGUAGE_DETECT_MAX_CHARS: int = int(os.getenv("LANGUAGE_DETECT_MAX_CHARS", 5000))
+
+    # Bulk markdown imports are spooled to disk and run as a background task
+    IMPORT_SPOOL_DIR: str = os.getenv("IMPORT_SPOOL_DIR", os.path.join(basedir, "imports"))
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", 200))
+    IMPORT_MAX_FILE_BYTES: int = int(os.getenv("IMPORT_MAX_FILE_BYTES", 5 * 1024 * 1024))
+    # Dropzone sends every file of a drop in one request, so they make one import
+    IMPORT_MAX_UPLOAD_FILES: int = int(os.getenv("IMPORT_MAX_UPLOAD_FILES", 100))
+    DROPZONE_UPLOAD_MULTIPLE: bool = True
+    DROPZONE_PARALLEL_UPLOADS: int = IMPORT_MAX_UPLOAD_FILES
+    DROPZONE_MAX_FILES: int = IMPORT_MAX_UPLOAD_FILES
+
+    # Post exports are written here and downloaded from the account page
+    EXPORT_DIR: str = os.getenv("EXPORT_DIR", os.path.join(basedir, "exports"))
+    EXPORT_YIELD_PER: int = int(os.getenv("EXPORT_YIELD_PER", 500))
+    # seconds before an export, or a partial file from a crashed job, is deleted
+    EXPORT_TTL: int = int(os.getenv("EXPORT_TTL", 7 * 24 * 3600))
+
+    # Outgoing mail
+    MAIL_DEFAULT_SENDER: str = os.getenv("MAIL_DEFAULT_SENDER", "noreply@localhost")
+    EMAIL_WORKERS: int = int(os.getenv("EMAIL_WORKERS", 2))
+    EMAIL_BACKLOG: int = int(os.getenv("EMAIL_BACKLOG", 1000))
+    EMAIL_IDLE_TIMEOUT: float = float(os.getenv("EMAIL_IDLE_TIMEOUT", 30))
+    EMAIL_SUBMIT_TIMEOUT: float = float(os.getenv("EMAIL_SUBMIT_TIMEOUT", 1))
+
+    # Newsletters are sent per recipient over one SMTP connection per chunk
+    NEWSLETTER_BASE_URL: str = os.getenv("NEWSLETTER_BASE_URL", "http://localhost:5000")
+    NEWSLETTER_CHUNK_SIZE: int = int(os.getenv("NEWSLETTER_CHUNK_SIZE", 500))
+    NEWSLETTER_MAX_POSTS: int = int(os.getenv("NEWSLETTER_MAX_POSTS", 20))
+    NEWSLETTER_RETRIES: int = int(os.getenv("NEWSLETTER_RETRIES", 3))
+    NEWSLETTER_RETRY_INTERVAL: int = int(os.getenv("NEWSLETTER_RETRY_INTERVAL", 60))
+    NEWSLETTER_TTL: int = int(os.getenv("NEWSLETTER_TTL", 7 * 24 * 3600))
+
+    # Background task progress is throttled and published to Redis only
+    TASK_PROGRESS_INTERVAL: float = float(os.getenv("TASK_PROGRESS_INTERVAL", 1.0))
+    TASK_PROGRESS_MIN_DELTA: int = int(os.getenv("TASK_PROGRESS_MIN_DELTA", 1))
+    TASK_PROGRESS_TTL: int = int(os.getenv("TASK_PROGRESS_TTL", 24 * 3600))
+    # seconds between the task banner's short polls
+    TASK_PROGRESS_POLL_INTERVAL: float = float(os.getenv("TASK_PROGRESS_POLL_INTERVAL", 2.0))
 
     POSTS_PER_PAGE: int = int(os.getenv("POSTS_PER_PAGE", 10))
+    COUNT_CACHE_TIMEOUT: int = int(os.getenv("COUNT_CACHE_TIMEOUT", 60))
     SECRET_KEY = os.getenv("SECRET_KEY", secrets.token_urlsafe())
     SECURITY_PASSWORD_SALT = os.getenv(
         "SECURITY_PASSWORD_SALT", "213691981621818227987771034862335535908"
     )
     SQLALCHEMY_DATABASE_URI: str = os.getenv("SQLALCHEMY_DATABASE_URI", "sqlite:///test.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = os.getenv("SQLALCHEMY_TRACK_MODIFICATIONS", "false").lower() == "true"
+    # "auto": an empty database (no alembic_version table) gets every table
+    # and is stamped at the latest migration; migrated databases are left to
+    # "flask db upgrade". "true" always runs create_all, "false" never does
+    DATABASE_CREATE_ALL: str = os.getenv("DATABASE_CREATE_ALL", "auto").lower()
+    # Connection pool per process (and per replica); with gevent workers size
+    # it for the concurrent greenlets. Statement timeout is in ms, 0 disables
+    DATABASE_POOL_SIZE: int = int(os.getenv("DATABASE_POOL_SIZE", 10))
+    DATABASE_MAX_OVERFLOW: int = int(os.getenv("DATABASE_MAX_OVERFLOW", 20))
+    DATABASE_POOL_TIMEOUT: float = float(os.getenv("DATABASE_POOL_TIMEOUT", 30))
+    DATABASE_POOL_RECYCLE: int = int(os.getenv("DATABASE_POOL_RECYCLE", 1800))
+    DATABASE_POOL_PRE_PING: bool = os.getenv("DATABASE_POOL_PRE_PING", "true").lower() == "true"
+    DATABASE_STATEMENT_TIMEOUT: int = int(os.getenv("DATABASE_STATEMENT_TIMEOUT", 0))
+    # Comma separated read replicas for public pages and API GETs; after a
+    # write the client reads from the primary for DATABASE_REPLICA_PIN_SECONDS
+    DATABASE_REPLICA_URLS: list[str] = [
+        url for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url
+    ]
+    DATABASE_REPLICA_PIN_SECONDS: int = int(os.getenv("DATABASE_REPLICA_PIN_SECONDS", 10))
     DEBUG: bool = os.getenv("DEBUG", "true").lower() == "true"
+    # Comma separated addresses or networks allowed to scrape /metrics
+    METRICS_ALLOWED_NETWORKS: list[str] = [
+        net for net in os.getenv("METRICS_ALLOWED_NETWORKS", "127.0.0.1,::1").split(",") if net
+    ]
 
     # Flask Security
     SECURITY_WEBAUTHN: bool = os.getenv("SECURITY_WEBAUTHN", "true").lower() == "true"
@@ -52,6 +197,10 @@ class Config:
 
 class TestingConfig(Config):
     RQ_CONNECTION_CLASS = "fakeredis.FakeStrictRedis"
+    TRANSLATOR_BACKEND = "local"
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
-    WTF_CSRF_ENABLED = False
\ No newline at end of file
+    DATABASE_CREATE_ALL = "true"
+    WTF_CSRF_ENABLED = False
+    EMAIL_WORKERS = 0
+    SESSION_TYPE = "redis"
@@ -0,0 +1,81 @@
+"""Gunicorn settings for production.
+
+Every setting can be overridden from the environment (``GUNICORN_*``) or
+on the command line. Pick values with ``benchmarks/load.py``.
+
+Worker classes:
+
+* ``gthread`` (default): each worker process serves ``threads`` requests
+  at once, so a slow webmention check or translation call only holds
+  one thread.
+* ``gevent``: each worker serves up to ``worker_connections`` requests
+  as greenlets. Needs ``pip install gevent``. The standard library is
+  monkey-patched before the app is imported, which makes redis, httpx
+  and SMTP cooperative, and psycopg2 is given a gevent wait callback.
+* ``sync``: one request per process, sized ``2 * CPUs + 1``.
+
+The app is imported once in the master (``preload_app``) and shared
+copy-on-write by the workers. The master opens no connections, and the
+database, Redis, HTTP and Elasticsearch pools are reset in each forked
+worker by ``app.services`` (see app/services.py).
+"""
+
+import os
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+cpus = getattr(os, "process_cpu_count", os.cpu_count)() or 1
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+if worker_class == "gevent":
+    from gevent import monkey
+
+    monkey.patch_all()
+
+    def _make_psycopg_green():
+        try:
+            import psycopg2
+            from psycopg2 import extensions
+        except ImportError:
+            return
+        from gevent.socket import wait_read, wait_write
+
+        def wait(connection, timeout=None):
+            while True:
+                state = connection.poll()
+                if state == extensions.POLL_OK:
+                    break
+                elif state == extensions.POLL_READ:
+                    wait_read(connection.fileno(), timeout=timeout)
+                elif state == extensions.POLL_WRITE:
+                    wait_write(connection.fileno(), timeout=timeout)
+                else:
+                    raise psycopg2.OperationalError(f"Bad result from poll: {state!r}")
+
+        extensions.set_wait_callback(wait)
+
+    _make_psycopg_green()
+    workers = _env_int("GUNICORN_WORKERS", cpus)
+elif worker_class == "gthread":
+    workers = _env_int("GUNICORN_WORKERS", cpus + 1)
+else:
+    workers = _env_int("GUNICORN_WORKERS", cpus * 2 + 1)
+
+threads = _env_int("GUNICORN_THREADS", 8 if worker_class == "gthread" else 1)
+worker_connections = _env_int("GUNICORN_WORKER_CONNECTIONS", 500)
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', 5000)}")
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+timeout = _env_int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = _env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+keepalive = _env_int("GUNICORN_KEEPALIVE", 5)
+# recycle workers now and then so slow leaks cannot build up
+max_requests = _env_int("GUNICORN_MAX_REQUESTS", 10000)
+max_requests_jitter = _env_int("GUNICORN_MAX_REQUESTS_JITTER", 1000)
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = os.getenv("GUNICORN_ERROR_LOG", "-")
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
@@ -0,0 +1,90 @@
+"""add hot lookup indexes
+
+Revision ID: 3c7e1a9f4b25
+Revises: 9b2f6c1d7e3a
+Create Date: 2026-10-18 11:03:27.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c7e1a9f4b25'
+down_revision = '9b2f6c1d7e3a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Blank slugs would collide under the unique index; they never resolved
+    # to a blog anyway.
+    op.execute("UPDATE blog SET slug = NULL WHERE slug = ''")
+    dedupe_slugs()
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_blog_slug'), ['slug'], unique=True)
+
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_comment_post_id'), ['post_id'], unique=False)
+        batch_op.create_index('ix_comment_user_id_created_at', ['user_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_post_published_blog_id_created_at_id',
+            ['blog_id', 'created_at', 'id'],
+            unique=False,
+            postgresql_where=sa.text('published IS true'),
+            sqlite_where=sa.text('published IS 1'),
+        )
+
+    with op.batch_alter_table('webmention', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_webmention_blog_id'), ['blog_id'], unique=False)
+
+
+def dedupe_slugs():
+    """Keep each slug on its oldest blog; later duplicates get ``<slug>-<id>``.
+
+    A suffixed slug that is somehow taken as well is cleared instead.
+    """
+    blog = sa.table('blog', sa.column('id', sa.Integer), sa.column('slug', sa.String))
+    connection = op.get_bind()
+    duplicated = (
+        sa.select(blog.c.slug)
+        .where(blog.c.slug.is_not(None))
+        .group_by(blog.c.slug)
+        .having(sa.func.count() > 1)
+    )
+    rows = connection.execute(
+        sa.select(blog.c.id, blog.c.slug)
+        .where(blog.c.slug.in_(duplicated))
+        .order_by(blog.c.slug, blog.c.id)
+    ).all()
+    if not rows:
+        return
+    taken = set(connection.scalars(sa.select(blog.c.slug).where(blog.c.slug.is_not(None))))
+    kept = set()
+    for row in rows:
+        if row.slug not in kept:
+            kept.add(row.slug)
+            continue
+        slug = f"{row.slug}-{row.id}"[:150]
+        if slug in taken:
+            slug = None
+        else:
+            taken.add(slug)
+        connection.execute(sa.update(blog).where(blog.c.id == row.id).values(slug=slug))
+
+
+def downgrade():
+    with op.batch_alter_table('webmention', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_webmention_blog_id'))
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_published_blog_id_created_at_id')
+
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.drop_index('ix_comment_user_id_created_at')
+        batch_op.drop_index(batch_op.f('ix_comment_post_id'))
+
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_blog_slug'))
@@ -0,0 +1,28 @@
+"""add post listing indexes
+
+Revision ID: 9b2f6c1d7e3a
+Revises: 4ed094da83b7
+Create Date: 2026-10-18 10:12:44.318102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b2f6c1d7e3a'
+down_revision = '4ed094da83b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.create_index('ix_post_blog_id_created_at_id', ['blog_id', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_post_user_id_created_at_id', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_user_id_created_at_id')
+        batch_op.drop_index('ix_post_blog_id_created_at_id')
@@ -7,4 +7,4 @@ while true; do
     echo Upgrade command failed, retrying in 5 secs...
     sleep 5
 done
-exec gunicorn -b :5000 --access-logfile - --error-logfile - flaskcms:app
\ No newline at end of file
+exec gunicorn -c gunicorn.conf.py flaskcms:app
\ No newline at end of file
@@ -20,6 +20,7 @@ def app():
     )
 
     # other setup can go here
+    app.redis.flushall()
     app.test_request_context().push()
     yield app
 
@@ -33,3 +34,19 @@ def client(app: Flask):
 @pytest.fixture()
 def runner(app: Flask):
     return app.test_cli_runner()
+
+
+@pytest.fixture()
+def user(app: Flask):
+    from app.extensions import db
+    from app.models import User
+
+    user = User(
+        username="testuser",
+        email="test@example.com",
+        password="password",
+        active=True,
+    )
+    db.session.add(user)
+    db.session.commit()
+    return user
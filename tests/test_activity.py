@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+
+from app import activity, db
+from app.models import User
+
+
+def test_touch_coalesces_and_flush_writes_batches(app, user):
+    activity._recent.clear()
+    other = User(username="other", email="other@example.com", password="x", active=True)
+    db.session.add(other)
+    db.session.commit()
+
+    activity.touch(user.id, now=1_000)
+    activity.touch(user.id, now=1_030)  # within the resolution window
+    activity.touch(other.id, now=1_010)
+    activity.touch(other.id, now=2_000)
+    activity.touch(12345, now=2_000)  # deleted user
+    assert app.redis.hlen(activity.ACTIVITY_KEY) == 3
+
+    assert activity.flush_activity(batch_size=2) == 3
+    db.session.expire_all()
+    assert user.last_seen == datetime.fromtimestamp(1_000, timezone.utc).replace(tzinfo=None)
+    assert other.last_seen == datetime.fromtimestamp(2_000, timezone.utc).replace(tzinfo=None)
+    assert not app.redis.exists(activity.ACTIVITY_KEY, activity.ACTIVITY_PROCESSING_KEY)
+    assert activity.flush_activity() == 0
+
+
+def test_flush_reschedules_itself_with_rqs_scheduler(app, user, runner):
+    from app import tasks
+
+    activity._recent.clear()
+    registry = app.task_queue.scheduled_job_registry
+    activity.touch(user.id, now=1_000)
+    activity.touch(12345, now=1_000)
+    assert len(registry) == 1
+    result = runner.invoke(args=["activity", "schedule"])
+    assert "already scheduled" in result.output
+    [job_id] = registry.get_job_ids()
+    assert app.task_queue.fetch_job(job_id).func_name == "app.tasks.flush_activity"
+
+    registry.remove(job_id)
+    tasks.flush_activity()
+    assert not app.redis.exists(activity.ACTIVITY_KEY)
+    # the next run is scheduled by the job itself
+    assert len(registry) == 1
@@ -0,0 +1,95 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import url_for
+from flask.testing import FlaskClient
+from app.extensions import db
+from app.models import Blog, Comment, Post
+from app import metrics
+
+
+def test_view_blog_is_cached_until_its_content_changes(client: FlaskClient, user):
+    blog = Blog(title="Cached Blog", slug="cached", author=user)
+    other = Blog(title="Other Blog", slug="other", author=user)
+    post = Post(title="First", content="Content", blog=blog, author=user)
+    other_post = Post(title="Elsewhere", content="Content", blog=other, author=user)
+    db.session.add_all([blog, other, post, other_post])
+    db.session.commit()
+    url = url_for("main.view_blog", blog_id=blog.id)
+
+    assert client.get(url).headers["X-Cache"] == "MISS"
+    response = client.get(url)
+    assert response.headers["X-Cache"] == "HIT"
+    assert b"First" in response.data
+
+    other_post.title = "Changed elsewhere"
+    db.session.commit()
+    assert client.get(url).headers["X-Cache"] == "HIT"
+
+    post.title = "Edited"
+    db.session.commit()
+    response = client.get(url)
+    assert response.headers["X-Cache"] == "MISS"
+    assert b"Edited" in response.data
+
+    assert metrics.counters() == {"page_cache.hits": 2, "page_cache.misses": 2}
+
+
+def test_comments_invalidate_their_blog_without_loading_it(client: FlaskClient, user):
+    blog = Blog(title="Commented Blog", slug="commented", author=user)
+    post = Post(title="First", content="Content", blog=blog, author=user)
+    db.session.add_all([blog, post])
+    db.session.commit()
+    url = url_for("main.view_blog", blog_id=blog.id)
+    post_id = post.id
+
+    assert client.get(url).headers["X-Cache"] == "MISS"
+    assert client.get(url).headers["X-Cache"] == "HIT"
+
+    db.session.expunge_all()
+    db.session.add(Comment(content="Nice", post_id=post_id, user_id=user.id))
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    db.event.listen(db.engine, "before_cursor_execute", record)
+    db.session.flush()
+    db.event.remove(db.engine, "before_cursor_execute", record)
+    assert all(statement.lstrip().startswith("INSERT") for statement in statements)
+    db.session.commit()
+    assert client.get(url).headers["X-Cache"] == "MISS"
+
+
+def test_feeds_support_conditional_get(client: FlaskClient, user):
+    blog = Blog(title="Feed Blog", slug="feed", author=user)
+    db.session.add_all(
+        [
+            blog,
+            Post(title="Live", content="x", blog=blog, author=user, published=True),
+            Post(title="Draft", content="x", blog=blog, author=user, published=False),
+        ]
+    )
+    db.session.commit()
+    url = url_for("main.blog_atom", blog_id=blog.id)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.mimetype == "application/atom+xml"
+    assert b"Live" in response.data and b"Draft" not in response.data
+    etag = response.headers["ETag"]
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    feed = client.get(url_for("main.blog_json_feed", blog_id=blog.id)).get_json()
+    assert [item["title"] for item in feed["items"]] == ["Live"]
+    assert metrics.counters()["feed_cache.hits"] == 2
+
+    blog.posts[0].title = "Renamed"
+    db.session.commit()
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert b"Renamed" in response.data
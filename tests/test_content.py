@@ -0,0 +1,52 @@
+import sqlalchemy as sa
+
+from app import db
+from app.content import backfill, make_excerpt, render
+from app.models import Blog, Post
+
+
+def test_render_sanitizes_html_and_builds_a_plain_excerpt():
+    html, excerpt = render(
+        '<h2>Hi &amp; welcome</h2><script>alert(1)</script>'
+        '<p onclick="x()">Read <a href="javascript:x()">this</a></p>'
+    )
+    assert "<script>" not in html and "onclick" not in html
+    assert "javascript:" not in html
+    assert html.startswith("<h2>Hi &amp; welcome</h2>")
+    assert excerpt == "Hi & welcome alert(1) Read this"
+
+
+def test_render_converts_markdown():
+    html, excerpt = render("# Title\n\nSome *text* with `code`.", "markdown")
+    assert "<em>text</em>" in html and "<code>code</code>" in html
+    assert "<h1>" not in html
+    assert excerpt == "Title Some text with code."
+
+
+def test_excerpt_cuts_at_a_word_boundary():
+    text = "word " * 100
+    excerpt = make_excerpt(text.strip(), 22)
+    assert excerpt == "word word word word…"
+    assert make_excerpt("short", 22) == "short"
+
+
+def test_posts_are_rendered_on_flush_and_backfilled(app, user):
+    blog = Blog(title="Test", author=user)
+    post = Post(title="Post", content="<p>Hello <b>there</b></p>", blog=blog, author=user)
+    db.session.add_all([blog, post])
+    db.session.commit()
+    assert post.content_html == "<p>Hello there</p>"
+    assert post.excerpt == "Hello there"
+
+    post.content = "Changed *again*"
+    post.content_format = "markdown"
+    db.session.commit()
+    assert post.content_html == "<p>Changed <em>again</em></p>"
+
+    db.session.execute(sa.update(Post).values(content_html=None, excerpt=None))
+    db.session.commit()
+    reports = []
+    assert backfill(batch_size=1, progress=lambda done, total: reports.append(done)) == 1
+    db.session.expire_all()
+    assert post.excerpt == "Changed again"
+    assert reports == [1]
@@ -0,0 +1,92 @@
+import sqlalchemy as sa
+from flask import Flask, g, request
+
+from app import create_app, database
+from app.extensions import db
+from app.models import Blog, User
+from config import TestingConfig
+
+
+def test_engine_options_follow_the_database(app: Flask):
+    config = app.config
+    assert app.config["SQLALCHEMY_ENGINE_OPTIONS"] == {"pool_pre_ping": True}
+
+    options = database.engine_options(config, "sqlite:////tmp/app.db")
+    assert options["pool_size"] == config["DATABASE_POOL_SIZE"]
+    assert options["pool_recycle"] == config["DATABASE_POOL_RECYCLE"]
+    assert "connect_args" not in options
+
+    config["DATABASE_STATEMENT_TIMEOUT"] = 5000
+    options = database.engine_options(config, "postgresql://db/app")
+    assert options["connect_args"] == {"options": "-c statement_timeout=5000"}
+
+
+def test_reads_go_to_a_replica_until_the_client_writes(tmp_path):
+    class ReplicaConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        DATABASE_REPLICA_URLS = [f"sqlite:///{tmp_path / 'replica.db'}"]
+
+    app = create_app(ReplicaConfig)
+    app.config["SECURITY_PASSWORD_HASH"] = "plaintext"
+
+    @app.route("/_db/blogs", methods=["GET", "POST"])
+    @database.replica_reads
+    def blogs():
+        if request.method == "POST":
+            user = db.session.scalar(sa.select(User))
+            db.session.add(Blog(title="Fresh", author=user))
+            db.session.commit()
+        return ",".join(db.session.scalars(sa.select(Blog.title).order_by(Blog.id)))
+
+    with app.app_context():
+        db.metadata.create_all(db.engines["replica_0"])
+        user = User(username="author", email="a@example.com", password="pw", active=True)
+        db.session.add(user)
+        db.session.commit()
+
+    client = app.test_client()
+    # the replica has not caught up with the primary yet
+    assert client.get("/_db/blogs").data == b""
+
+    response = client.post("/_db/blogs")
+    assert response.data == b"Fresh"
+    assert database.PIN_COOKIE in response.headers["Set-Cookie"]
+    assert client.get("/_db/blogs").data == b"Fresh"
+
+    client.delete_cookie(database.PIN_COOKIE)
+    assert client.get("/_db/blogs").data == b""
+
+
+def test_page_cache_misses_are_rendered_from_the_primary(tmp_path):
+    from app.page_cache import cached_page
+
+    class ReplicaConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        DATABASE_REPLICA_URLS = [f"sqlite:///{tmp_path / 'replica.db'}"]
+
+    app = create_app(ReplicaConfig)
+    app.config["SECURITY_PASSWORD_HASH"] = "plaintext"
+
+    @app.route("/_db/cached")
+    @database.replica_reads
+    @cached_page
+    def cached():
+        blog = db.session.scalar(sa.select(Blog))
+        if blog is None:
+            return "none"
+        g.page_cache_blog_id = blog.id
+        return blog.title
+
+    with app.app_context():
+        db.metadata.create_all(db.engines["replica_0"])
+        user = User(username="author", email="a@example.com", password="pw", active=True)
+        db.session.add(Blog(title="Fresh", author=user))
+        db.session.commit()
+
+    client = app.test_client()
+    assert client.get("/_db/cached").data == b"Fresh"
+    assert client.get("/_db/cached").headers["X-Cache"] == "HIT"
+
+    app.config["PAGE_CACHE_ENABLED"] = False
+    # uncached pages still read from the lagging replica
+    assert client.get("/_db/cached").data == b"none"
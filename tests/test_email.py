@@ -0,0 +1,98 @@
+import queue
+import os
+import socketserver
+import threading
+
+import pytest
+from flask_mail import Message
+
+from app import metrics
+from app.email import EmailDispatcher, send_email
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line + b"\r\n")
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply(b"220 stub")
+        data = None
+        for line in self.rfile:
+            if data is not None:
+                if line == b".\r\n":
+                    self.server.messages.append(b"".join(data))
+                    data = None
+                    self.reply(b"250 OK")
+                else:
+                    data.append(line)
+            elif line[:4].upper() == b"DATA":
+                data = []
+                self.reply(b"354 go ahead")
+            elif line[:4].upper() == b"QUIT":
+                self.reply(b"221 bye")
+                return
+            else:
+                self.reply(b"250 OK")
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.connections = 0
+        self.messages = []
+
+
+@pytest.fixture
+def smtp(app, monkeypatch):
+    server = SMTPStub()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state = app.extensions["mail"]
+    monkeypatch.setattr(state, "server", "127.0.0.1")
+    monkeypatch.setattr(state, "port", server.server_address[1])
+    monkeypatch.setattr(state, "suppress", False)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _message(i):
+    return Message(
+        f"Hello {i}", sender="cms@example.com", recipients=[f"user{i}@example.com"]
+    )
+
+
+def test_pool_reuses_connections_and_drains_on_shutdown(app, smtp, monkeypatch):
+    app.config.update(EMAIL_WORKERS=2, EMAIL_BACKLOG=100)
+    dispatcher = EmailDispatcher(app)
+    monkeypatch.setattr(app, "email_dispatcher", dispatcher)
+
+    for i in range(10):
+        send_email(f"Hello {i}", "cms@example.com", [f"user{i}@example.com"], "hi", None)
+    threads = dispatcher._threads
+    dispatcher.shutdown(timeout=5)
+
+    assert len(threads) == 2
+    assert not any(thread.is_alive() for thread in threads)
+    assert len(smtp.messages) == 10
+    assert smtp.connections <= 2
+    counters = metrics.counters()
+    assert counters["email.sent"] == 10
+    assert "email.send_ms" in counters and "email.queue_ms" in counters
+
+
+def test_full_backlog_sends_in_the_caller(app, smtp):
+    app.config.update(EMAIL_WORKERS=1, EMAIL_BACKLOG=1, EMAIL_SUBMIT_TIMEOUT=0.01)
+    dispatcher = EmailDispatcher(app)
+    # a queue nobody consumes, already at its limit
+    dispatcher._queue = queue.Queue(maxsize=1)
+    dispatcher._queue.put(None)
+    dispatcher._pid = os.getpid()
+
+    dispatcher.submit(_message(1))
+
+    assert len(smtp.messages) == 1
+    assert smtp.connections == 1
+    assert metrics.counters()["email.backlog_full"] == 1
@@ -0,0 +1,95 @@
+import io
+import json
+import os
+import uuid
+import zipfile
+
+import frontmatter
+import pytest
+from flask import current_app, g, url_for
+
+from app import db, exports, security
+from app.models import Blog, Post
+from test_utils import set_current_user
+
+
+@pytest.fixture
+def posts(app, user, tmp_path):
+    app.config["EXPORT_DIR"] = str(tmp_path)
+    app.config["EXPORT_YIELD_PER"] = 2
+    blog = Blog(title="Test", slug="test", author=user)
+    db.session.add_all(
+        Post(title=f"Post {i}", content=f"<p>{i}</p>", blog=blog, author=user)
+        for i in range(5)
+    )
+    db.session.commit()
+
+
+def _export(user, format):
+    progress = []
+    path = exports.write_export(
+        user.id, "task", format, progress=lambda done, total: progress.append(done)
+    )
+    assert progress == [1, 2, 3, 4, 5]
+    return path
+
+
+def test_jsonl_and_json_exports_stream_every_post(posts, user):
+    with open(_export(user, "jsonl")) as file:
+        lines = [json.loads(line) for line in file]
+    assert [line["title"] for line in lines] == [f"Post {i}" for i in range(5)]
+    assert lines[0]["blog"] == "test"
+
+    with open(_export(user, "json")) as file:
+        assert [post["content"] for post in json.load(file)["posts"]] == [
+            f"<p>{i}</p>" for i in range(5)
+        ]
+
+
+def test_zip_export_writes_markdown_with_front_matter(posts, user):
+    with zipfile.ZipFile(_export(user, "zip")) as archive:
+        names = archive.namelist()
+        post = frontmatter.loads(archive.read(names[0]).decode())
+    assert len(names) == 5
+    assert post["title"] == "Post 0"
+    assert post.content == "<p>0</p>"
+
+
+def test_download_is_limited_to_the_owner(posts, user, client):
+    task_id = str(uuid.uuid4())
+    exports.write_export(user.id, task_id, "jsonl")
+    headers = {current_app.config["SECURITY_TOKEN_AUTHENTICATION_HEADER"]: "token"}
+    url = url_for("dashboard.download_export", task_id=task_id)
+
+    set_current_user(current_app, security.datastore, user.email)
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert len(io.BytesIO(response.data).readlines()) == 5
+
+    security.datastore.create_user(
+        username="other", email="other@example.com", password="password"
+    )
+    db.session.commit()
+    set_current_user(current_app, security.datastore, "other@example.com")
+    # the fixture's app context is shared, so drop the cached login
+    g.pop("_login_user", None)
+    assert client.get(url, headers=headers).status_code == 404
+
+
+def test_new_exports_replace_old_and_expired_files(posts, user, tmp_path):
+    first = exports.write_export(user.id, "first", "jsonl")
+    stale = tmp_path / "tmpcrashed.part"
+    stale.write_bytes(b"partial")
+    other_user = tmp_path / f"{user.id + 1}-old.json"
+    other_user.write_bytes(b"{}")
+    expired = os.path.getmtime(first) - current_app.config["EXPORT_TTL"] - 1
+    os.utime(stale, (expired, expired))
+
+    second = exports.write_export(user.id, "second", "zip")
+
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        [os.path.basename(second), other_user.name]
+    )
+    assert exports.latest_export(user.id) == ("second", "zip")
+    assert exports.sweep_exports(now=os.path.getmtime(second) + 1, max_age=0) == 2
@@ -0,0 +1,20 @@
+from flask import Flask
+from werkzeug.datastructures import MultiDict
+
+from app.dash.forms import BlogForm
+from app.extensions import db
+from app.models import Blog
+
+
+def test_blog_slug_must_be_unique_except_for_the_blog_itself(app: Flask, user):
+    blog = Blog(title="Mine", slug="mine", author=user)
+    other = Blog(title="Other", slug="other", author=user)
+    db.session.add_all([blog, other])
+    db.session.commit()
+
+    assert BlogForm(obj=blog).validate()
+    renamed = MultiDict({"title": "Mine", "slug": "other"})
+    assert not BlogForm(formdata=renamed, obj=blog).validate()
+    form = BlogForm(title="New", slug="mine")
+    assert not form.validate()
+    assert "This slug is already taken." in form.slug.errors
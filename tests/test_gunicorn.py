@@ -0,0 +1,21 @@
+import os
+import runpy
+
+CONFIG = os.path.join(os.path.dirname(__file__), "..", "gunicorn.conf.py")
+
+
+def test_workers_are_sized_from_the_cpu_count(monkeypatch):
+    monkeypatch.setattr(os, "process_cpu_count", lambda: 4, raising=False)
+    monkeypatch.delenv("GUNICORN_WORKERS", raising=False)
+
+    monkeypatch.setenv("GUNICORN_WORKER_CLASS", "gthread")
+    settings = runpy.run_path(CONFIG)
+    assert (settings["workers"], settings["threads"]) == (5, 8)
+    assert settings["preload_app"] is True
+
+    monkeypatch.setenv("GUNICORN_WORKER_CLASS", "sync")
+    settings = runpy.run_path(CONFIG)
+    assert (settings["workers"], settings["threads"]) == (9, 1)
+
+    monkeypatch.setenv("GUNICORN_WORKERS", "3")
+    assert runpy.run_path(CONFIG)["workers"] == 3
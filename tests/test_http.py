@@ -0,0 +1,64 @@
+import threading
+
+import httpx
+import pytest
+
+from app import metrics
+from app.http import HTTPClient, ResponseTooLarge
+
+
+def _client(app, handler, **config):
+    return HTTPClient({**app.config, **config}, transport=httpx.MockTransport(handler))
+
+
+def test_reuses_one_pooled_client(app):
+    client = _client(app, lambda request: httpx.Response(200, text="ok"))
+    pooled = client.client
+    assert client.get("https://example.com/a").text == "ok"
+    assert client.post("https://example.com/b", json={}).status_code == 200
+    assert client.client is pooled
+    assert metrics.counters()["http.requests"] == 2
+
+
+def test_caps_response_size(app):
+    client = _client(
+        app,
+        lambda request: httpx.Response(200, content=b"x" * 2048),
+        HTTP_MAX_RESPONSE_BYTES=1024,
+    )
+    with pytest.raises(ResponseTooLarge):
+        client.get("https://example.com/big")
+    assert client.get("https://example.com/big", max_bytes=4096).content == b"x" * 2048
+    assert metrics.counters()["http.errors"] == 1
+
+
+def test_limits_concurrency_per_host(app):
+    started, release = threading.Event(), threading.Event()
+
+    def handler(request):
+        if request.url.host == "slow.example":
+            started.set()
+            release.wait(5)
+        return httpx.Response(200)
+
+    client = _client(
+        app, handler, HTTP_MAX_CONNECTIONS_PER_HOST=1, HTTP_POOL_TIMEOUT=0.1
+    )
+    ctx = app.app_context()
+
+    def slow_request():
+        with ctx:
+            client.get("https://slow.example/")
+
+    worker = threading.Thread(target=slow_request)
+    worker.start()
+    try:
+        assert started.wait(5)
+        with pytest.raises(httpx.PoolTimeout):
+            client.get("https://slow.example/")
+    finally:
+        release.set()
+        worker.join()
+    # other hosts are not held up by the saturated one
+    assert client.get("https://fast.example/").status_code == 200
+    assert metrics.counters()["http.pool.timeouts"] == 1
@@ -0,0 +1,115 @@
+import io
+import os
+import tarfile
+import zipfile
+
+from flask import current_app, url_for
+from werkzeug.datastructures import FileStorage
+
+from app import db, imports, security
+from app.models import Blog, Post, Task
+from test_utils import set_current_user
+
+
+def _markdown(title, draft=False):
+    return f"---\ntitle: {title}\ndraft: {str(draft).lower()}\n---\n# {title}\n".encode()
+
+
+def _zip(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _tar(entries):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, data in entries.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def test_import_streams_archives_in_batches(app, user, tmp_path):
+    app.config["IMPORT_SPOOL_DIR"] = str(tmp_path)
+    app.config["IMPORT_MAX_FILE_BYTES"] = 1024
+    blog = Blog(title="Test", slug="test", author=user)
+    db.session.add(blog)
+    db.session.commit()
+    uploads = {
+        "posts.zip": _zip({
+            "a.md": _markdown("A"),
+            "b.md": _markdown("B", draft=True),
+            "notes.txt": b"ignored",
+            "big.md": _markdown("Big") + b"x" * 2048,
+        }),
+        "more.tar.gz": _tar({"c.md": _markdown("C"), "bad.md": b"# no front matter"}),
+        "d.md": _markdown("D"),
+        "broken.zip": b"not a zip",
+    }
+    path = imports.spool_upload(
+        FileStorage(io.BytesIO(data), filename=name) for name, data in uploads.items()
+    )
+    progress = []
+
+    results = imports.run_import(
+        path,
+        blog.id,
+        user.id,
+        batch_size=2,
+        progress=lambda results, done, total: progress.append((len(results), done, total)),
+    )
+
+    statuses = {result["file"]: result["status"] for result in results}
+    assert statuses == {
+        "a.md": "imported",
+        "b.md": "imported",
+        "big.md": "failed",
+        "broken.zip": "failed",
+        "d.md": "imported",
+        "c.md": "imported",
+        "bad.md": "failed",
+    }
+    posts = {post.title: post.published for post in db.session.scalars(db.select(Post))}
+    assert posts == {"A": True, "B": False, "C": True, "D": True}
+    assert len(progress) == 3
+    assert progress[-1][1] == progress[-1][2]
+    assert not os.path.exists(path)
+
+
+def test_a_dropzone_upload_imports_every_file_at_once(app, client, user, tmp_path):
+    app.config["IMPORT_SPOOL_DIR"] = str(tmp_path)
+    assert app.config["DROPZONE_UPLOAD_MULTIPLE"]
+    blog = Blog(title="Test", slug="test", author=user)
+    db.session.add(blog)
+    db.session.commit()
+    headers = {
+        current_app.config["SECURITY_TOKEN_AUTHENTICATION_HEADER"]: "token",
+        "X-Requested-With": "XMLHttpRequest",
+    }
+    set_current_user(current_app, security.datastore, user.email)
+    url = url_for("dashboard.upload", blog_id=blog.id)
+
+    # Dropzone names the files of one request file[0], file[1], ...
+    response = client.post(
+        url,
+        headers=headers,
+        data={
+            f"file[{i}]": (io.BytesIO(_markdown(title)), f"{title}.md")
+            for i, title in enumerate("ABC")
+        },
+    )
+    assert response.status_code == 302
+    [task] = db.session.scalars(db.select(Task)).all()
+    [spool] = os.listdir(tmp_path)
+    assert sorted(os.listdir(tmp_path / spool)) == ["A.md", "B.md", "C.md"]
+
+    # a later drop is reported to Dropzone as failed, not silently dropped
+    response = client.post(
+        url, headers=headers, data={"file[0]": (io.BytesIO(_markdown("D")), "D.md")}
+    )
+    assert response.status_code == 409
+    assert len(os.listdir(tmp_path)) == 1
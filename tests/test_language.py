@@ -0,0 +1,46 @@
+from app import db, language
+from app.models import Blog, Post
+
+ENGLISH = "<p>The quick brown fox jumps over the lazy dog while the cat sleeps.</p>"
+GERMAN = "<p>Der schnelle braune Fuchs springt über den faulen Hund und die Katze.</p>"
+
+
+def test_new_and_edited_posts_are_detected_in_the_background(app, user):
+    blog = Blog(title="Test", slug="test", author=user)
+    post = Post(title="Hello", content=ENGLISH, blog=blog, author=user)
+    db.session.add(post)
+    db.session.commit()
+
+    assert post.language is None
+    assert app.redis.smembers(language.PENDING_KEY) == {str(post.id).encode()}
+    jobs = [job.func_name for job in app.task_queue.jobs]
+    assert jobs.count("app.tasks.detect_languages") == 1
+
+    assert language.process_pending() == 1
+    db.session.refresh(post)
+    assert post.language == "en"
+
+    post.title = "Renamed"
+    db.session.commit()
+    assert not app.redis.exists(language.PENDING_KEY)
+    post.content = GERMAN
+    db.session.commit()
+    language.process_pending()
+    db.session.refresh(post)
+    assert post.language == "de"
+
+
+def test_backfill_cli_reports_progress(app, runner, user):
+    blog = Blog(title="Test", slug="test", author=user)
+    db.session.add_all(
+        Post(title=str(i), content=ENGLISH, blog=blog, author=user) for i in range(5)
+    )
+    db.session.commit()
+    app.redis.delete(language.PENDING_KEY)
+
+    result = runner.invoke(args=["language", "backfill", "--batch-size", "2"])
+
+    assert result.exit_code == 0, result.output
+    assert "posts: 4/5" in result.output
+    assert "posts: 5 languages detected" in result.output
+    assert set(db.session.scalars(db.select(Post.language))) == {"en"}
@@ -1,7 +1,9 @@
+import re
+from datetime import datetime, timedelta
 import pytest
 from flask import url_for, current_app
 from flask.testing import FlaskClient
-from test_utils import set_current_user
+from test_utils import set_current_user, assert_max_queries
 import sys
 import os
 
@@ -86,3 +88,96 @@ def test_create_blog(client: FlaskClient):
     # assert b'Blog created successfully!' in response.data
     # assert b'New Blog' in response.data
     # assert b'New Description' in response.data
+
+
+def _seed_blog(user, posts=10):
+    blog = Blog(title="Test Blog", slug="test", description="Test", author=user)
+    db.session.add(blog)
+    for i in range(posts):
+        other = User(
+            username=f"author{i}",
+            email=f"author{i}@example.com",
+            password="password",
+            active=True,
+        )
+        db.session.add(
+            Post(title=f"Post {i}", content="Content", blog=blog, author=other)
+        )
+    db.session.commit()
+    db.session.expunge_all()
+    return blog
+
+
+@pytest.mark.parametrize(
+    "endpoint, kwargs, limit",
+    [
+        ("main.view_blog", {"blog_id": 1}, 2),
+        ("main.view_user", {"username": "author3"}, 4),
+        ("main.blog_rss", {"blog_id": 1}, 2),
+        ("api.outbox", {"username": "author3"}, 3),
+        ("main.explore", {}, 1),
+    ],
+)
+def test_public_pages_query_count(client: FlaskClient, user, endpoint, kwargs, limit):
+    _seed_blog(user)
+    with assert_max_queries(db.engine, limit):
+        response = client.get(url_for(endpoint, **kwargs))
+    assert response.status_code == 200
+
+
+def test_feed_posts_join_blog_once(client: FlaskClient, user):
+    from app import queries
+
+    _seed_blog(user)
+    statement = queries.feed_posts()
+    assert str(statement.compile(db.engine)).count("JOIN blog") == 1
+    with assert_max_queries(db.engine, 1):
+        posts = db.session.scalars(statement.limit(5)).unique().all()
+        assert {post.blog.slug for post in posts}
+
+
+def test_view_blog_cursor_pagination(client: FlaskClient, user):
+    current_app.config["POSTS_PER_PAGE"] = 2
+    blog = Blog(title="Test Blog", slug="test", author=user)
+    created_at = datetime(2025, 1, 1)
+    # two posts share a timestamp so the id tie-breaker matters
+    db.session.add_all(
+        Post(
+            title=f"Post {i}",
+            content="Content",
+            blog=blog,
+            author=user,
+            created_at=created_at + timedelta(days=min(i, 3)),
+        )
+        for i in range(5)
+    )
+    db.session.commit()
+
+    url = url_for("main.view_blog", blog_id=blog.id)
+    pages = []
+    while url:
+        response = client.get(url)
+        pages.append(re.findall(r"Post \d", response.text))
+        next_url = re.search(r'href="([^"]+)" rel="prev"', response.text)
+        url = next_url and next_url.group(1).replace("&amp;", "&")
+    assert pages == [
+        ["Post 4", "Post 3"],
+        ["Post 2", "Post 1"],
+        ["Post 0"],
+    ]
+
+    newer = re.search(r'href="([^"]+)" rel="next"', response.text).group(1)
+    response = client.get(newer.replace("&amp;", "&"))
+    assert re.findall(r"Post \d", response.text) == ["Post 2", "Post 1"]
+
+
+def test_view_post_by_blog_slug(client: FlaskClient, user):
+    _seed_blog(user, posts=1)
+    other = Blog(title="Other Blog", slug="other", author=db.session.merge(user))
+    db.session.add(other)
+    db.session.commit()
+
+    response = client.get("/post/test/1")
+    assert response.status_code == 200
+    assert b"Post 0" in response.data
+    assert client.get("/post/other/1").status_code == 404
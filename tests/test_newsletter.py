@@ -0,0 +1,137 @@
+import smtplib
+
+import pytest
+from flask_mail import Connection
+
+from app import db, security
+from app.extensions import mail
+from app.jobs import newsletter
+from app.models import Blog, Post
+
+
+@pytest.fixture
+def blog(app, user):
+    app.config["NEWSLETTER_CHUNK_SIZE"] = 2
+    blog = Blog(title="Weekly", slug="weekly", author=user, newsletter=True)
+    db.session.add_all(
+        [
+            blog,
+            Post(title="Shipped", content="<p>News</p>", blog=blog, author=user,
+                 published=True, publish_in_newsletter=True),
+            Post(title="Draft", content="<p>Secret</p>", blog=blog, author=user,
+                 publish_in_newsletter=True),
+        ]
+    )
+    for i in range(3):
+        blog.subscribers.add(
+            security.datastore.create_user(
+                username=f"reader{i}", email=f"reader{i}@example.com", password="x"
+            )
+        )
+    inactive = security.datastore.create_user(
+        username="gone", email="gone@example.com", password="x", active=False
+    )
+    blog.subscribers.add(inactive)
+    security.datastore.create_user(
+        username="stranger", email="stranger@example.com", password="x"
+    )
+    db.session.commit()
+    return blog
+
+
+def _chunk_jobs(app):
+    return [
+        job for job in app.task_queue.jobs
+        if job.func_name == "app.tasks.send_newsletter_chunk"
+    ]
+
+
+def test_issue_is_rendered_once_and_sent_per_recipient(app, blog):
+    issue_id, chunks = newsletter.queue_newsletter(blog.id)
+    jobs = _chunk_jobs(app)
+    assert chunks == len(jobs) == 2
+    assert [len(job.args[1]) for job in jobs] == [2, 2]
+    assert jobs[0].retries_left == app.config["NEWSLETTER_RETRIES"]
+
+    with mail.record_messages() as outbox:
+        sent = sum(newsletter.send_chunk(*job.args) for job in jobs)
+        assert sum(newsletter.send_chunk(*job.args) for job in jobs) == 0
+
+    assert sent == 3
+    assert sorted(message.recipients[0] for message in outbox) == [
+        f"reader{i}@example.com" for i in range(3)
+    ]
+    assert all(len(message.recipients) == 1 for message in outbox)
+    assert "Shipped" in outbox[0].html and "Draft" not in outbox[0].html
+    assert "localhost:5000/post/" in outbox[0].body
+    tokens = {
+        message.extra_headers["List-Unsubscribe"].rsplit("/", 1)[1].rstrip(">")
+        for message in outbox
+    }
+    assert len(tokens) == 3
+    for message in outbox:
+        url = message.extra_headers["List-Unsubscribe"].strip("<>")
+        assert url.startswith("http://localhost:5000/newsletter/unsubscribe/")
+        assert url in message.body and url in message.html
+        assert message.extra_headers["List-Unsubscribe-Post"] == (
+            "List-Unsubscribe=One-Click"
+        )
+
+
+def test_retried_chunk_resumes_after_the_last_delivery(app, blog, monkeypatch):
+    newsletter.queue_newsletter(blog.id)
+    job = _chunk_jobs(app)[0]
+    send = Connection.send
+    calls = []
+
+    def flaky_send(connection, message, envelope_from=None):
+        calls.append(message.recipients[0])
+        if len(calls) == 2:
+            raise smtplib.SMTPServerDisconnected("connection lost")
+        return send(connection, message, envelope_from)
+
+    monkeypatch.setattr(Connection, "send", flaky_send)
+    with mail.record_messages() as outbox:
+        with pytest.raises(smtplib.SMTPServerDisconnected):
+            newsletter.send_chunk(*job.args)
+        assert newsletter.send_chunk(*job.args) == 1
+
+    assert calls == ["reader0@example.com", "reader1@example.com", "reader1@example.com"]
+    assert [message.recipients[0] for message in outbox] == [
+        "reader0@example.com",
+        "reader1@example.com",
+    ]
+
+
+def test_unsubscribed_readers_are_skipped(app, blog):
+    issue_id, _ = newsletter.queue_newsletter(blog.id)
+    job = _chunk_jobs(app)[0]
+    reader = security.datastore.find_user(email="reader0@example.com")
+    blog.unsubscribe(reader)
+    db.session.commit()
+
+    with mail.record_messages() as outbox:
+        assert newsletter.send_chunk(*job.args) == 1
+    assert outbox[0].recipients == ["reader1@example.com"]
+    assert not blog.is_subscriber(reader)
+
+
+def test_unsubscribe_links_are_signed_per_reader(app, blog, client):
+    reader = security.datastore.find_user(email="reader0@example.com")
+    other = security.datastore.find_user(email="reader1@example.com")
+    token = newsletter.unsubscribe_token(blog.id, reader.id)
+    url = f"/newsletter/unsubscribe/{token}"
+
+    assert client.get(f"/newsletter/unsubscribe/{token[:-2]}xx").status_code == 404
+    assert client.get(url).status_code == 200
+    assert blog.is_subscriber(reader)
+
+    response = client.post(url, data={"List-Unsubscribe": "One-Click"})
+    assert response.status_code == 204
+    assert not blog.is_subscriber(reader)
+    assert blog.is_subscriber(other)
+
+    token = newsletter.unsubscribe_token(blog.id, other.id)
+    response = client.post(f"/newsletter/unsubscribe/{token}")
+    assert response.status_code == 302
+    assert not blog.is_subscriber(other)
@@ -0,0 +1,122 @@
+import pytest
+import sqlalchemy as sa
+from flask import current_app, g, url_for
+from redis.exceptions import RedisError
+from rq.job import Job
+
+from app import db, security
+from app.models import Notification, Task
+from app.progress import ProgressReporter, read_progress
+from test_utils import set_current_user
+
+
+@pytest.fixture
+def task(app, user):
+    job = Job.create("app.tasks.export_posts", connection=app.redis)
+    job.save()
+    task = Task(id=job.id, name="tasks.export_posts", user=user)
+    db.session.add(task)
+    db.session.commit()
+    return job
+
+
+def _notifications():
+    return db.session.scalar(db.select(db.func.count(Notification.id)))
+
+
+def test_updates_are_throttled_and_stay_out_of_the_database(task, user, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("app.progress.monotonic", lambda: now[0])
+    progress = ProgressReporter(task, user_id=user.id, min_interval=1, min_delta=5)
+
+    assert progress.update(0)
+    assert not progress.update(3)  # below the percentage delta
+    assert not progress.update(10)  # too soon
+    now[0] = 2.0
+    assert progress.update_count(20, 100, rate=4.5)
+    assert read_progress(task.id)["progress"] == 20
+    assert read_progress(task.id)["meta"] == {"rate": 4.5}
+    assert progress.update(150) is False  # capped at 99 until finished
+
+    assert _notifications() == 0
+    assert not db.session.get(Task, task.id).complete
+    assert "progress" not in Job.fetch(task.id, connection=current_app.redis).meta
+
+    progress.finish(results=["a"])
+    progress.finish()
+    assert read_progress(task.id)["progress"] == 100
+    assert db.session.get(Task, task.id).complete
+    assert _notifications() == 1
+    meta = Job.fetch(task.id, connection=current_app.redis).meta
+    assert meta == {"progress": 100, "rate": 4.5, "results": ["a"]}
+
+
+def test_finish_commits_the_jobs_pending_work(task, user):
+    progress = ProgressReporter(task, user_id=user.id)
+    user.username = "renamed"
+    progress.finish()
+    db.session.expire_all()
+    assert user.username == "renamed"
+
+
+def test_finish_completes_the_task_after_a_failed_commit(task, user):
+    progress = ProgressReporter(task, user_id=user.id)
+    db.session.add(Task(id=task.id, name="duplicate", user=user))
+    with pytest.raises(sa.exc.IntegrityError):
+        db.session.commit()
+
+    progress.finish()
+    assert db.session.get(Task, task.id).complete
+    assert db.session.get(Task, task.id).name == "tasks.export_posts"
+
+
+def test_finish_discards_pending_work_that_cannot_be_committed(task, user):
+    progress = ProgressReporter(task, user_id=user.id)
+    db.session.add(Task(id=task.id + "-2", name=None, user=user))
+
+    progress.finish()
+    assert db.session.get(Task, task.id).complete
+    assert db.session.get(Task, task.id + "-2") is None
+
+
+def test_reporter_without_a_job_does_nothing(app):
+    progress = ProgressReporter()
+    assert not progress.update(50)
+    progress.finish()
+
+
+def test_progress_endpoints_are_limited_to_the_owner(task, user, client):
+    ProgressReporter(task, user_id=user.id).update(42)
+    headers = {current_app.config["SECURITY_TOKEN_AUTHENTICATION_HEADER"]: "token"}
+    set_current_user(current_app, security.datastore, user.email)
+
+    response = client.get(
+        url_for("dashboard.task_progress", task_id=task.id), headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json["progress"] == 42
+    assert response.cache_control.no_store
+
+    security.datastore.create_user(
+        username="other", email="other@example.com", password="password"
+    )
+    db.session.commit()
+    set_current_user(current_app, security.datastore, "other@example.com")
+    g.pop("_login_user", None)
+    response = client.get(
+        url_for("dashboard.task_progress", task_id=task.id), headers=headers
+    )
+    assert response.status_code == 404
+
+
+def test_progress_polls_survive_redis_outages(task, user, client, monkeypatch):
+    def unavailable(task_id):
+        raise RedisError("down")
+
+    monkeypatch.setattr("app.dash.routes.read_progress", unavailable)
+    headers = {current_app.config["SECURITY_TOKEN_AUTHENTICATION_HEADER"]: "token"}
+    set_current_user(current_app, security.datastore, user.email)
+    response = client.get(
+        url_for("dashboard.task_progress", task_id=task.id), headers=headers
+    )
+    assert response.status_code == 503
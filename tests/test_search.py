@@ -0,0 +1,160 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from flask import Flask
+from app.extensions import db
+from app import models
+from app.models import Blog, Post, SearchableMixin
+from app.search import (
+    OUTBOX_KEY,
+    OUTBOX_PROCESSING_KEY,
+    pop_index_changes,
+    ack_index_changes,
+)
+
+
+def test_reindex_streams_in_batches(app: Flask, user, monkeypatch):
+    blog = Blog(title="Test Blog", author=user)
+    db.session.add(blog)
+    db.session.add_all(
+        Post(title=f"Post {i}", content="Content", blog=blog, author=user)
+        for i in range(7)
+    )
+    db.session.commit()
+
+    batches = []
+
+    def fake_bulk_index(index, documents, chunk_size=None, thread_count=None):
+        batches.append((index, [id for id, _ in documents]))
+        # the backend rejects one document per batch
+        return len(documents) - 1
+
+    monkeypatch.setattr(models, "bulk_index", fake_bulk_index)
+    reports = []
+    indexed, failed = Post.reindex(
+        chunk_size=2,
+        thread_count=2,
+        progress=lambda done, total, rate: reports.append((done, total)),
+    )
+
+    assert (indexed, failed) == (5, 2)
+    assert [len(ids) for _, ids in batches] == [4, 3]
+    assert all(index == "post" for index, _ in batches)
+    assert reports == [(4, 7), (7, 7)]
+    assert not any(isinstance(obj, Post) for obj in db.session)
+
+
+def test_commit_queues_coalesced_index_changes(app: Flask, user, monkeypatch):
+    blog = Blog(title="Test Blog", author=user)
+    post = Post(title="Post", content="Content", blog=blog, author=user)
+    other = Post(title="Other", content="Content", blog=blog, author=user)
+    db.session.add_all([blog, post, other])
+    db.session.commit()
+    post.title = "Edited"
+    db.session.commit()
+    other_id = other.id
+    db.session.delete(other)
+    db.session.commit()
+
+    jobs = [job.func_name for job in app.task_queue.jobs]
+    assert jobs.count("app.tasks.sync_search_index") == 1
+    changes = pop_index_changes()
+    assert changes == {
+        ("blog", blog.id): "index",
+        ("post", post.id): "index",
+        ("post", other_id): "delete",
+    }
+
+    indexed, removed = [], []
+    monkeypatch.setattr(
+        models,
+        "bulk_index",
+        lambda index, documents: indexed.extend((index, id) for id, _ in documents),
+    )
+    monkeypatch.setattr(
+        models,
+        "bulk_remove",
+        lambda index, ids: removed.extend((index, id) for id in ids),
+    )
+    SearchableMixin.apply_index_changes(changes)
+    ack_index_changes()
+
+    assert sorted(indexed) == [("blog", blog.id), ("post", post.id)]
+    assert removed == [("post", other_id)]
+    assert pop_index_changes() == {}
+
+
+def test_changes_queued_behind_a_leftover_batch_are_rescheduled(app: Flask, user):
+    blog = Blog(title="Test Blog", author=user)
+    db.session.add(blog)
+    db.session.commit()
+    # a crashed worker left its batch unacknowledged
+    app.redis.rename(OUTBOX_KEY, OUTBOX_PROCESSING_KEY)
+    post = Post(title="Post", content="Content", blog=blog, author=user)
+    db.session.add(post)
+    db.session.commit()
+
+    def sync_jobs():
+        jobs = [job.func_name for job in app.task_queue.jobs]
+        return jobs.count("app.tasks.sync_search_index")
+
+    assert sync_jobs() == 1
+    assert pop_index_changes() == {("blog", blog.id): "index"}
+    ack_index_changes()
+    assert sync_jobs() == 2
+    assert pop_index_changes()[("post", post.id)] == "index"
+
+
+def test_failed_sync_keeps_the_batch_for_a_retry(app: Flask, user, monkeypatch):
+    from app import tasks
+
+    blog = Blog(title="Test Blog", author=user)
+    db.session.add(blog)
+    db.session.commit()
+
+    def fail(changes):
+        raise ConnectionError("search is down")
+
+    monkeypatch.setattr(SearchableMixin, "apply_index_changes", fail)
+    with pytest.raises(ConnectionError):
+        tasks.sync_search_index()
+    assert pop_index_changes() == {("blog", blog.id): "index"}
+
+
+def test_database_backend_ranks_and_paginates(app: Flask, user):
+    app.config["SEARCH_SYNC_ASYNC"] = False
+    blog = Blog(title="Test Blog", author=user)
+    db.session.add(blog)
+    db.session.add_all(
+        [
+            Post(title="Flask tips", content="flask flask flask", blog=blog, author=user),
+            Post(title="Cooking", content="a note on flask", blog=blog, author=user),
+            Post(title="Gardening", content="nothing relevant", blog=blog, author=user),
+        ]
+    )
+    db.session.commit()
+
+    posts, total = Post.search("flask", 1, 1)
+    assert total == 2
+    assert [post.title for post in posts] == ["Flask tips"]
+    posts, total = Post.search("flask", 2, 1)
+    assert [post.title for post in posts] == ["Cooking"]
+    assert Post.search('"unbalanced', 1, 10) == ([], 0)
+
+
+def test_search_page_links_results_to_their_posts(app: Flask, client, user):
+    blog = Blog(title="Search Blog", slug="found", author=user)
+    post = Post(title="Needle post", content="haystack needle", blog=blog, author=user)
+    unslugged = Blog(title="No Slug", author=user)
+    orphan = Post(title="Needle too", content="needle", blog=unslugged, author=user)
+    db.session.add_all([blog, post, unslugged, orphan])
+    db.session.commit()
+    SearchableMixin.apply_index_changes(pop_index_changes())
+
+    response = client.get("/search", query_string={"q": "needle"})
+    assert response.status_code == 200
+    assert f"found.localhost/post/{post.id}\"" in response.text
+    assert f"/blog/{unslugged.id}" in response.text
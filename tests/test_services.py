@@ -0,0 +1,52 @@
+import sys
+
+from flask import Flask
+
+from app.models import Blog, Post
+from app.extensions import db
+
+
+def test_clients_are_created_on_first_use_and_reused(app: Flask):
+    assert not app.services.created("elasticsearch")
+    assert not app.services.created("translator")
+    translator = app.translator
+    assert app.translator is translator
+    assert translator.redis is app.redis
+    assert app.task_queue.connection is app.redis
+    assert app.elasticsearch is None
+
+
+def test_fork_unsafe_clients_are_rebuilt_after_a_fork(app: Flask, monkeypatch):
+    built = []
+    app.services.register(
+        "elasticsearch", lambda app: built.append(object()) or built[-1], fork_safe=False
+    )
+    client, redis = app.elasticsearch, app.redis
+    assert app.elasticsearch is client
+
+    monkeypatch.setattr(app.services, "_pid", -1)
+    assert app.elasticsearch is not client
+    assert app.redis is redis
+    assert len(built) == 2
+
+
+def test_close_tears_down_created_clients(app: Flask):
+    closed = []
+    app.services.register("thing", lambda app: "client", close=closed.append)
+    assert app.services.get("thing") == "client"
+    app.services.close()
+    assert closed == ["client"]
+    assert not app.services.created("thing")
+
+
+def test_tasks_import_without_building_an_app(app: Flask, user):
+    sys.modules.pop("app.tasks", None)
+    from app import tasks
+
+    assert tasks._worker_app is None
+    blog = Blog(title="Test", author=user)
+    db.session.add_all([blog, Post(title="Hi", content="<p>Hello</p>", blog=blog, author=user)])
+    db.session.commit()
+    tasks.detect_languages()
+    assert tasks._app() is app
+    assert tasks._worker_app is None
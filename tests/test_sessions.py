@@ -0,0 +1,28 @@
+import msgspec
+from flask import Flask, session
+
+
+def test_sessions_are_stored_in_redis_only_when_modified(app: Flask):
+    @app.route("/_session/set")
+    def set_value():
+        session["value"] = "stored"
+        return "ok"
+
+    @app.route("/_session/get")
+    def get_value():
+        return session.get("value", "missing")
+
+    client = app.test_client()
+    assert client.get("/_session/get").data == b"missing"
+    assert app.redis.keys("session:*") == []
+
+    client.get("/_session/set")
+    [key] = app.redis.keys("session:*")
+    assert msgspec.msgpack.decode(app.redis.get(key))["value"] == "stored"
+    ttl = app.redis.ttl(key)
+    assert 0 < ttl <= app.config["PERMANENT_SESSION_LIFETIME"]
+
+    # a read-only request leaves the stored session untouched
+    app.redis.persist(key)
+    assert client.get("/_session/get").data == b"stored"
+    assert app.redis.ttl(key) == -1
@@ -0,0 +1,77 @@
+import json
+import os
+
+import sqlalchemy as sa
+from alembic.script import ScriptDirectory
+from flask import Flask
+
+from app import create_app, startup
+from app.extensions import db
+from config import TestingConfig
+
+
+class MigratedConfig(TestingConfig):
+    DATABASE_CREATE_ALL = "false"
+
+
+def test_tables_are_only_created_on_boot_when_configured(app: Flask):
+    assert "post" in sa.inspect(db.engine).get_table_names()
+
+    migrated = create_app(MigratedConfig)
+    with migrated.app_context():
+        assert sa.inspect(db.engine).get_table_names() == []
+    assert "create tables" not in migrated.startup_timings
+    assert {"config", "security", "blueprints"} <= set(migrated.startup_timings)
+
+
+def test_empty_databases_are_created_and_stamped_once(tmp_path):
+    class FreshConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'fresh.db'}"
+        DATABASE_CREATE_ALL = "auto"
+
+    fresh = create_app(FreshConfig)
+    with fresh.app_context():
+        heads = db.session.scalars(sa.text("SELECT version_num FROM alembic_version"))
+        script = ScriptDirectory(os.path.join(os.path.dirname(fresh.root_path), "migrations"))
+        assert heads.all() == [script.get_current_head()]
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("DROP TABLE comment")
+
+    # a migrated database is left to "flask db upgrade"
+    again = create_app(FreshConfig)
+    with again.app_context():
+        assert "comment" not in sa.inspect(db.engine).get_table_names()
+        assert "post" in sa.inspect(db.engine).get_table_names()
+
+
+def test_importtime_output_is_grouped_by_package():
+    imports = startup.parse_importtime(
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       200 |        200 |     redis.exceptions\n"
+        "import time:      1000 |       1200 |   redis\n"
+        "import time:       500 |        500 | json\n"
+    )
+    assert imports[1] == ("redis", 0.001, 0.0012)
+    [(package, own, count), json_package] = startup.by_package(imports)
+    assert (package, round(own, 6), count) == ("redis", 0.0012, 2)
+    assert json_package == ("json", 0.0005, 1)
+
+
+def test_perf_startup_reports_phases_and_imports(runner):
+    result = runner.invoke(
+        args=["perf", "startup", "--config", "config.TestingConfig", "--as-json"]
+    )
+    assert result.exit_code == 0, result.output
+    timings = json.loads(result.output)
+    assert timings["import"] > 0 and "blueprints" in timings["phases"]
+    packages = {name for name, _, _ in startup.by_package(timings["imports"])}
+    assert "sqlalchemy" in packages
+    # only "flask db" needs these
+    assert not packages & {"alembic", "flask_migrate", "elasticsearch"}
+
+
+def test_db_commands_load_flask_migrate_on_demand(runner):
+    result = runner.invoke(args=["db", "--help"])
+    assert result.exit_code == 0, result.output
+    assert "--directory" in result.output
+    assert "upgrade" in result.output
@@ -0,0 +1,55 @@
+import json
+
+import httpx
+
+from app.http import HTTPClient
+from app.translate import LocalBackend, MicrosoftBackend, Translator, translate
+
+
+class CountingBackend(LocalBackend):
+    def __init__(self):
+        self.calls = []
+
+    def translate_batch(self, texts, source_language, dest_language):
+        self.calls.append(list(texts))
+        return super().translate_batch(texts, source_language, dest_language)
+
+
+def test_translate_uses_configured_backend(app):
+    assert translate("hello", "en", "fr") == "[fr] hello"
+
+
+def test_misses_are_batched_and_cached_in_both_tiers(app):
+    backend = CountingBackend()
+    translator = Translator(backend, app.redis, cache_size=2, cache_timeout=60)
+
+    result = translator.translate_many(["a", "b", "a", "c"], "en", "de")
+    assert result == ["[de] a", "[de] b", "[de] a", "[de] c"]
+    assert backend.calls == [["a", "b", "c"]]
+
+    assert translator.translate_many(["c", "b"], "en", "de") == ["[de] c", "[de] b"]
+    # "a" fell out of the two-entry LRU but is still in Redis
+    assert translator.translate_many(["a"], "en", "de") == ["[de] a"]
+    # another worker shares the Redis tier
+    other = Translator(backend, app.redis, cache_size=2, cache_timeout=60)
+    assert other.translate_many(["b", "d"], "en", "de") == ["[de] b", "[de] d"]
+    assert backend.calls == [["a", "b", "c"], ["d"]]
+    # the language pair is part of the key
+    translator.translate_many(["a"], "en", "es")
+    assert backend.calls[-1] == ["a"]
+
+
+def test_microsoft_backend_sends_arrays(app):
+    requests = []
+
+    def handler(request):
+        texts = [item["Text"] for item in json.loads(request.content)]
+        requests.append((request.url.params["to"], texts))
+        return httpx.Response(
+            200, json=[{"translations": [{"text": t.upper()}]} for t in texts]
+        )
+
+    app.http = HTTPClient(app.config, transport=httpx.MockTransport(handler))
+    backend = MicrosoftBackend("key", "westus", batch_size=2)
+    assert backend.translate_batch(["a", "b", "c"], "en", "fr") == ["A", "B", "C"]
+    assert requests == [("fr", ["a", "b"]), ("fr", ["c"])]
@@ -1,4 +1,6 @@
 # Copyright 2019 by J. Christopher Wagner (jwag). All rights reserved.
+from contextlib import contextmanager
+import sqlalchemy as sa
 from app.extensions import security
 
 
@@ -13,3 +15,22 @@ def set_current_user(app, ds, email):
         return app.security.login_manager.anonymous_user()
 
     security.login_manager.request_loader(token_cb)
+
+
+@contextmanager
+def assert_max_queries(engine, limit):
+    """Fail if the block issues more than ``limit`` SQL statements."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sa.event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        sa.event.remove(engine, "before_cursor_execute", record)
+    assert len(statements) <= limit, (
+        f"{len(statements)} statements executed, expected at most {limit}:\n"
+        + "\n".join(statements)
+    )
@@ -0,0 +1,176 @@
+import httpx
+import pytest
+
+from app import db
+from app.http import HTTPClient
+from app.jobs import webmention
+from app.models import Blog, Webmention
+
+TARGET = "https://example.com/blog/test"
+
+
+def test_queue_deduplicates_pairs_and_schedules_one_job(app, client):
+    for _ in range(3):
+        response = client.post(
+            "/webmention",
+            data={"source": "https://a.example/post", "target": "http://localhost/"},
+        )
+        assert response.status_code == 202
+    assert app.redis.scard(webmention.PENDING_KEY) == 1
+    assert len(app.task_queue) == 1
+
+
+def test_batch_streams_sources_and_stores_verified(app, user):
+    db.session.add(Blog(title="Test", slug="test", author=user))
+    db.session.commit()
+    consumed = []
+
+    def body(chunks):
+        for chunk in chunks:
+            consumed.append(chunk)
+            yield chunk
+
+    def handler(request):
+        if request.url.host == "long.example":
+            # the target is split across chunks and followed by a large tail
+            chunks = [b"<a href='https://example.com/bl", b"og/test'>"] + [b"x" * 1024] * 50
+            return httpx.Response(200, content=body(chunks))
+        if request.url.host == "huge.example":
+            return httpx.Response(200, content=body([b"y" * 1024] * 50))
+        return httpx.Response(404)
+
+    for source in ["https://long.example/", "https://huge.example/", "https://gone.example/"]:
+        webmention.queue_webmention(source, TARGET)
+    app.config["WEBMENTION_MAX_BYTES"] = 4096
+    app.http = HTTPClient(app.config, transport=httpx.MockTransport(handler))
+
+    stored = webmention.process_pending_webmentions()
+
+    assert stored == 1
+    mention = db.session.scalar(db.select(Webmention))
+    assert (mention.source, mention.blog.slug) == ("https://long.example/", "test")
+    # both streams were abandoned early
+    assert len(consumed) <= 2 + 5
+    assert not app.redis.exists(webmention.PENDING_KEY)
+    assert not app.redis.exists(webmention.PROCESSING_KEY)
+
+    # already stored pairs are not fetched again
+    webmention.queue_webmention("https://long.example/", TARGET)
+    app.http = HTTPClient(
+        app.config, transport=httpx.MockTransport(lambda request: 1 / 0)
+    )
+    assert webmention.process_pending_webmentions() == 0
+
+
+def test_failed_batches_stay_claimed_until_stored(app, user, monkeypatch):
+    db.session.add(Blog(title="Test", slug="test", author=user))
+    db.session.commit()
+    app.http = HTTPClient(
+        app.config,
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, text=f"<a href='{TARGET}'>")
+        ),
+    )
+    webmention.queue_webmention("https://a.example/", TARGET)
+
+    monkeypatch.setattr(db.session, "commit", lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        webmention.process_pending_webmentions()
+    db.session.rollback()
+    assert app.redis.scard(webmention.PROCESSING_KEY) == 1
+
+    # new pings wait until the claimed batch is done
+    webmention.queue_webmention("https://b.example/", TARGET)
+    monkeypatch.undo()
+    assert webmention.process_pending_webmentions(batch_size=10) == 1
+    assert app.redis.scard(webmention.PROCESSING_KEY) == 0
+    assert webmention.process_pending_webmentions(batch_size=10) == 1
+    assert db.session.scalar(db.select(db.func.count(Webmention.id))) == 2
+
+
+def test_unreachable_sources_are_retried_later(app, user):
+    db.session.add(Blog(title="Test", slug="test", author=user))
+    db.session.commit()
+    up = []
+
+    def handler(request):
+        if request.url.host == "down.example":
+            raise httpx.ConnectError("refused", request=request)
+        if not up:
+            return httpx.Response(503)
+        return httpx.Response(200, text=f"<a href='{TARGET}'>")
+
+    app.http = HTTPClient(app.config, transport=httpx.MockTransport(handler))
+    app.config["WEBMENTION_RETRIES"] = 2
+    webmention.queue_webmention("https://busy.example/", TARGET)
+    webmention.queue_webmention("https://down.example/", TARGET)
+
+    assert webmention.process_pending_webmentions() == 0
+    assert app.redis.scard(webmention.PROCESSING_KEY) == 2
+    # the follow-up run waits for the retry interval
+    assert len(app.task_queue.scheduled_job_registry) == 1
+
+    up.append(True)
+    assert webmention.process_pending_webmentions() == 1
+    assert webmention.process_pending_webmentions() == 0
+    # down.example used up its attempts and is given up on
+    assert not app.redis.exists(webmention.PROCESSING_KEY)
+    assert not app.redis.exists(webmention.ATTEMPTS_KEY)
+
+
+def _post(client, source, target="http://localhost/blog/test"):
+    return client.post("/webmention", data={"source": source, "target": target})
+
+
+def test_token_bucket_refills(app):
+    from app.ratelimit import take_token
+
+    assert [take_token("t", 2, 1, now=100) for _ in range(3)] == [True, True, False]
+    assert take_token("t", 2, 1, now=101)
+    assert not take_token("t", 2, 1, now=101.5)
+
+
+def test_rejected_requests_take_no_tokens(app):
+    from app.ratelimit import take_token, take_tokens
+
+    buckets = [("source", 5, 1), ("target", 1, 1)]
+    assert take_tokens(buckets, now=100) is None
+    assert take_tokens(buckets, now=100) == 1
+    assert take_tokens(buckets, now=100) == 1
+    # the source bucket only paid for the accepted request
+    assert [take_token("source", 5, 1, now=100) for _ in range(5)] == [True] * 4 + [False]
+
+
+def test_rate_limits_sources_and_applies_backpressure(app, client):
+    from app import metrics
+
+    app.config["WEBMENTION_SOURCE_BURST"] = 2
+    statuses = [_post(client, f"https://spam.example/{i}").status_code for i in range(3)]
+    assert statuses == [202, 202, 429]
+    assert _post(client, "https://other.example/1").status_code == 202
+    # a repeat inside the dedup window is accepted without using a token
+    assert _post(client, "https://spam.example/0").status_code == 202
+
+    app.config["WEBMENTION_MAX_PENDING"] = 2
+    response = _post(client, "https://third.example/1")
+    assert response.status_code == 429
+    # a claimed batch that has not been processed still counts
+    webmention.claim_pending_webmentions(10)
+    assert not app.redis.exists(webmention.PENDING_KEY)
+    assert _post(client, "https://third.example/1").status_code == 429
+    assert response.headers["Retry-After"] == str(app.config["WEBMENTION_RETRY_AFTER"])
+
+    counters = metrics.counters()
+    assert counters["webmention.accepted"] == 3
+    assert counters["webmention.duplicate"] == 1
+    assert counters["webmention.rejected.source"] == 1
+    assert counters["webmention.rejected.backpressure"] == 2
+
+
+def test_metrics_are_only_served_to_allowed_networks(app, client):
+    url = "/metrics"
+    assert client.get(url, environ_base={"REMOTE_ADDR": "127.0.0.1"}).status_code == 200
+    assert client.get(url, environ_base={"REMOTE_ADDR": "203.0.113.9"}).status_code == 403
+
+    app.config["METRICS_ALLOWED_NETWORKS"] = ["203.0.113.0/24"]
+    assert client.get(url, environ_base={"REMOTE_ADDR": "203.0.113.9"}).status_code == 200